@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 #
 # SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-or-later
 #
@@ -75,6 +75,10 @@
 
 import os
 import select
+import struct
+import time
+
+from collections import Counter
 
 from scapy.all import ETH_P_IP, ETH_P_IPV6, ETH_P_ALL, ETH_P_ARP
 from scapy.config import conf
@@ -87,9 +91,23 @@ conf.use_pcap = True
 
 __all__ = [
     u"RxQueue", u"TxQueue", u"Interface", u"create_gratuitous_arp_request",
-    u"auto_pad", u"checksum_equal"
+    u"auto_pad", u"checksum_equal", u"configure_interface"
 ]
 
+# Interfaces already configured by this process (e.g. traffic script agent).
+_CONFIGURED_INTERFACES = set()
+# Raw sockets by (direction, interface name), re-used by following queues.
+# Valid only in the process which created them, never shared across fork.
+_SOCKETS = dict()
+# Process ID of the process the cached sockets belong to.
+_SOCKETS_PID = os.getpid()
+# RARP EtherType, not defined by scapy.
+ETH_P_RARP = 0x8035
+# Packets shorter than this may get padded by auto_pad.
+_MAX_PAD_LEN = 78
+# Read big endian unsigned short from buffer at offset, without copying.
+_UNPACK_SHORT = struct.Struct(u"!H").unpack_from
+
 # TODO: http://stackoverflow.com/questions/320232/
 # ensuring-subprocesses-are-dead-on-exiting-python-program
 
@@ -97,78 +115,95 @@ __all__ = [
 class PacketVerifier:
     """Base class for TX and RX queue objects for packet verifier."""
     def __init__(self, interface_name):
-        os.system(
-            f"sudo echo 1 > /proc/sys/net/ipv6/conf/{interface_name}/"
-            f"disable_ipv6"
-        )
-        os.system(f"sudo ip link set {interface_name} up promisc on")
+        configure_interface(interface_name)
         self._ifname = interface_name
 
 
+def configure_interface(interface_name):
+    """Disable IPv6 and set promiscuous mode, once per interface.
+
+    :param interface_name: Name of the interface to configure.
+    :type interface_name: str
+    """
+    if interface_name in _CONFIGURED_INTERFACES:
+        return
+    os.system(
+        f"sudo echo 1 > /proc/sys/net/ipv6/conf/{interface_name}/"
+        f"disable_ipv6"
+    )
+    os.system(f"sudo ip link set {interface_name} up promisc on")
+    _CONFIGURED_INTERFACES.add(interface_name)
+
+
+def _get_socket(direction, interface_name):
+    """Return cached raw socket, create it first if needed.
+
+    A cached RX socket may hold packets received before this call,
+    those are discarded, so the caller sees only new packets,
+    the same as with a freshly created socket.
+
+    Sockets cached by another process (e.g. inherited from the parent
+    across fork) are forgotten without use, as pcap handle state
+    would get out of sync between the processes.
+
+    :param direction: Either "rx" or "tx".
+    :param interface_name: Name of the interface to bind to.
+    :type direction: str
+    :type interface_name: str
+    :returns: Raw L2 socket.
+    :rtype: scapy.supersocket.SuperSocket
+    """
+    global _SOCKETS_PID
+    if _SOCKETS_PID != os.getpid():
+        _SOCKETS.clear()
+        _SOCKETS_PID = os.getpid()
+    key = (direction, interface_name)
+    sock = _SOCKETS.get(key)
+    if sock is None:
+        if direction == u"rx":
+            sock = conf.L2listen(iface=interface_name, type=ETH_P_ALL)
+        else:
+            sock = conf.L2socket(iface=interface_name, type=ETH_P_ALL)
+        _SOCKETS[key] = sock
+    elif direction == u"rx":
+        while select.select([sock], [], [], 0)[0]:
+            sock.recv_raw(0x7fff)
+    return sock
+
+
 def extract_one_packet(buf):
     """Extract one packet from the incoming buf buffer.
 
-    Takes string as input and looks for first whole packet in it.
-    If it finds one, it returns substring from the buf parameter.
+    Takes bytes as input and looks for first whole packet in it.
+    If it finds one, it returns the slice of the buf parameter.
+    Header fields are read by struct directly from the buffer,
+    no scapy dissection is involved.
 
-    :param buf: String representation of incoming packet buffer.
-    :type buf: str
-    :returns: String representation of first packet in buf.
-    :rtype: str
+    :param buf: Incoming packet buffer.
+    :type buf: bytes
+    :returns: First packet in buf.
+    :rtype: bytes
     """
-    pkt_len = 0
-
     if len(buf) < 60:
         return None
 
-    try:
-        ether_type = Ether(buf[0:14]).type
-    except AttributeError:
-        raise RuntimeError(f"No EtherType in packet {buf!r}")
+    ether_type, = _UNPACK_SHORT(buf, 12)
 
     if ether_type == ETH_P_IP:
-        # 14 is Ethernet fame header size.
-        # 4 bytes is just enough to look for length in ip header.
-        # ip total length contains just the IP packet length so add the Ether
+        # 14 is Ethernet fame header size, IP total length is at offset 2.
+        # IP total length contains just the IP packet length so add the Ether
         #     header.
-        pkt_len = Ether(buf[0:14+4]).len + 14
-        if len(buf) < 60:
-            return None
+        pkt_len = _UNPACK_SHORT(buf, 14 + 2)[0] + 14
     elif ether_type == ETH_P_IPV6:
-        if not Ether(buf[0:14+6]).haslayer(IPv6):
-            raise RuntimeError(f"Invalid IPv6 packet {buf!r}")
-        # ... to add to the above, 40 bytes is the length of IPV6 header.
-        #   The ipv6.len only contains length of the payload and not the header
-        pkt_len = Ether(buf)[u"IPv6"].plen + 14 + 40
-        if len(buf) < 60:
-            return None
-    elif ether_type == ETH_P_ARP:
-        pkt = Ether(buf[:20])
-        if not pkt.haslayer(ARP):
-            raise RuntimeError(u"Incomplete ARP packet")
+        # IPv6 payload length is at offset 4, it does not contain
+        #   the 40 bytes of IPv6 header.
+        pkt_len = _UNPACK_SHORT(buf, 14 + 4)[0] + 14 + 40
+    elif ether_type in (ETH_P_ARP, ETH_P_RARP):
         # len(eth) + arp(2 hw addr type + 2 proto addr type
         #                + 1b len + 1b len + 2b operation)
-
-        pkt_len = 14 + 8
-        pkt_len += 2 * pkt.getlayer(ARP).hwlen
-        pkt_len += 2 * pkt.getlayer(ARP).plen
-
-        del pkt
-    elif ether_type == 32821:  # RARP (Reverse ARP)
-        pkt = Ether(buf[:20])
-        pkt.type = ETH_P_ARP  # Change to ARP so it works with scapy
-        pkt = Ether(pkt)
-        if not pkt.haslayer(ARP):
-            pkt.show()
-            raise RuntimeError(u"Incomplete RARP packet")
-
-        # len(eth) + arp(2 hw addr type + 2 proto addr type
-        #                + 1b len + 1b len + 2b operation)
-        pkt_len = 14 + 8
-        pkt_len += 2 * pkt.getlayer(ARP).hwlen
-        pkt_len += 2 * pkt.getlayer(ARP).plen
-
-        del pkt
+        # followed by two hardware and two protocol addresses.
+        hwlen, plen = buf[14 + 4], buf[14 + 5]
+        pkt_len = 14 + 8 + 2 * hwlen + 2 * plen
     else:
         raise RuntimeError(f"Unknown protocol {ether_type}")
 
@@ -210,7 +245,7 @@ class RxQueue(PacketVerifier):
     """
     def __init__(self, interface_name):
         PacketVerifier.__init__(self, interface_name)
-        self._sock = conf.L2listen(iface=interface_name, type=ETH_P_ALL)
+        self._sock = _get_socket(u"rx", interface_name)
 
     def recv(self, timeout=3, ignore=None, verbose=True):
         """Read next received packet.
@@ -223,6 +258,9 @@ class RxQueue(PacketVerifier):
         but otherwise ignored upon arrival, not adding to the timeout.
         Each time a packet is ignored, it is removed from the ignored list.
 
+        Received packets are compared to the ignored ones as bytes,
+        only the returned packet is dissected by scapy.
+
         :param timeout: How many seconds to wait for next packet.
         :param ignore: List of packets that should be ignored.
         :param verbose: Used to suppress detailed logging of received packets.
@@ -234,9 +272,8 @@ class RxQueue(PacketVerifier):
         :rtype: scapy.Ether
         """
         time_end = time.monotonic() + timeout
-        ignore = ignore if ignore else list()
-        # Auto pad all packets in ignore list
-        ignore = [str(auto_pad(ig_pkt)) for ig_pkt in ignore]
+        # Auto pad all packets in ignore list, count them by their bytes.
+        ignore = Counter(bytes(auto_pad(ig_pkt)) for ig_pkt in ignore or ())
         while 1:
             time_now = time.monotonic()
             if time_now >= time_end:
@@ -246,23 +283,44 @@ class RxQueue(PacketVerifier):
             if self._sock not in rlist:
                 # Might have been an interrupt.
                 continue
-            pkt = self._sock.recv(0x7fff)
-            pkt_pad = str(auto_pad(pkt))
-            print(f"Received packet on {self._ifname} of len {len(pkt)}")
-            if verbose:
-                if hasattr(pkt, u"show2"):
-                    pkt.show2()
-                else:
-                    # Never happens in practice, but Pylint does not know that.
-                    print(f"Unexpected instance: {pkt!r}")
-                print()
-            if pkt_pad in ignore:
-                ignore.remove(pkt_pad)
+            cls, raw, _ = self._sock.recv_raw(0x7fff)
+            if raw is None:
+                continue
+            print(f"Received packet on {self._ifname} of len {len(raw)}")
+            if ignore and _pop_ignored(cls, raw, ignore):
                 print(u"Received packet ignored.")
                 continue
+            pkt = cls(raw)
+            if verbose:
+                pkt.show2()
+                print()
             return pkt
 
 
+def _pop_ignored(cls, raw, ignore):
+    """Return True and decrease count if the received packet is ignored.
+
+    Raw bytes are looked up first, only short packets (which could have been
+    padded by auto_pad) are dissected and padded before second lookup.
+
+    :param cls: Scapy class to dissect the packet with.
+    :param raw: Received packet data.
+    :param ignore: Counts of ignored packets, by their padded bytes.
+    :type cls: type
+    :type raw: bytes
+    :type ignore: collections.Counter
+    :returns: True if the packet is to be ignored.
+    :rtype: bool
+    """
+    key = raw
+    if ignore[key] <= 0 and len(raw) < _MAX_PAD_LEN:
+        key = bytes(auto_pad(cls(raw)))
+    if ignore[key] <= 0:
+        return False
+    ignore[key] -= 1
+    return True
+
+
 class TxQueue(PacketVerifier):
     """Transmission queue object.
 
@@ -273,7 +331,7 @@ class TxQueue(PacketVerifier):
     """
     def __init__(self, interface_name):
         PacketVerifier.__init__(self, interface_name)
-        self._sock = conf.L2socket(iface=interface_name, type=ETH_P_ALL)
+        self._sock = _get_socket(u"tx", interface_name)
 
     def send(self, pkt, verbose=True):
         """Send packet out of the bound interface.
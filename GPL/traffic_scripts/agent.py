@@ -0,0 +1,263 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+#
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-or-later
+#
+# Licensed under the Apache License 2.0 or
+# GNU General Public License v2.0 or later;  you may not use this file
+# except in compliance with one of these Licenses. You
+# may obtain a copy of the Licenses at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#     https://www.gnu.org/licenses/old-licenses/gpl-2.0-standalone.html
+#
+# Note: If this file is linked with Scapy, which is GPLv2+, your use of it
+# must be under GPLv2+.  If at any point in the future it is no longer linked
+# with Scapy (or other GPLv2+ licensed software), you are free to choose Apache 2.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Resident traffic script agent.
+
+Starting a traffic script as a new process is expensive, mainly because
+of scapy import and raw socket creation. The agent is started once
+on the TG node (server mode), it preloads scapy and then runs
+traffic scripts on request, one at a time, in the agent process itself.
+So imported modules, configured interfaces and RX/TX sockets
+(cached by PacketVerifier, RX sockets are drained before re-use)
+are shared by all the scripts the agent runs.
+
+The script output is captured at file descriptor level, its exit code
+is taken from SystemExit. A script running longer than its timeout
+is interrupted by SIGALRM. A script hanging in C code, or crashing
+the interpreter, takes the agent down with it, which is the price
+for socket re-use. The agent is only used when TRAFFIC_SCRIPT_AGENT
+is enabled (see Constants).
+
+The client mode sends one request to the agent over a unix socket,
+prints the script output and exits with the script return code,
+so to the caller it looks like the script was run directly.
+
+  Example. ::
+
+    | $ python3 -m traffic_scripts.agent --socket /tmp/agent.sock --serve &
+    | $ python3 -m traffic_scripts.agent --socket /tmp/agent.sock \
+    |     --timeout 60 --call send_icmp_wait_for_reply --tx_if eth1 ...
+"""
+
+import argparse
+import importlib
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import traceback
+
+
+class ScriptTimeout(BaseException):
+    """Raised in the running traffic script when its timeout expires.
+
+    Not derived from Exception, so generic handlers in scripts
+    do not catch it.
+    """
+
+
+def _on_timeout(signum, frame):
+    """Signal handler interrupting the running traffic script.
+
+    :param signum: Signal number, unused.
+    :param frame: Interrupted stack frame, unused.
+    :type signum: int
+    :type frame: frame
+    :raises ScriptTimeout: Always.
+    """
+    raise ScriptTimeout()
+
+
+def _script_main(module, module_name, script_args):
+    """Run main function of the traffic script module, return exit code.
+
+    Command line arguments are set for the script and restored after.
+
+    :param module: Imported traffic script module.
+    :param module_name: Name of the module, used as program name.
+    :param script_args: Command line arguments of the traffic script.
+    :type module: module
+    :type module_name: str
+    :type script_args: list of str
+    :returns: Exit code of the script.
+    :rtype: int
+    """
+    saved_argv = sys.argv
+    sys.argv = [module_name] + list(script_args)
+    try:
+        module.main()
+    except SystemExit as exc:
+        if exc.code is None:
+            return 0
+        if isinstance(exc.code, int):
+            return exc.code
+        print(exc.code, file=sys.stderr)
+        return 1
+    except ScriptTimeout:
+        raise
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.argv = saved_argv
+    return 0
+
+
+def run_script(module_name, script_args, timeout):
+    """Run the traffic script in the agent process, return its results.
+
+    Standard output and error are redirected to temporary files
+    for the duration of the script, at file descriptor level (so also
+    output of child processes and C code is captured), and sys.stdout
+    and sys.stderr are replaced by streams writing there.
+
+    :param module_name: Module name relative to traffic_scripts package.
+    :param script_args: Command line arguments of the traffic script.
+    :param timeout: Interrupt the script if it runs longer than this [s].
+    :type module_name: str
+    :type script_args: list of str
+    :type timeout: float
+    :returns: Return code, stdout and stderr of the script.
+    :rtype: tuple(int, str, str)
+    """
+    module = importlib.import_module(f"{__package__}.{module_name}")
+    with tempfile.TemporaryFile() as out_file, \
+            tempfile.TemporaryFile() as err_file:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved_fds = os.dup(1), os.dup(2)
+        os.dup2(out_file.fileno(), 1)
+        os.dup2(err_file.fileno(), 2)
+        saved_streams = sys.stdout, sys.stderr
+        sys.stdout = open(1, u"wt", buffering=1, closefd=False)
+        sys.stderr = open(2, u"wt", buffering=1, closefd=False)
+        old_handler = signal.signal(signal.SIGALRM, _on_timeout)
+        message = u""
+        try:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+            ret_code = _script_main(module, module_name, script_args)
+        except ScriptTimeout:
+            ret_code = 128 + signal.SIGALRM
+            message = f"\nTraffic script interrupted after {timeout}s " \
+                f"timeout\n"
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, old_handler)
+            sys.stdout.close()
+            sys.stderr.close()
+            sys.stdout, sys.stderr = saved_streams
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            os.close(saved_fds[0])
+            os.close(saved_fds[1])
+        out_file.seek(0)
+        err_file.seek(0)
+        stdout = out_file.read().decode(u"utf-8", errors=u"replace")
+        stderr = err_file.read().decode(u"utf-8", errors=u"replace")
+    return ret_code, stdout, stderr + message
+
+
+def serve(socket_path):
+    """Preload scapy, then serve traffic script requests forever.
+
+    Requests are processed one at a time, each connection carries
+    one JSON encoded request line and one JSON encoded response line.
+
+    :param socket_path: Path of unix socket to listen on.
+    :type socket_path: str
+    """
+    # Preload scapy and the common traffic script code.
+    importlib.import_module(f"{__package__}.PacketVerifier")
+    importlib.import_module(f"{__package__}.TrafficScriptArg")
+    try:
+        os.unlink(socket_path)
+    except FileNotFoundError:
+        pass
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    server.listen(8)
+    with open(f"{socket_path}.pid", u"wt") as pid_file:
+        pid_file.write(f"{os.getpid()}\n")
+    while 1:
+        conn, _ = server.accept()
+        with conn, conn.makefile(u"rwb") as stream:
+            try:
+                request = json.loads(stream.readline())
+                result = run_script(
+                    request[u"module"], request[u"args"],
+                    float(request.get(u"timeout", 60))
+                )
+            except Exception:
+                result = 1, u"", traceback.format_exc()
+            response = dict(zip((u"rc", u"stdout", u"stderr"), result))
+            stream.write(json.dumps(response).encode(u"utf-8") + b"\n")
+            stream.flush()
+
+
+def call(socket_path, module_name, script_args, timeout):
+    """Send one request to the agent, print output, return the exit code.
+
+    :param socket_path: Path of unix socket the agent listens on.
+    :param module_name: Module name relative to traffic_scripts package.
+    :param script_args: Command line arguments of the traffic script.
+    :param timeout: Timeout for the traffic script [s].
+    :type socket_path: str
+    :type module_name: str
+    :type script_args: list of str
+    :type timeout: float
+    :returns: Exit code of the traffic script.
+    :rtype: int
+    """
+    request = dict(module=module_name, args=script_args, timeout=timeout)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        with client.makefile(u"rwb") as stream:
+            stream.write(json.dumps(request).encode(u"utf-8") + b"\n")
+            stream.flush()
+            response = json.loads(stream.readline())
+    sys.stdout.write(response[u"stdout"])
+    sys.stderr.write(response[u"stderr"])
+    return response[u"rc"]
+
+
+def main():
+    """Parse arguments, run in server or client mode."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        u"--socket", required=True, help=u"unix socket of the agent"
+    )
+    parser.add_argument(
+        u"--timeout", type=float, default=60.0,
+        help=u"traffic script timeout in seconds"
+    )
+    parser.add_argument(
+        u"--serve", action=u"store_true", help=u"run the agent"
+    )
+    parser.add_argument(
+        u"--call", nargs=argparse.REMAINDER,
+        help=u"traffic script module name followed by its arguments"
+    )
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.socket)
+    elif args.call:
+        sys.exit(call(args.socket, args.call[0], args.call[1:], args.timeout))
+    else:
+        parser.error(u"Either --serve or --call is required.")
+
+
+if __name__ == u"__main__":
+    main()
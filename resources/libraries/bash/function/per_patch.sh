@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Copyright (c) 2020 PANTHEON.tech s.r.o.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
@@ -107,11 +107,16 @@ function compare_test_results () {
 
     # Variables read:
     # - VPP_DIR - Path to directory with VPP git repo (at least built parts).
+    #   The parent commit is expected to be checked out.
     # - ARCHIVE_DIR - Path to where robot result files are created in.
     # - PYTHON_SCRIPTS_DIR - Path to directory holding comparison utility.
+    # - PERPATCH_CACHE_DIR - Directory with cached parent statistics.
+    #   Optional, defaults to perpatch_cache in VPP_DIR.
     # Directories recreated:
     # - csit_parent - Sibling to csit directory, for holding results
     #   of parent build.
+    # Directories updated:
+    # - ${PERPATCH_CACHE_DIR} - Parent statistics are stored there if missing.
     # Functions called:
     # - die - Print to stderr and exit, defined in common.sh
     # - parse_bmrr_results - See definition in this file.
@@ -122,8 +127,13 @@ function compare_test_results () {
     set -exuo pipefail
 
     cd "${VPP_DIR}" || die "Change directory operation failed."
+    parent_commit="$(git rev-parse HEAD)" || die "Git rev-parse failed."
+    cache_dir="${PERPATCH_CACHE_DIR:-${VPP_DIR}/perpatch_cache}"
     # Reusing CSIT main virtualenv.
-    python3 "${TOOLS_DIR}/integrated/compare_perpatch.py"
+    python3 "${TOOLS_DIR}/integrated/compare_perpatch.py" \
+        --parent-commit "${parent_commit}" \
+        --test-list "csit_current/0/tests.txt" \
+        --cache-dir "${cache_dir}"
     # The exit code determines the vote result.
 }
 
@@ -163,6 +173,7 @@ function parse_bmrr_results () {
     # - output.xml - From argument location.
     # Files updated:
     # - results.txt - (Re)created, in argument location.
+    # - tests.txt - (Re)created, test names in the same order, one per line.
     # Functions called:
     # - die - Print to stderr and exit, defined in common.sh
 
@@ -179,6 +190,12 @@ function parse_bmrr_results () {
     grep -o "${pattern}" "${in_file}" | grep -o '\[.*\]' > "${out_file}" || {
         die "Some parsing grep command has failed."
     }
+    names_file="${rel_dir}/tests.txt"
+    pattern='<test id="[^"]*" name="[^"]*"'
+    grep -o "${pattern}" "${in_file}" | grep -o 'name="[^"]*"' \
+        | cut -d '"' -f 2 > "${names_file}" || {
+        die "Some test name grep command has failed."
+    }
 }
 
 
@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -127,6 +127,14 @@ class Constants:
     # OpenVPP testing directory location at topology nodes
     REMOTE_FW_DIR = u"/tmp/openvpp-testing"
 
+    # Persistent cache of framework files (and TG virtualenv) for delta sync
+    REMOTE_FW_CACHE_DIR = u"/tmp/openvpp-testing-cache"
+
+    # Transfer only changed framework files to nodes, reuse TG virtualenv.
+    FRAMEWORK_DELTA_SYNC = get_pessimistic_bool_from_env(
+        u"FRAMEWORK_DELTA_SYNC"
+    )
+
     # shell scripts location
     RESOURCES_LIB_SH = u"resources/libraries/bash"
 
@@ -239,6 +247,13 @@ class Constants:
     PERF_TRIAL_LATENCY_DURATION = get_float_from_env(
         u"PERF_TRIAL_LATENCY_DURATION", 5.0)
 
+    # Wall-clock budget for one NDRPDR search, zero means fixed durations.
+    PERF_SEARCH_TIME_BUDGET = get_float_from_env(
+        u"PERF_SEARCH_TIME_BUDGET", 0.0)
+
+    # File to append per-test timing spans to (JSON lines), empty disables.
+    TEST_TIMING_FILE = get_str_from_env(u"TEST_TIMING_FILE", u"")
+
     # Extended debug (incl. vpp packet trace, linux perf stat, ...).
     # Full list is available as suite variable (__init__.robot) or is
     # override by test.
@@ -257,6 +272,27 @@ class Constants:
         u"FAIL_ON_CRC_MISMATCH"
     )
 
+    # Number of messages sent in one PAPI batch by bulk configuration keywords.
+    PAPI_BULK_CHUNK_SIZE = get_int_from_env(u"PAPI_BULK_CHUNK_SIZE", 10000)
+
+    # Number of runs (of consecutive commands of the same name) kept
+    # in PAPI history of a DUT, half at the start and half at the end.
+    PAPI_HISTORY_MAX_RUNS = get_int_from_env(u"PAPI_HISTORY_MAX_RUNS", 1000)
+
+    # Number of commands shown at the start and at the end of each run.
+    PAPI_HISTORY_RUN_EDGE = get_int_from_env(u"PAPI_HISTORY_RUN_EDGE", 2)
+
+    # Maximal number of unanswered messages in pipelined PAPI execution.
+    PAPI_PIPELINE_DEPTH = get_int_from_env(u"PAPI_PIPELINE_DEPTH", 256)
+
+    # Run traffic scripts via resident agent on TG, instead of new process.
+    # The agent re-uses scapy imports and RX/TX sockets across scripts.
+    # Off by default, set to true only on jobs running functional suites
+    # with the agent, until it is verified there for all traffic scripts.
+    TRAFFIC_SCRIPT_AGENT = get_pessimistic_bool_from_env(
+        u"TRAFFIC_SCRIPT_AGENT"
+    )
+
     # Default IP4 prefix length (if not defined in topology file)
     DEFAULT_IP4_PREFIX_LENGTH = u"24"
 
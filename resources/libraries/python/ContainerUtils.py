@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -25,6 +25,7 @@ from resources.libraries.python.Constants import Constants
 from resources.libraries.python.CpuUtils import CpuUtils
 from resources.libraries.python.PapiExecutor import PapiSocketExecutor
 from resources.libraries.python.ssh import SSH
+from resources.libraries.python.TestTiming import timed
 from resources.libraries.python.topology import Topology, SocketType
 from resources.libraries.python.VppConfigGenerator import VppConfigGenerator
 from resources.libraries.python.VPPUtil import VPPUtil
@@ -104,18 +105,21 @@ class ContainerManager:
             # Create container
             self.construct_container(i=i, **kwargs)
 
+    @timed(u"container")
     def acquire_all_containers(self):
         """Acquire all containers."""
         for container in self.containers:
             self.engine.container = self.containers[container]
             self.engine.acquire()
 
+    @timed(u"container")
     def build_all_containers(self):
         """Build all containers."""
         for container in self.containers:
             self.engine.container = self.containers[container]
             self.engine.build()
 
+    @timed(u"container")
     def create_all_containers(self):
         """Create all containers."""
         for container in self.containers:
@@ -143,6 +147,7 @@ class ContainerManager:
             self.engine.container = self.containers[container]
             self.engine.execute(command)
 
+    @timed(u"container")
     def start_vpp_in_all_containers(self, verify=True):
         """Start VPP in all containers."""
         for container in self.containers:
@@ -167,6 +172,7 @@ class ContainerManager:
                 container_object.api_socket,
             )
 
+    @timed(u"container")
     def restart_vpp_in_all_containers(self, verify=True):
         """Restart VPP in all containers."""
         self._disconnect_papi_to_all_containers()
@@ -190,6 +196,7 @@ class ContainerManager:
             self.engine.container = self.containers[container]
             self.engine.verify_vpp_papi()
 
+    @timed(u"container")
     def configure_vpp_in_all_containers(self, chain_topology, **kwargs):
         """Configure VPP in all containers.
 
@@ -510,6 +517,7 @@ class ContainerManager:
             vif1_mac=vif1_mac, vif2_mac=vif2_mac
         )
 
+    @timed(u"container")
     def stop_all_containers(self):
         """Stop all containers."""
         # TODO: Rework if containers can be affected outside ContainerManager.
@@ -518,6 +526,7 @@ class ContainerManager:
             self.engine.container = self.containers[container]
             self.engine.stop()
 
+    @timed(u"container")
     def destroy_all_containers(self):
         """Destroy all containers."""
         # TODO: Rework if containers can be affected outside ContainerManager.
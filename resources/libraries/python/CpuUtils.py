@@ -19,7 +19,150 @@ from resources.libraries.python.Constants import Constants
 from resources.libraries.python.ssh import exec_cmd_no_error
 from resources.libraries.python.topology import Topology
 
-__all__ = [u"CpuUtils"]
+__all__ = [u"CpuTopology", u"CpuUtils"]
+
+
+class CpuTopology:
+    """Indexes over CPU information of a node, with CPU reservations.
+
+    The indexes are computed once from lscpu rows (as stored in
+    node["cpuinfo"]), so repeated queries during density test setup
+    (many NFs, VMs or containers) do not scan the rows again.
+
+    Reservations map CPU numbers to an owner (any hashable label,
+    e.g. VM or container name), allowing to detect overlapping pinning.
+    Reserving is opt-in, only the allocator keywords (reserve_cpus,
+    release_cpus, allocate_cpus) make or consult reservations,
+    the affinity keywords keep their placement. Reservations are lost
+    when cpuinfo is re-read, as the topology is computed again.
+    """
+
+    def __init__(self, cpu_info):
+        """Compute the indexes.
+
+        :param cpu_info: CPU info, the output of "lscpu -p" as list of rows.
+        :type cpu_info: list of list of int
+        """
+        self.smt_enabled = CpuUtils.is_smt_enabled(cpu_info)
+        """Whether the caches are shared by two threads (SMT siblings)."""
+        self.numa_count = cpu_info[-1][3] + 1 if cpu_info else 0
+        """Count of NUMA nodes, as the NUMA of the last CPU plus one."""
+        self.cpus_per_numa = dict()
+        """Mapping from NUMA node to list of its CPUs in lscpu order."""
+        self.numa_per_cpu = dict()
+        """Mapping from CPU to its NUMA node."""
+        self.siblings = dict()
+        """Mapping from CPU to tuple of CPUs sharing its physical core."""
+        cores = dict()
+        for row in cpu_info:
+            cpu, core, socket, numa = row[:4]
+            self.cpus_per_numa.setdefault(numa, list()).append(cpu)
+            self.numa_per_cpu[cpu] = numa
+            cores.setdefault((socket, core), list()).append(cpu)
+        for core_cpus in cores.values():
+            for cpu in core_cpus:
+                self.siblings[cpu] = tuple(core_cpus)
+        self.reservations = dict()
+        """Mapping from reserved CPU to its owner."""
+
+    def cpu_list(self, cpu_node, smt_used=False):
+        """Return list of CPUs of the NUMA node.
+
+        If SMT is enabled but not used, only the first half is returned
+        (the first thread of each core).
+
+        :param cpu_node: NUMA node number.
+        :param smt_used: True - we want to use SMT, otherwise false.
+        :type cpu_node: int
+        :type smt_used: bool
+        :returns: List of CPU numbers (a new list, caller may modify it).
+        :rtype: list of int
+        :raises RuntimeError: If SMT is used but not enabled.
+        """
+        if not self.smt_enabled and smt_used:
+            raise RuntimeError(u"SMT is not enabled.")
+        cpu_list = self.cpus_per_numa.get(int(cpu_node), list())
+        if self.smt_enabled and not smt_used:
+            return cpu_list[:len(cpu_list) // CpuUtils.NR_OF_THREADS]
+        return list(cpu_list)
+
+    def reserve(self, cpus, owner):
+        """Mark the CPUs as used by the owner.
+
+        Reserving a CPU already reserved by the same owner is allowed.
+
+        :param cpus: CPU numbers to reserve.
+        :param owner: Label of the CPU user (e.g. VM or container name).
+        :type cpus: Iterable[int]
+        :type owner: Hashable
+        :raises RuntimeError: If a CPU is reserved by different owner,
+            or if it is not present on the node.
+        """
+        cpus = [int(cpu) for cpu in cpus]
+        for cpu in cpus:
+            if cpu not in self.numa_per_cpu:
+                raise RuntimeError(f"CPU {cpu} is not present on the node.")
+            current = self.reservations.get(cpu, owner)
+            if current != owner:
+                raise RuntimeError(
+                    f"CPU {cpu} requested by {owner!r} is already pinned"
+                    f" to {current!r}."
+                )
+        for cpu in cpus:
+            self.reservations[cpu] = owner
+
+    def release(self, owner):
+        """Remove all reservations of the owner.
+
+        :param owner: Label of the CPU user.
+        :type owner: Hashable
+        """
+        self.reservations = {
+            cpu: value for cpu, value in self.reservations.items()
+            if value != owner
+        }
+
+    def allocate(self, cpu_node, cpu_cnt, owner, skip_cnt=0, smt_used=False):
+        """Reserve first free CPUs of the NUMA node for the owner.
+
+        If smt_used, whole physical cores are allocated (all the siblings),
+        and cpu_cnt counts cores, otherwise only the first thread
+        of each core is considered.
+
+        :param cpu_node: NUMA node number.
+        :param cpu_cnt: Count of CPUs (or cores if smt_used) to allocate.
+        :param owner: Label of the CPU user (e.g. VM or container name).
+        :param skip_cnt: Skip first "skip_cnt" CPUs (cores if smt_used).
+        :param smt_used: True - we want to use SMT, otherwise false.
+        :type cpu_node: int
+        :type cpu_cnt: int
+        :type owner: Hashable
+        :type skip_cnt: int
+        :type smt_used: bool
+        :returns: Allocated CPU numbers, sibling threads after first threads.
+        :rtype: list of int
+        :raises RuntimeError: If not enough free CPUs are available.
+        """
+        cores = self.cpu_list(cpu_node, smt_used=False)[int(skip_cnt):]
+        chosen = list()
+        for cpu in cores:
+            if len(chosen) >= int(cpu_cnt):
+                break
+            group = self.siblings[cpu] if smt_used else (cpu,)
+            if any(item in self.reservations for item in group):
+                continue
+            chosen.append(group)
+        if len(chosen) < int(cpu_cnt):
+            raise RuntimeError(
+                f"Not enough free CPUs on NUMA {cpu_node} for {owner!r}."
+            )
+        width = max(len(group) for group in chosen) if chosen else 0
+        result = [
+            group[thread] for thread in range(width) for group in chosen
+            if thread < len(group)
+        ]
+        self.reserve(result, owner)
+        return result
 
 
 class CpuUtils:
@@ -53,14 +196,88 @@ class CpuUtils:
         :returns: True if SMT is enabled, False if SMT is disabled.
         :rtype: bool
         """
-        cpu_mems = [item[-4:] for item in cpu_info]
+        cpu_mems = [tuple(item[-4:]) for item in cpu_info]
         cpu_mems_len = len(cpu_mems) // CpuUtils.NR_OF_THREADS
+        second_half = set(cpu_mems[cpu_mems_len:])
         count = 0
         for cpu_mem in cpu_mems[:cpu_mems_len]:
-            if cpu_mem in cpu_mems[cpu_mems_len:]:
+            if cpu_mem in second_half:
                 count += 1
         return bool(count == cpu_mems_len)
 
+    @staticmethod
+    def get_cpu_topology(node):
+        """Return CPU topology indexes for the node, stored in the node.
+
+        The indexes are computed on first call after cpuinfo
+        of the node is (re)read, and stored as node["cpu_topology"],
+        subsequent calls return the same object (with its reservations).
+
+        :param node: Node dictionary with cpuinfo.
+        :type node: dict
+        :returns: CPU topology of the node.
+        :rtype: CpuTopology
+        :raises RuntimeError: If node cpuinfo is not available.
+        """
+        topology = node.get(u"cpu_topology")
+        if topology is None:
+            cpu_info = node.get(u"cpuinfo")
+            if cpu_info is None:
+                raise RuntimeError(u"Node cpuinfo not available.")
+            topology = CpuTopology(cpu_info)
+            node[u"cpu_topology"] = topology
+        return topology
+
+    @staticmethod
+    def reserve_cpus(node, cpus, owner):
+        """Mark CPUs of the node as pinned to the owner.
+
+        :param node: Node dictionary with cpuinfo.
+        :param cpus: CPU numbers to reserve.
+        :param owner: Label of the CPU user (e.g. VM or container name).
+        :type node: dict
+        :type cpus: list of int
+        :type owner: str
+        :raises RuntimeError: If a CPU is already pinned to different owner.
+        """
+        CpuUtils.get_cpu_topology(node).reserve(cpus, owner)
+
+    @staticmethod
+    def release_cpus(node, owner):
+        """Remove all CPU reservations of the owner on the node.
+
+        :param node: Node dictionary with cpuinfo.
+        :param owner: Label of the CPU user (e.g. VM or container name).
+        :type node: dict
+        :type owner: str
+        """
+        CpuUtils.get_cpu_topology(node).release(owner)
+
+    @staticmethod
+    def allocate_cpus(
+            node, cpu_node, cpu_cnt, owner, skip_cnt=0, smt_used=False):
+        """Reserve first free CPUs of the NUMA node for the owner.
+
+        :param node: Node dictionary with cpuinfo.
+        :param cpu_node: NUMA node number.
+        :param cpu_cnt: Count of CPUs (or cores if smt_used) to allocate.
+        :param owner: Label of the CPU user (e.g. VM or container name).
+        :param skip_cnt: Skip first "skip_cnt" CPUs (cores if smt_used).
+        :param smt_used: True - we want to use SMT, otherwise false.
+        :type node: dict
+        :type cpu_node: int
+        :type cpu_cnt: int
+        :type owner: str
+        :type skip_cnt: int
+        :type smt_used: bool
+        :returns: Allocated CPU numbers.
+        :rtype: list of int
+        :raises RuntimeError: If not enough free CPUs are available.
+        """
+        return CpuUtils.get_cpu_topology(node).allocate(
+            cpu_node, cpu_cnt, owner, skip_cnt=skip_cnt, smt_used=smt_used
+        )
+
     @staticmethod
     def get_cpu_info_from_all_nodes(nodes):
         """Assuming all nodes are Linux nodes, retrieve the following
@@ -78,6 +295,7 @@ class CpuUtils:
             node[u"arch"] = stdout.strip()
             stdout, _ = exec_cmd_no_error(node, u"lscpu -p")
             node[u"cpuinfo"] = list()
+            node.pop(u"cpu_topology", None)
             for line in stdout.split(u"\n"):
                 if line and line[0] != u"#":
                     node[u"cpuinfo"].append(
@@ -94,11 +312,7 @@ class CpuUtils:
         :rtype: int
         :raises RuntimeError: If node cpuinfo is not available.
         """
-        cpu_info = node.get(u"cpuinfo")
-        if cpu_info is not None:
-            return node[u"cpuinfo"][-1][3] + 1
-
-        raise RuntimeError(u"Node cpuinfo not available.")
+        return CpuUtils.get_cpu_topology(node).numa_count
 
     @staticmethod
     def cpu_list_per_node(node, cpu_node, smt_used=False):
@@ -115,28 +329,7 @@ class CpuUtils:
         :raises RuntimeError: If node cpuinfo is not available
             or if SMT is not enabled.
         """
-        cpu_node = int(cpu_node)
-        cpu_info = node.get(u"cpuinfo")
-        if cpu_info is None:
-            raise RuntimeError(u"Node cpuinfo not available.")
-
-        smt_enabled = CpuUtils.is_smt_enabled(cpu_info)
-        if not smt_enabled and smt_used:
-            raise RuntimeError(u"SMT is not enabled.")
-
-        cpu_list = []
-        for cpu in cpu_info:
-            if cpu[3] == cpu_node:
-                cpu_list.append(cpu[0])
-
-        if not smt_enabled or smt_enabled and smt_used:
-            pass
-
-        if smt_enabled and not smt_used:
-            cpu_list_len = len(cpu_list)
-            cpu_list = cpu_list[:cpu_list_len // CpuUtils.NR_OF_THREADS]
-
-        return cpu_list
+        return CpuUtils.get_cpu_topology(node).cpu_list(cpu_node, smt_used)
 
     @staticmethod
     def cpu_slice_of_list_per_node(
@@ -275,7 +468,7 @@ class CpuUtils:
         if not 1 <= nf_node <= nf_nodes:
             raise RuntimeError(u"NodeID is out of range!")
 
-        smt_used = CpuUtils.is_smt_enabled(node[u"cpuinfo"])
+        smt_used = CpuUtils.get_cpu_topology(node).smt_enabled
         cpu_list = CpuUtils.cpu_list_per_node(node, cpu_node, smt_used)
         # CPU thread sibling offset.
         sib = len(cpu_list) // CpuUtils.NR_OF_THREADS
@@ -439,7 +632,7 @@ class CpuUtils:
         else:
             cpu_node = 0
 
-        smt_used = CpuUtils.is_smt_enabled(node[u"cpuinfo"])
+        smt_used = CpuUtils.get_cpu_topology(node).smt_enabled
         if smt_used:
             cpu_cnt = cpu_cnt // CpuUtils.NR_OF_THREADS
 
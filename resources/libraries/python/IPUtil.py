@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -17,6 +17,7 @@ import re
 from enum import IntEnum
 
 from ipaddress import ip_address
+from robot.api import logger
 
 from resources.libraries.python.Constants import Constants
 from resources.libraries.python.InterfaceUtil import InterfaceUtil
@@ -24,7 +25,6 @@ from resources.libraries.python.IPAddress import IPAddress
 from resources.libraries.python.PapiExecutor import PapiSocketExecutor
 from resources.libraries.python.ssh import exec_cmd_no_error, exec_cmd
 from resources.libraries.python.topology import Topology
-from resources.libraries.python.VatExecutor import VatTerminal
 from resources.libraries.python.Namespaces import Namespaces
 
 
@@ -669,47 +669,133 @@ class IPUtil:
         :type prefix_len: int
         :type kwargs: dict
         """
-        count = kwargs.get(u"count", 1)
-
-        if count > 100:
-            gateway = kwargs.get(u"gateway", '')
-            interface = kwargs.get(u"interface", '')
-            vrf = kwargs.get(u"vrf", None)
-            multipath = kwargs.get(u"multipath", False)
-
-            with VatTerminal(node, json_param=False) as vat:
-
-                vat.vat_terminal_exec_cmd_from_template(
-                    u"vpp_route_add.vat",
-                    network=network,
-                    prefix_length=prefix_len,
-                    via=f"via {gateway}" if gateway else u"",
-                    sw_if_index=f"sw_if_index "
-                    f"{InterfaceUtil.get_interface_index(node, interface)}"
-                    if interface else u"",
-                    vrf=f"vrf {vrf}" if vrf else u"",
-                    count=f"count {count}" if count else u"",
-                    multipath=u"multipath" if multipath else u""
-                )
-            return
+        count = kwargs.pop(u"count", 1)
+        IPUtil.vpp_route_add_bulk(
+            node, network, prefix_len, count, increment=1, **kwargs
+        )
+
+    @staticmethod
+    def vpp_route_add_bulk(
+            node, network, prefix_len, count, increment=None, verify=False,
+            chunk_size=Constants.PAPI_BULK_CHUNK_SIZE, **kwargs):
+        """Add a range of routes with identical paths to the VPP node.
+
+        The i-th route has destination network address
+        network + i * increment, the prefix length is the same for all routes.
+        By default the increment is the size of the prefix,
+        so the routes cover adjacent non-overlapping networks.
+
+        The route structure (including path and interface lookup)
+        is composed only once, the routes differ only in the prefix object.
+        The messages are sent in chunks (using batch PAPI commands),
+        progress is logged after each chunk.
+        Replies are checked for retval but not kept.
+
+        If verify is True, FIB summary is read after programming
+        and it is checked the table contains at least count routes
+        of the given prefix length.
 
+        :param node: VPP node.
+        :param network: Destination network address of the first route.
+        :param prefix_len: Route destination network prefix length.
+        :param count: Number of routes to add.
+        :param increment: Address increment between routes, None means
+            the size of the prefix.
+        :param verify: Whether to check the routes are present in FIB.
+        :param chunk_size: Number of routes sent in one batch.
+        :param kwargs: Optional key-value arguments,
+            see compose_vpp_route_structure.
+        :type node: dict
+        :type network: str
+        :type prefix_len: int
+        :type count: int
+        :type increment: Optional[int]
+        :type verify: bool
+        :type chunk_size: int
+        :type kwargs: dict
+        :raises RuntimeError: If verification fails.
+        """
+        count = int(count)
+        prefix_len = int(prefix_len)
         net_addr = ip_address(network)
+        if increment is None:
+            increment = 1 << (net_addr.max_prefixlen - prefix_len)
+        increment = int(increment)
+        route = IPUtil.compose_vpp_route_structure(
+            node, net_addr, prefix_len, **kwargs
+        )
         cmd = u"ip_route_add_del"
         args = dict(
             is_add=True,
-            is_multipath=kwargs.get(u"multipath", False),
-            route=None
+            is_multipath=kwargs.get(u"multipath", False)
         )
         err_msg = f"Failed to add route(s) on host {node[u'host']}"
 
         with PapiSocketExecutor(node) as papi_exec:
-            for i in range(kwargs.get(u"count", 1)):
-                args[u"route"] = IPUtil.compose_vpp_route_structure(
-                    node, net_addr + i, prefix_len, **kwargs
-                )
-                history = bool(not 1 < i < kwargs.get(u"count", 1))
-                papi_exec.add(cmd, history=history, **args)
-            papi_exec.get_replies(err_msg)
+            for start in range(0, count, chunk_size):
+                stop = min(start + chunk_size, count)
+                routes = [
+                    dict(
+                        route, prefix=IPUtil.create_prefix_object(
+                            net_addr + i * increment, prefix_len
+                        )
+                    ) for i in range(start, stop)
+                ]
+                papi_exec.add_batch(
+                    cmd, dict(route=routes), keep_replies=False, **args
+                ).get_replies(err_msg)
+                if count > chunk_size:
+                    logger.debug(
+                        f"Added {stop}/{count} routes on host {node[u'host']}"
+                    )
+        if verify:
+            IPUtil.verify_fib_prefix_count(
+                node, prefix_len, count, net_addr.version,
+                vrf=kwargs.get(u"vrf", 0)
+            )
+
+    @staticmethod
+    def verify_fib_prefix_count(node, prefix_len, count, version=4, vrf=0):
+        """Check FIB table contains enough prefixes of the given length.
+
+        The FIB summary CLI output is parsed, so even huge tables
+        are checked without dumping all the routes.
+
+        :param node: VPP node.
+        :param prefix_len: Prefix length to check.
+        :param count: Minimal expected number of prefixes.
+        :param version: IP version of the FIB table.
+        :param vrf: VRF table ID.
+        :type node: dict
+        :type prefix_len: int
+        :type count: int
+        :type version: int
+        :type vrf: int
+        :raises RuntimeError: If the FIB table contains less prefixes.
+        """
+        ip_ver = u"ip6" if int(version) == 6 else u"ip"
+        reply = PapiSocketExecutor.run_cli_cmd(
+            node, f"show {ip_ver} fib summary", log=False
+        )
+        found = 0
+        in_table = False
+        for line in reply.splitlines():
+            header = re.search(r"^ipv[46]-VRF:(\d+),", line)
+            if header:
+                in_table = int(header.group(1)) == int(vrf)
+                continue
+            counts = re.search(r"^\s+(\d+)\s+(\d+)\s*$", line)
+            if in_table and counts and int(counts.group(1)) == int(prefix_len):
+                found = int(counts.group(2))
+        if found < int(count):
+            raise RuntimeError(
+                f"Expected at least {count} /{prefix_len} prefixes in VRF {vrf}"
+                f" on host {node[u'host']}, found {found}"
+            )
+        logger.debug(
+            f"Found {found} /{prefix_len} prefixes in VRF {vrf} "
+            f"on host {node[u'host']}"
+        )
 
     @staticmethod
     def flush_ip_addresses(node, interface):
@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -13,9 +13,8 @@
 
 """IPsec utilities library."""
 
-import os
-
 from enum import Enum, IntEnum
+from functools import partial
 from io import open
 from random import choice
 from string import ascii_letters
@@ -30,7 +29,6 @@ from resources.libraries.python.IPUtil import IPUtil, IpDscp, MPLS_LABEL_INVALID
 from resources.libraries.python.PapiExecutor import PapiSocketExecutor
 from resources.libraries.python.ssh import scp_node
 from resources.libraries.python.topology import Topology
-from resources.libraries.python.VatExecutor import VatExecutor
 
 
 IPSEC_UDP_PORT_NONE = 0xffff
@@ -442,27 +440,21 @@ class IPsecUtil:
             else 1 << (32 - 24)
 
         if int(n_entries) > 10:
-            tmp_filename = f"/tmp/ipsec_sad_{sad_id}_add_del_entry.script"
-
-            with open(tmp_filename, 'w') as tmp_file:
-                for i in range(n_entries):
-                    integ = f"integ-alg {integ_alg.alg_name} " \
-                        f"integ-key {integ_key.hex()}" \
-                        if integ_alg else u""
-                    tunnel = f"tunnel-src {src_addr + i * addr_incr} " \
-                        f"tunnel-dst {dst_addr + i * addr_incr}" \
-                        if tunnel_src and tunnel_dst else u""
-                    conf = f"exec ipsec sa add {sad_id + i} esp spi {spi + i} "\
-                        f"crypto-alg {crypto_alg.alg_name} " \
-                        f"crypto-key {crypto_key.hex()} " \
-                        f"{integ} {tunnel}\n"
-                    tmp_file.write(conf)
-            vat = VatExecutor()
-            vat.execute_script(
-                tmp_filename, node, timeout=300, json_out=False,
-                copy_on_execute=True
-            )
-            os.remove(tmp_filename)
+            cli_cmds = list()
+            for i in range(n_entries):
+                integ = f"integ-alg {integ_alg.alg_name} " \
+                    f"integ-key {integ_key.hex()}" \
+                    if integ_alg else u""
+                tunnel = f"tunnel-src {src_addr + i * addr_incr} " \
+                    f"tunnel-dst {dst_addr + i * addr_incr}" \
+                    if tunnel_src and tunnel_dst else u""
+                cli_cmds.append(
+                    f"ipsec sa add {sad_id + i} esp spi {spi + i} "
+                    f"crypto-alg {crypto_alg.alg_name} "
+                    f"crypto-key {crypto_key.hex()} "
+                    f"{integ} {tunnel}"
+                )
+            PapiSocketExecutor.run_cli_cmds(node, cli_cmds)
             return
 
         ckey = dict(
@@ -546,22 +538,19 @@ class IPsecUtil:
             else 1 << (32 - raddr_range)
 
         if int(n_tunnels) > 10:
-            tmp_filename = u"/tmp/ipsec_set_ip.script"
-
-            with open(tmp_filename, 'w') as tmp_file:
-                if_name = Topology.get_interface_name(node, interface)
-                for i in range(n_tunnels):
-                    conf = f"exec set interface ip address {if_name} " \
-                        f"{tunnel_src + i * addr_incr}/{raddr_range}\n" \
-                        f"exec ip route add {traffic_addr + i}/" \
-                        f"{128 if traffic_addr.version == 6 else 32} " \
-                        f"via {tunnel_dst + i * addr_incr} {if_name}\n"
-                    tmp_file.write(conf)
-            VatExecutor().execute_script(
-                tmp_filename, node, timeout=300, json_out=False,
-                copy_on_execute=True
-            )
-            os.remove(tmp_filename)
+            cli_cmds = list()
+            if_name = Topology.get_interface_name(node, interface)
+            for i in range(n_tunnels):
+                cli_cmds.append(
+                    f"set interface ip address {if_name} "
+                    f"{tunnel_src + i * addr_incr}/{raddr_range}"
+                )
+                cli_cmds.append(
+                    f"ip route add {traffic_addr + i}/"
+                    f"{128 if traffic_addr.version == 6 else 32} "
+                    f"via {tunnel_dst + i * addr_incr} {if_name}"
+                )
+            PapiSocketExecutor.run_cli_cmds(node, cli_cmds)
             return
 
         cmd1 = u"sw_interface_add_del_address"
@@ -751,23 +740,18 @@ class IPsecUtil:
         """
         raddr_ip = ip_address(raddr_ip)
         if int(n_entries) > 10:
-            tmp_filename = f"/tmp/ipsec_spd_{sa_id}_add_del_entry.script"
-
-            with open(tmp_filename, 'w') as tmp_file:
-                for i in range(n_entries):
-                    direction = u'inbound' if inbound else u'outbound'
-                    tunnel = f"exec ipsec policy add spd {spd_id} " \
-                        f"priority {priority} {direction} " \
-                        f"action protect sa {sa_id+i} " \
-                        f"remote-ip-range {raddr_ip + i * (raddr_range + 1)} " \
-                        f"- {raddr_ip + (i  + 1) * raddr_range + i} " \
-                        f"local-ip-range 0.0.0.0 - 255.255.255.255\n"
-                    tmp_file.write(tunnel)
-            VatExecutor().execute_script(
-                tmp_filename, node, timeout=300, json_out=False,
-                copy_on_execute=True
-            )
-            os.remove(tmp_filename)
+            direction = u"inbound" if inbound else u"outbound"
+            cli_cmds = list()
+            for i in range(n_entries):
+                cli_cmds.append(
+                    f"ipsec policy add spd {spd_id} "
+                    f"priority {priority} {direction} "
+                    f"action protect sa {sa_id+i} "
+                    f"remote-ip-range {raddr_ip + i * (raddr_range + 1)} "
+                    f"- {raddr_ip + (i  + 1) * raddr_range + i} "
+                    f"local-ip-range 0.0.0.0 - 255.255.255.255"
+                )
+            PapiSocketExecutor.run_cli_cmds(node, cli_cmds)
             return
 
         laddr_range = u"::/0" if raddr_ip.version == 6 else u"0.0.0.0/0"
@@ -812,10 +796,40 @@ class IPsecUtil:
             papi_exec.get_replies(err_msg)
 
     @staticmethod
-    def _ipsec_create_tunnel_interfaces_dut1_vat(
-            nodes, tun_ips, if1_key, if2_key, n_tunnels, crypto_alg, integ_alg,
-            raddr_ip2, addr_incr, spi_d, existing_tunnels=0):
-        """Create multiple IPsec tunnel interfaces on DUT1 node using VAT.
+    def _ipsec_generate_keys(
+            crypto_alg, integ_alg, n_tunnels, existing_tunnels):
+        """Generate random keys for tunnels to be created.
+
+        Existing tunnels get empty placeholders,
+        so the lists can be indexed by tunnel number.
+        Integrity keys are generated only if integrity algorithm is set.
+
+        :param crypto_alg: The encryption algorithm name.
+        :param integ_alg: The integrity algorithm name.
+        :param n_tunnels: Number of tunnel interfaces to be there at the end.
+        :param existing_tunnels: Number of tunnel interfaces before creation.
+        :type crypto_alg: CryptoAlg
+        :type integ_alg: IntegAlg
+        :type n_tunnels: int
+        :type existing_tunnels: int
+        :returns: Encryption keys and integrity keys.
+        :rtype: Tuple[List[bytes], List[bytes]]
+        """
+        ckeys = [bytes()] * existing_tunnels
+        ikeys = [bytes()] * existing_tunnels
+        for _ in range(existing_tunnels, n_tunnels):
+            ckeys.append(gen_key(IPsecUtil.get_crypto_alg_key_len(crypto_alg)))
+            if integ_alg:
+                ikeys.append(
+                    gen_key(IPsecUtil.get_integ_alg_key_len(integ_alg))
+                )
+        return ckeys, ikeys
+
+    @staticmethod
+    def _ipsec_create_tunnel_interfaces_dut1_cli(
+            nodes, tun_ips, if1_key, if2_key, n_tunnels, crypto_alg, ckeys,
+            integ_alg, ikeys, raddr_ip2, addr_incr, spi_d, existing_tunnels=0):
+        """Create multiple IPsec tunnel interfaces on DUT1 node using CLI.
 
         :param nodes: VPP nodes to create tunnel interfaces.
         :param tun_ips: Dictionary with VPP node 1 ipsec tunnel interface
@@ -826,7 +840,9 @@ class IPsecUtil:
             interface key from topology file.
         :param n_tunnels: Number of tunnel interfaces to be there at the end.
         :param crypto_alg: The encryption algorithm name.
+        :param ckeys: List of encryption keys.
         :param integ_alg: The integrity algorithm name.
+        :param ikeys: List of integrity keys.
         :param raddr_ip2: Policy selector remote IPv4/IPv6 start address for the
             first tunnel in direction node2->node1.
         :param spi_d: Dictionary with SPIs for VPP node 1 and VPP node 2.
@@ -839,99 +855,77 @@ class IPsecUtil:
         :type if2_key: str
         :type n_tunnels: int
         :type crypto_alg: CryptoAlg
+        :type ckeys: list
         :type integ_alg: IntegAlg
+        :type ikeys: list
         :type raddr_ip2: IPv4Address or IPv6Address
         :type addr_incr: int
         :type spi_d: dict
         :type existing_tunnels: int
         """
-        tmp_fn1 = u"/tmp/ipsec_create_tunnel_dut1.config"
         if1_n = Topology.get_interface_name(nodes[u"DUT1"], if1_key)
 
-        ckeys = [bytes()] * existing_tunnels
-        ikeys = [bytes()] * existing_tunnels
-
-        vat = VatExecutor()
-        with open(tmp_fn1, u"w") as tmp_f1:
-            rmac = Topology.get_interface_mac(nodes[u"DUT2"], if2_key) \
-                if u"DUT2" in nodes.keys() \
-                else Topology.get_interface_mac(nodes[u"TG"], if2_key)
-            if not existing_tunnels:
-                tmp_f1.write(
-                    f"exec create loopback interface\n"
-                    f"exec set interface state loop0 up\n"
-                    f"exec set interface ip address {if1_n} "
-                    f"{tun_ips[u'ip2'] - 1}/"
-                    f"{len(tun_ips[u'ip2'].packed)*8*3//4}\n"
-                    f"exec set ip neighbor {if1_n} {tun_ips[u'ip2']} {rmac} "
-                    f"static\n"
-                )
-            for i in range(existing_tunnels, n_tunnels):
-                ckeys.append(
-                    gen_key(IPsecUtil.get_crypto_alg_key_len(crypto_alg))
-                )
-                if integ_alg:
-                    ikeys.append(
-                        gen_key(IPsecUtil.get_integ_alg_key_len(integ_alg))
-                    )
-                    integ = f"integ-alg {integ_alg.alg_name} " \
-                        f"integ-key {ikeys[i].hex()} "
-                else:
-                    integ = u""
-                tmp_f1.write(
-                    f"exec set interface ip address loop0 "
-                    f"{tun_ips[u'ip1'] + i * addr_incr}/32\n"
-                    f"exec create ipip tunnel "
-                    f"src {tun_ips[u'ip1'] + i * addr_incr} "
-                    f"dst {tun_ips[u'ip2']} "
-                    f"p2p\n"
-                    f"exec ipsec sa add {i} "
-                    f"spi {spi_d[u'spi_1'] + i} "
-                    f"crypto-alg {crypto_alg.alg_name} "
-                    f"crypto-key {ckeys[i].hex()} "
-                    f"{integ}"
-                    f"esp\n"
-                    f"exec ipsec sa add {100000 + i} "
-                    f"spi {spi_d[u'spi_2'] + i} "
-                    f"crypto-alg {crypto_alg.alg_name} "
-                    f"crypto-key {ckeys[i].hex()} "
-                    f"{integ}"
-                    f"esp\n"
-                    f"exec ipsec tunnel protect ipip{i} "
-                    f"sa-out {i} "
-                    f"sa-in {100000 + i} "
-                    f"add\n"
-                )
-        vat.execute_script(
-            tmp_fn1, nodes[u"DUT1"], timeout=1800, json_out=False,
-            copy_on_execute=True,
-            history=bool(n_tunnels < 100)
-        )
-        os.remove(tmp_fn1)
-
-        with open(tmp_fn1, 'w') as tmp_f1:
-            for i in range(existing_tunnels, n_tunnels):
-                tmp_f1.write(
-                    f"exec set interface unnumbered ipip{i} use {if1_n}\n"
-                    f"exec set interface state ipip{i} up\n"
-                    f"exec ip route add "
-                    f"{raddr_ip2 + i}/{len(raddr_ip2.packed)*8} "
-                    f"via ipip{i}\n"
-                )
-        vat.execute_script(
-            tmp_fn1, nodes[u"DUT1"], timeout=1800, json_out=False,
-            copy_on_execute=True,
-            history=bool(n_tunnels < 100)
+        cli_cmds = list()
+        rmac = Topology.get_interface_mac(nodes[u"DUT2"], if2_key) \
+            if u"DUT2" in nodes.keys() \
+            else Topology.get_interface_mac(nodes[u"TG"], if2_key)
+        if not existing_tunnels:
+            cli_cmds.extend((
+                u"create loopback interface",
+                u"set interface state loop0 up",
+                f"set interface ip address {if1_n} "
+                f"{tun_ips[u'ip2'] - 1}/"
+                f"{len(tun_ips[u'ip2'].packed)*8*3//4}",
+                f"set ip neighbor {if1_n} {tun_ips[u'ip2']} {rmac} static",
+            ))
+        for i in range(existing_tunnels, n_tunnels):
+            if integ_alg:
+                integ = f"integ-alg {integ_alg.alg_name} " \
+                    f"integ-key {ikeys[i].hex()} "
+            else:
+                integ = u""
+            cli_cmds.extend((
+                f"set interface ip address loop0 "
+                f"{tun_ips[u'ip1'] + i * addr_incr}/32",
+                f"create ipip tunnel "
+                f"src {tun_ips[u'ip1'] + i * addr_incr} "
+                f"dst {tun_ips[u'ip2']} "
+                f"p2p",
+                f"ipsec sa add {i} "
+                f"spi {spi_d[u'spi_1'] + i} "
+                f"crypto-alg {crypto_alg.alg_name} "
+                f"crypto-key {ckeys[i].hex()} "
+                f"{integ}"
+                f"esp",
+                f"ipsec sa add {100000 + i} "
+                f"spi {spi_d[u'spi_2'] + i} "
+                f"crypto-alg {crypto_alg.alg_name} "
+                f"crypto-key {ckeys[i].hex()} "
+                f"{integ}"
+                f"esp",
+                f"ipsec tunnel protect ipip{i} "
+                f"sa-out {i} "
+                f"sa-in {100000 + i} "
+                f"add",
+            ))
+        # Commands are executed in order, tunnels exist when referenced.
+        for i in range(existing_tunnels, n_tunnels):
+            cli_cmds.extend((
+                f"set interface unnumbered ipip{i} use {if1_n}",
+                f"set interface state ipip{i} up",
+                f"ip route add "
+                f"{raddr_ip2 + i}/{len(raddr_ip2.packed)*8} "
+                f"via ipip{i}",
+            ))
+        PapiSocketExecutor.run_cli_cmds(
+            nodes[u"DUT1"], cli_cmds, history=bool(n_tunnels < 100)
         )
-        os.remove(tmp_fn1)
-
-        return ckeys, ikeys
 
     @staticmethod
-    def _ipsec_create_tunnel_interfaces_dut2_vat(
+    def _ipsec_create_tunnel_interfaces_dut2_cli(
             nodes, tun_ips, if2_key, n_tunnels, crypto_alg, ckeys, integ_alg,
             ikeys, raddr_ip1, addr_incr, spi_d, existing_tunnels=0):
-        """Create multiple IPsec tunnel interfaces on DUT2 node using VAT.
+        """Create multiple IPsec tunnel interfaces on DUT2 node using CLI.
 
         :param nodes: VPP nodes to create tunnel interfaces.
         :param tun_ips: Dictionary with VPP node 1 ipsec tunnel interface
@@ -960,71 +954,58 @@ class IPsecUtil:
         :type spi_d: dict
         :type existing_tunnels: int
         """
-        tmp_fn2 = u"/tmp/ipsec_create_tunnel_dut2.config"
         if2_n = Topology.get_interface_name(nodes[u"DUT2"], if2_key)
 
-        vat = VatExecutor()
-        with open(tmp_fn2, 'w') as tmp_f2:
-            if not existing_tunnels:
-                tmp_f2.write(
-                    f"exec set interface ip address {if2_n}"
-                    f" {tun_ips[u'ip2']}/{len(tun_ips[u'ip2'].packed)*8*3/4}\n"
-                )
-            for i in range(existing_tunnels, n_tunnels):
-                if integ_alg:
-                    integ = f"integ-alg {integ_alg.alg_name} " \
-                        f"integ-key {ikeys[i].hex()} "
-                else:
-                    integ = u""
-                tmp_f2.write(
-                    f"exec create ipip tunnel "
-                    f"src {tun_ips[u'ip2']} "
-                    f"dst {tun_ips[u'ip1'] + i * addr_incr} "
-                    f"p2p\n"
-                    f"exec ipsec sa add {100000 + i} "
-                    f"spi {spi_d[u'spi_2'] + i} "
-                    f"crypto-alg {crypto_alg.alg_name} "
-                    f"crypto-key {ckeys[i].hex()} "
-                    f"{integ}"
-                    f"esp\n"
-                    f"exec ipsec sa add {i} "
-                    f"spi {spi_d[u'spi_1'] + i} "
-                    f"crypto-alg {crypto_alg.alg_name} "
-                    f"crypto-key {ckeys[i].hex()} "
-                    f"{integ}"
-                    f"esp\n"
-                    f"exec ipsec tunnel protect ipip{i} "
-                    f"sa-out {100000 + i} "
-                    f"sa-in {i} "
-                    f"add\n"
-                )
-        vat.execute_script(
-            tmp_fn2, nodes[u"DUT2"], timeout=1800, json_out=False,
-            copy_on_execute=True,
-            history=bool(n_tunnels < 100)
-        )
-        os.remove(tmp_fn2)
-
-        with open(tmp_fn2, 'w') as tmp_f2:
-            if not existing_tunnels:
-                tmp_f2.write(
-                    f"exec ip route add {tun_ips[u'ip1']}/8 "
-                    f"via {tun_ips[u'ip2'] - 1} {if2_n}\n"
-                )
-            for i in range(existing_tunnels, n_tunnels):
-                tmp_f2.write(
-                    f"exec set interface unnumbered ipip{i} use {if2_n}\n"
-                    f"exec set interface state ipip{i} up\n"
-                    f"exec ip route add "
-                    f"{raddr_ip1 + i}/{len(raddr_ip1.packed)*8} "
-                    f"via ipip{i}\n"
-                )
-        vat.execute_script(
-            tmp_fn2, nodes[u"DUT2"], timeout=1800, json_out=False,
-            copy_on_execute=True,
-            history=bool(n_tunnels < 100)
+        cli_cmds = list()
+        if not existing_tunnels:
+            cli_cmds.append(
+                f"set interface ip address {if2_n} "
+                f"{tun_ips[u'ip2']}/{len(tun_ips[u'ip2'].packed)*8*3//4}"
+            )
+        for i in range(existing_tunnels, n_tunnels):
+            if integ_alg:
+                integ = f"integ-alg {integ_alg.alg_name} " \
+                    f"integ-key {ikeys[i].hex()} "
+            else:
+                integ = u""
+            cli_cmds.extend((
+                f"create ipip tunnel "
+                f"src {tun_ips[u'ip2']} "
+                f"dst {tun_ips[u'ip1'] + i * addr_incr} "
+                f"p2p",
+                f"ipsec sa add {100000 + i} "
+                f"spi {spi_d[u'spi_2'] + i} "
+                f"crypto-alg {crypto_alg.alg_name} "
+                f"crypto-key {ckeys[i].hex()} "
+                f"{integ}"
+                f"esp",
+                f"ipsec sa add {i} "
+                f"spi {spi_d[u'spi_1'] + i} "
+                f"crypto-alg {crypto_alg.alg_name} "
+                f"crypto-key {ckeys[i].hex()} "
+                f"{integ}"
+                f"esp",
+                f"ipsec tunnel protect ipip{i} "
+                f"sa-out {100000 + i} "
+                f"sa-in {i} "
+                f"add",
+            ))
+        if not existing_tunnels:
+            cli_cmds.append(
+                f"ip route add {tun_ips[u'ip1']}/8 "
+                f"via {tun_ips[u'ip2'] - 1} {if2_n}"
+            )
+        for i in range(existing_tunnels, n_tunnels):
+            cli_cmds.extend((
+                f"set interface unnumbered ipip{i} use {if2_n}",
+                f"set interface state ipip{i} up",
+                f"ip route add "
+                f"{raddr_ip1 + i}/{len(raddr_ip1.packed)*8} "
+                f"via ipip{i}",
+            ))
+        PapiSocketExecutor.run_cli_cmds(
+            nodes[u"DUT2"], cli_cmds, history=bool(n_tunnels < 100)
         )
-        os.remove(tmp_fn2)
 
     @staticmethod
     def _ipsec_create_loopback_dut1_papi(nodes, tun_ips, if1_key, if2_key):
@@ -1102,8 +1083,8 @@ class IPsecUtil:
 
     @staticmethod
     def _ipsec_create_tunnel_interfaces_dut1_papi(
-            nodes, tun_ips, if1_key, if2_key, n_tunnels, crypto_alg, integ_alg,
-            raddr_ip2, addr_incr, spi_d, existing_tunnels=0):
+            nodes, tun_ips, if1_key, if2_key, n_tunnels, crypto_alg, ckeys,
+            integ_alg, ikeys, raddr_ip2, addr_incr, spi_d, existing_tunnels=0):
         """Create multiple IPsec tunnel interfaces on DUT1 node using PAPI.
 
         :param nodes: VPP nodes to create tunnel interfaces.
@@ -1115,7 +1096,9 @@ class IPsecUtil:
             interface key from topology file.
         :param n_tunnels: Number of tunnel interfaces to be there at the end.
         :param crypto_alg: The encryption algorithm name.
+        :param ckeys: List of encryption keys.
         :param integ_alg: The integrity algorithm name.
+        :param ikeys: List of integrity keys.
         :param raddr_ip2: Policy selector remote IPv4/IPv6 start address for the
             first tunnel in direction node2->node1.
         :param spi_d: Dictionary with SPIs for VPP node 1 and VPP node 2.
@@ -1128,7 +1111,9 @@ class IPsecUtil:
         :type if2_key: str
         :type n_tunnels: int
         :type crypto_alg: CryptoAlg
+        :type ckeys: list
         :type integ_alg: IntegAlg
+        :type ikeys: list
         :type raddr_ip2: IPv4Address or IPv6Address
         :type addr_incr: int
         :type spi_d: dict
@@ -1148,17 +1133,17 @@ class IPsecUtil:
             args = dict(
                 sw_if_index=loop_sw_if_idx,
                 is_add=True,
-                del_all=False,
-                prefix=None
+                del_all=False
             )
-            for i in range(existing_tunnels, n_tunnels):
-                args[u"prefix"] = IPUtil.create_prefix_object(
+            prefixes = [
+                IPUtil.create_prefix_object(
                     tun_ips[u"ip1"] + i * addr_incr,
                     128 if tun_ips[u"ip1"].version == 6 else 32
-                )
-                papi_exec.add(
-                    cmd, history=bool(not 1 < i < n_tunnels - 2), **args
-                )
+                ) for i in range(existing_tunnels, n_tunnels)
+            ]
+            papi_exec.add_batch(
+                cmd, dict(prefix=prefixes), keep_replies=False, **args
+            )
             # Configure IPIP tunnel interfaces
             cmd = u"ipip_add_tunnel"
             ipip_tunnel = dict(
@@ -1196,8 +1181,6 @@ class IPsecUtil:
                 ]
             )
             # Configure IPSec SAD entries
-            ckeys = [bytes()] * existing_tunnels
-            ikeys = [bytes()] * existing_tunnels
             cmd = u"ipsec_sad_entry_add_del_v2"
             c_key = dict(
                 length=0,
@@ -1232,13 +1215,6 @@ class IPsecUtil:
                 entry=sad_entry
             )
             for i in range(existing_tunnels, n_tunnels):
-                ckeys.append(
-                    gen_key(IPsecUtil.get_crypto_alg_key_len(crypto_alg))
-                )
-                if integ_alg:
-                    ikeys.append(
-                        gen_key(IPsecUtil.get_integ_alg_key_len(integ_alg))
-                    )
                 # SAD entry for outband / tx path
                 args[u"entry"][u"sad_id"] = i
                 args[u"entry"][u"spi"] = spi_d[u"spi_1"] + i
@@ -1346,8 +1322,6 @@ class IPsecUtil:
                 f"{nodes[u'DUT1'][u'host']}"
             papi_exec.get_replies(err_msg)
 
-        return ckeys, ikeys
-
     @staticmethod
     def _ipsec_create_tunnel_interfaces_dut2_papi(
             nodes, tun_ips, if2_key, n_tunnels, crypto_alg, ckeys, integ_alg,
@@ -1472,13 +1446,6 @@ class IPsecUtil:
                 entry=sad_entry
             )
             for i in range(existing_tunnels, n_tunnels):
-                ckeys.append(
-                    gen_key(IPsecUtil.get_crypto_alg_key_len(crypto_alg))
-                )
-                if integ_alg:
-                    ikeys.append(
-                        gen_key(IPsecUtil.get_integ_alg_key_len(integ_alg))
-                    )
                 # SAD entry for outband / tx path
                 args[u"entry"][u"sad_id"] = 100000 + i
                 args[u"entry"][u"spi"] = spi_d[u"spi_2"] + i
@@ -1656,28 +1623,35 @@ class IPsecUtil:
         addr_incr = 1 << (128 - raddr_range) if tun_ips[u"ip1"].version == 6 \
             else 1 << (32 - raddr_range)
 
+        ckeys, ikeys = IPsecUtil._ipsec_generate_keys(
+            crypto_alg, integ_alg, n_tunnels, existing_tunnels
+        )
         if n_tunnels - existing_tunnels > 10:
-            ckeys, ikeys = IPsecUtil._ipsec_create_tunnel_interfaces_dut1_vat(
-                nodes, tun_ips, if1_key, if2_key, n_tunnels, crypto_alg,
-                integ_alg, raddr_ip2, addr_incr, spi_d, existing_tunnels
-            )
-            if u"DUT2" not in nodes.keys():
-                return ckeys[0], ikeys[0], spi_d[u"spi_1"], spi_d[u"spi_2"]
-            IPsecUtil._ipsec_create_tunnel_interfaces_dut2_vat(
-                nodes, tun_ips, if2_key, n_tunnels, crypto_alg, ckeys,
-                integ_alg, ikeys, raddr_ip1, addr_incr, spi_d, existing_tunnels
-            )
+            dut1_fn = IPsecUtil._ipsec_create_tunnel_interfaces_dut1_cli
+            dut2_fn = IPsecUtil._ipsec_create_tunnel_interfaces_dut2_cli
         else:
-            ckeys, ikeys = IPsecUtil._ipsec_create_tunnel_interfaces_dut1_papi(
-                nodes, tun_ips, if1_key, if2_key, n_tunnels, crypto_alg,
-                integ_alg, raddr_ip2, addr_incr, spi_d, existing_tunnels
-            )
-            if u"DUT2" not in nodes.keys():
-                return ckeys[0], ikeys[0], spi_d[u"spi_1"], spi_d[u"spi_2"]
-            IPsecUtil._ipsec_create_tunnel_interfaces_dut2_papi(
-                nodes, tun_ips, if2_key, n_tunnels, crypto_alg, ckeys,
-                integ_alg, ikeys, raddr_ip1, addr_incr, spi_d, existing_tunnels
+            dut1_fn = IPsecUtil._ipsec_create_tunnel_interfaces_dut1_papi
+            dut2_fn = IPsecUtil._ipsec_create_tunnel_interfaces_dut2_papi
+        dut1_call = partial(
+            dut1_fn, nodes, tun_ips, if1_key, if2_key, n_tunnels, crypto_alg,
+            ckeys, integ_alg, ikeys, raddr_ip2, addr_incr, spi_d,
+            existing_tunnels
+        )
+        if u"DUT2" not in nodes.keys():
+            dut1_call()
+            InterfaceUtil.invalidate_interface_table(nodes[u"DUT1"])
+            return ckeys[0], ikeys[0], spi_d[u"spi_1"], spi_d[u"spi_2"]
+        # Both DUTs are configured at the same time, keys are shared.
+        PapiSocketExecutor.run_in_parallel(
+            dut1_call,
+            partial(
+                dut2_fn, nodes, tun_ips, if2_key, n_tunnels, crypto_alg,
+                ckeys, integ_alg, ikeys, raddr_ip1, addr_incr, spi_d,
+                existing_tunnels
             )
+        )
+        InterfaceUtil.invalidate_interface_table(nodes[u"DUT1"])
+        InterfaceUtil.invalidate_interface_table(nodes[u"DUT2"])
 
         return None, None, None, None
 
@@ -1865,14 +1839,6 @@ class IPsecUtil:
         :type raddr_ip2: string
         :type raddr_range: int
         """
-        spd_id = 1
-        p_hi = 100
-        p_lo = 10
-        sa_id_1 = 100000
-        sa_id_2 = 200000
-        spi_1 = 300000
-        spi_2 = 400000
-
         crypto_key = gen_key(
             IPsecUtil.get_crypto_alg_key_len(crypto_alg)
         ).decode()
@@ -1880,67 +1846,99 @@ class IPsecUtil:
             IPsecUtil.get_integ_alg_key_len(integ_alg)
         ).decode() if integ_alg else u""
 
-        IPsecUtil.vpp_ipsec_set_ip_route(
-            nodes[u"DUT1"], n_tunnels, tunnel_ip1, raddr_ip2, tunnel_ip2,
-            interface1, raddr_range)
-        IPsecUtil.vpp_ipsec_set_ip_route(
-            nodes[u"DUT2"], n_tunnels, tunnel_ip2, raddr_ip1, tunnel_ip1,
-            interface2, raddr_range)
+        # The DUTs do not depend on each other, configure them at once.
+        PapiSocketExecutor.run_in_parallel(*(
+            partial(
+                IPsecUtil._ipsec_add_multiple_tunnels_on_dut, nodes[dut],
+                interface, n_tunnels, crypto_alg, crypto_key, integ_alg,
+                integ_key, tunnel_ip1, tunnel_ip2, raddr_ip1, raddr_ip2,
+                raddr_range, is_dut1=dut == u"DUT1"
+            ) for dut, interface in (
+                (u"DUT1", interface1), (u"DUT2", interface2)
+            )
+        ))
 
-        IPsecUtil.vpp_ipsec_add_spd(nodes[u"DUT1"], spd_id)
-        IPsecUtil.vpp_ipsec_spd_add_if(nodes[u"DUT1"], spd_id, interface1)
-        IPsecUtil.vpp_ipsec_policy_add(
-            nodes[u"DUT1"], spd_id, p_hi, PolicyAction.BYPASS, inbound=False,
-            proto=50, laddr_range=u"100.0.0.0/8", raddr_range=u"100.0.0.0/8"
-        )
-        IPsecUtil.vpp_ipsec_policy_add(
-            nodes[u"DUT1"], spd_id, p_hi, PolicyAction.BYPASS, inbound=True,
-            proto=50, laddr_range=u"100.0.0.0/8", raddr_range=u"100.0.0.0/8"
-        )
+    @staticmethod
+    def _ipsec_add_multiple_tunnels_on_dut(
+            node, interface, n_tunnels, crypto_alg, crypto_key, integ_alg,
+            integ_key, tunnel_ip1, tunnel_ip2, raddr_ip1, raddr_ip2,
+            raddr_range, is_dut1):
+        """Create one side of multiple IPsec tunnels between two VPP nodes.
+
+        :param node: VPP node to create tunnels on.
+        :param interface: Interface name or sw_if_index on the node.
+        :param n_tunnels: Number of tunnels to create.
+        :param crypto_alg: The encryption algorithm name.
+        :param crypto_key: The encryption key string.
+        :param integ_alg: The integrity algorithm name.
+        :param integ_key: The integrity key string.
+        :param tunnel_ip1: Tunnel node1 IPv4 address.
+        :param tunnel_ip2: Tunnel node2 IPv4 address.
+        :param raddr_ip1: Policy selector remote IPv4 start address for the
+            first tunnel in direction node1->node2.
+        :param raddr_ip2: Policy selector remote IPv4 start address for the
+            first tunnel in direction node2->node1.
+        :param raddr_range: Mask specifying range of Policy selector Remote
+            IPv4 addresses. Valid values are from 1 to 32.
+        :param is_dut1: True if the node is node1, False if node2.
+        :type node: dict
+        :type interface: str or int
+        :type n_tunnels: int
+        :type crypto_alg: CryptoAlg
+        :type crypto_key: str
+        :type integ_alg: IntegAlg
+        :type integ_key: str
+        :type tunnel_ip1: str
+        :type tunnel_ip2: str
+        :type raddr_ip1: string
+        :type raddr_ip2: string
+        :type raddr_range: int
+        :type is_dut1: bool
+        """
+        spd_id = 1
+        p_hi = 100
+        p_lo = 10
+        sa_id_1 = 100000
+        sa_id_2 = 200000
+        spi_1 = 300000
+        spi_2 = 400000
 
-        IPsecUtil.vpp_ipsec_add_spd(nodes[u"DUT2"], spd_id)
-        IPsecUtil.vpp_ipsec_spd_add_if(nodes[u"DUT2"], spd_id, interface2)
+        if is_dut1:
+            IPsecUtil.vpp_ipsec_set_ip_route(
+                node, n_tunnels, tunnel_ip1, raddr_ip2, tunnel_ip2, interface,
+                raddr_range
+            )
+        else:
+            IPsecUtil.vpp_ipsec_set_ip_route(
+                node, n_tunnels, tunnel_ip2, raddr_ip1, tunnel_ip1, interface,
+                raddr_range
+            )
+
+        IPsecUtil.vpp_ipsec_add_spd(node, spd_id)
+        IPsecUtil.vpp_ipsec_spd_add_if(node, spd_id, interface)
         IPsecUtil.vpp_ipsec_policy_add(
-            nodes[u"DUT2"], spd_id, p_hi, PolicyAction.BYPASS, inbound=False,
+            node, spd_id, p_hi, PolicyAction.BYPASS, inbound=False,
             proto=50, laddr_range=u"100.0.0.0/8", raddr_range=u"100.0.0.0/8"
         )
         IPsecUtil.vpp_ipsec_policy_add(
-            nodes[u"DUT2"], spd_id, p_hi, PolicyAction.BYPASS, inbound=True,
+            node, spd_id, p_hi, PolicyAction.BYPASS, inbound=True,
             proto=50, laddr_range=u"100.0.0.0/8", raddr_range=u"100.0.0.0/8"
         )
 
         IPsecUtil.vpp_ipsec_add_sad_entries(
-            nodes[u"DUT1"], n_tunnels, sa_id_1, spi_1, crypto_alg, crypto_key,
+            node, n_tunnels, sa_id_1, spi_1, crypto_alg, crypto_key,
             integ_alg, integ_key, tunnel_ip1, tunnel_ip2
         )
         IPsecUtil.vpp_ipsec_spd_add_entries(
-            nodes[u"DUT1"], n_tunnels, spd_id, p_lo, False, sa_id_1, raddr_ip2
+            node, n_tunnels, spd_id, p_lo, not is_dut1, sa_id_1, raddr_ip2
         )
 
         IPsecUtil.vpp_ipsec_add_sad_entries(
-            nodes[u"DUT2"], n_tunnels, sa_id_1, spi_1, crypto_alg, crypto_key,
-            integ_alg, integ_key, tunnel_ip1, tunnel_ip2
-        )
-        IPsecUtil.vpp_ipsec_spd_add_entries(
-            nodes[u"DUT2"], n_tunnels, spd_id, p_lo, True, sa_id_1, raddr_ip2
-        )
-
-        IPsecUtil.vpp_ipsec_add_sad_entries(
-            nodes[u"DUT2"], n_tunnels, sa_id_2, spi_2, crypto_alg, crypto_key,
-            integ_alg, integ_key, tunnel_ip2, tunnel_ip1
-        )
-
-        IPsecUtil.vpp_ipsec_spd_add_entries(
-            nodes[u"DUT2"], n_tunnels, spd_id, p_lo, False, sa_id_2, raddr_ip1
-        )
-
-        IPsecUtil.vpp_ipsec_add_sad_entries(
-            nodes[u"DUT1"], n_tunnels, sa_id_2, spi_2, crypto_alg, crypto_key,
+            node, n_tunnels, sa_id_2, spi_2, crypto_alg, crypto_key,
             integ_alg, integ_key, tunnel_ip2, tunnel_ip1
         )
-
         IPsecUtil.vpp_ipsec_spd_add_entries(
-            nodes[u"DUT1"], n_tunnels, spd_id, p_lo, True, sa_id_2, raddr_ip1
+            node, n_tunnels, spd_id, p_lo, is_dut1, sa_id_2, raddr_ip1
         )
 
     @staticmethod
@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -113,6 +113,17 @@ class RdmaMode(IntEnum):
 class InterfaceUtil:
     """General utilities for managing interfaces"""
 
+    interface_tables = dict()
+    """Mapping from node key to mirror of VPP interface table.
+    Each mirror is a dict with "by_index" (sw_if_index to interface data)
+    and "by_name" (interface name to sw_if_index) mappings.
+    Mirrors are updated by every interface dump, entries are dropped
+    by helpers creating interfaces (VPP may re-use the index of a deleted
+    interface), whole mirrors are dropped after bulk or CLI interface
+    creation and when PAPI disconnects (which precedes VPP restart).
+    Only identity data (names and indices) is served from the mirror,
+    state (flags, MAC) is always dumped fresh."""
+
     @staticmethod
     def pci_to_int(pci_str):
         """Convert PCI address from string format (0000:18:0a.0) to
@@ -384,20 +395,99 @@ class InterfaceUtil:
                 InterfaceUtil.vpp_node_interfaces_ready_wait(node, retries)
 
     @staticmethod
-    def vpp_get_interface_data(node, interface=None):
-        """Get all interface data from a VPP node. If a name or
-        sw_interface_index is provided, return only data for the matching
-        interface(s).
+    def _interface_table_key(node):
+        """Return key of interface table mirror for the node.
+
+        :param node: VPP node.
+        :type node: dict
+        :returns: Key distinguishing VPP instances.
+        :rtype: tuple of str
+        """
+        return PapiSocketExecutor.key_for_node_and_socket(
+            node, Constants.SOCKSVR_PATH
+        )
+
+    @staticmethod
+    def invalidate_interface_table(node):
+        """Drop mirror of VPP interface table for the node.
+
+        Call this after creating or deleting interfaces without
+        PAPI replies (e.g. by CLI), VPP restart is detected automatically.
+
+        :param node: VPP node.
+        :type node: dict
+        """
+        InterfaceUtil.interface_tables.pop(
+            InterfaceUtil._interface_table_key(node), None
+        )
+
+    @staticmethod
+    def invalidate_interface_table_entry(node, sw_if_index):
+        """Drop the interface from mirror of VPP interface table for the node.
+
+        Call this after creating or deleting the interface, unless its data
+        is dumped right after (e.g. by vpp_get_interface_name), as VPP
+        re-uses indices of deleted interfaces.
+
+        :param node: VPP node.
+        :param sw_if_index: Index of the created or deleted interface.
+        :type node: dict
+        :type sw_if_index: int
+        """
+        table = InterfaceUtil.interface_tables.get(
+            InterfaceUtil._interface_table_key(node)
+        )
+        if table is None:
+            return
+        old_data = table[u"by_index"].pop(int(sw_if_index), None)
+        if old_data is not None:
+            table[u"by_name"].pop(old_data[u"interface_name"], None)
+
+    @staticmethod
+    def _invalidate_interface_table_by_key(key):
+        """Drop mirror of VPP interface table, hook for PAPI disconnect.
+
+        :param key: Node key, as used by PapiSocketExecutor.
+        :type key: tuple of str
+        """
+        InterfaceUtil.interface_tables.pop(key, None)
+
+    @staticmethod
+    def _update_interface_table(node, if_data_list, complete=False):
+        """Store dumped interface data into the mirror.
+
+        :param node: VPP node the data was dumped from.
+        :param if_data_list: Processed interface dumps.
+        :param complete: If True, the dump contains all interfaces,
+            so the mirror is replaced.
+        :type node: dict
+        :type if_data_list: list of dict
+        :type complete: bool
+        """
+        key = InterfaceUtil._interface_table_key(node)
+        table = None if complete else InterfaceUtil.interface_tables.get(key)
+        if table is None:
+            table = dict(by_index=dict(), by_name=dict())
+            InterfaceUtil.interface_tables[key] = table
+        for if_data in if_data_list:
+            sw_if_index = if_data[u"sw_if_index"]
+            old_data = table[u"by_index"].get(sw_if_index)
+            if old_data is not None:
+                table[u"by_name"].pop(old_data[u"interface_name"], None)
+            table[u"by_index"][sw_if_index] = if_data
+            table[u"by_name"][if_data[u"interface_name"]] = sw_if_index
+
+    @staticmethod
+    def _dump_interfaces(node, sw_if_index=None):
+        """Dump interfaces from VPP, process and mirror the data.
 
         :param node: VPP node to get interface data from.
-        :param interface: Numeric index or name string of a specific interface.
+        :param sw_if_index: Index of the only interface to dump,
+            None means all interfaces.
         :type node: dict
-        :type interface: int or str
-        :returns: List of dictionaries containing data for each interface, or a
-            single dictionary for the specified interface.
-        :rtype: list or dict
-        :raises TypeError: if the data type of interface is neither basestring
-            nor int.
+        :type sw_if_index: Optional[int]
+        :returns: Processed interface dumps.
+        :rtype: list of dict
         """
         def process_if_dump(if_dump):
             """Process interface dump.
@@ -417,20 +507,14 @@ class InterfaceUtil:
                 if hasattr(if_dump[u"sub_if_flags"], u"value") \
                 else int(if_dump[u"sub_if_flags"])
 
+            if_dump[u"interface_name"] = \
+                if_dump[u"interface_name"].rstrip(u"\x00")
             return if_dump
 
-        if interface is not None:
-            if isinstance(interface, str):
-                param = u"interface_name"
-            elif isinstance(interface, int):
-                param = u"sw_if_index"
-            else:
-                raise TypeError(f"Wrong interface format {interface}")
-        else:
-            param = u""
-
         cmd = u"sw_interface_dump"
         args = dict(
+            sw_if_index=Constants.BITWISE_NON_ZERO
+            if sw_if_index is None else int(sw_if_index),
             name_filter_valid=False,
             name_filter=u""
         )
@@ -440,13 +524,81 @@ class InterfaceUtil:
             details = papi_exec.add(cmd, **args).get_details(err_msg)
         logger.debug(f"Received data:\n{details!r}")
 
-        data = list() if interface is None else dict()
-        for dump in details:
-            if interface is None:
-                data.append(process_if_dump(dump))
-            elif str(dump.get(param)).rstrip(u"\x00") == str(interface):
-                data = process_if_dump(dump)
-                break
+        data = [process_if_dump(dump) for dump in details]
+        if sw_if_index is not None:
+            # Some VPP versions ignore the filter for invalid index.
+            data = [
+                dump for dump in data
+                if dump[u"sw_if_index"] == args[u"sw_if_index"]
+            ]
+        if sw_if_index is not None and not data:
+            InterfaceUtil.invalidate_interface_table_entry(node, sw_if_index)
+        InterfaceUtil._update_interface_table(
+            node, data, complete=sw_if_index is None
+        )
+        return data
+
+    @staticmethod
+    def _lookup_sw_if_index(node, interface_name):
+        """Return sw_if_index for interface name, using the mirror.
+
+        The full dump is done only if the mirror does not know the name.
+
+        :param node: VPP node to look up the interface on.
+        :param interface_name: Name of the interface.
+        :type node: dict
+        :type interface_name: str
+        :returns: Index of the interface, None if not found.
+        :rtype: Optional[int]
+        """
+        key = InterfaceUtil._interface_table_key(node)
+        table = InterfaceUtil.interface_tables.get(key)
+        if table is None or interface_name not in table[u"by_name"]:
+            InterfaceUtil._dump_interfaces(node)
+            table = InterfaceUtil.interface_tables[key]
+        return table[u"by_name"].get(interface_name)
+
+    @staticmethod
+    def vpp_get_interface_data(node, interface=None):
+        """Get all interface data from a VPP node. If a name or
+        sw_interface_index is provided, return only data for the matching
+        interface(s).
+
+        Data is always dumped fresh. For a single interface,
+        only that interface is dumped, its name is resolved
+        using the mirror of interface table. If the mirror is stale
+        (the interface got a different name or index), all interfaces
+        are dumped to find the name.
+
+        :param node: VPP node to get interface data from.
+        :param interface: Numeric index or name string of a specific interface.
+        :type node: dict
+        :type interface: int or str
+        :returns: List of dictionaries containing data for each interface, or a
+            single dictionary for the specified interface.
+        :rtype: list or dict
+        :raises TypeError: if the data type of interface is neither basestring
+            nor int.
+        """
+        if interface is None:
+            data = InterfaceUtil._dump_interfaces(node)
+        elif isinstance(interface, int):
+            data = InterfaceUtil._dump_interfaces(node, interface)
+            data = data[0] if data else dict()
+        elif isinstance(interface, str):
+            sw_if_index = InterfaceUtil._lookup_sw_if_index(node, interface)
+            data = dict()
+            if sw_if_index is not None:
+                dumps = InterfaceUtil._dump_interfaces(node, sw_if_index)
+                if dumps and dumps[0][u"interface_name"] == interface:
+                    data = dumps[0]
+                else:
+                    for if_data in InterfaceUtil._dump_interfaces(node):
+                        if if_data[u"interface_name"] == interface:
+                            data = if_data
+                            break
+        else:
+            raise TypeError(f"Wrong interface format {interface}")
 
         logger.debug(f"Interface data:\n{data}")
         return data
@@ -473,19 +625,19 @@ class InterfaceUtil:
 
     @staticmethod
     def vpp_get_interface_sw_index(node, interface_name):
-        """Get interface name for the given SW interface index from actual
-        interface dump.
+        """Get SW interface index for the given interface name.
+
+        The mirror of interface table is used, interfaces are dumped
+        only if the name is not known yet.
 
         :param node: VPP node to get interface data from.
         :param interface_name: Interface name.
         :type node: dict
         :type interface_name: str
-        :returns: Name of the given interface.
-        :rtype: str
+        :returns: SW interface index of the given interface, None if not found.
+        :rtype: int
         """
-        if_data = InterfaceUtil.vpp_get_interface_data(node, interface_name)
-
-        return if_data.get(u"sw_if_index")
+        return InterfaceUtil._lookup_sw_if_index(node, interface_name)
 
     @staticmethod
     def vpp_get_interface_mac(node, interface):
@@ -1392,7 +1544,7 @@ class InterfaceUtil:
 
     @staticmethod
     def get_sw_if_index(node, interface_name):
-        """Get sw_if_index for the given interface from actual interface dump.
+        """Get sw_if_index for the given interface from interface table mirror.
 
         FIXME: Delete and redirect callers to vpp_get_interface_sw_index.
 
@@ -1401,12 +1553,9 @@ class InterfaceUtil:
         :type node: dict
         :type interface_name: str
         :returns: sw_if_index of the given interface.
-        :rtype: str
+        :rtype: int
         """
-        interface_data = InterfaceUtil.vpp_get_interface_data(
-            node, interface=interface_name
-        )
-        return interface_data.get(u"sw_if_index")
+        return InterfaceUtil._lookup_sw_if_index(node, interface_name)
 
     @staticmethod
     def vxlan_gpe_dump(node, interface_name=None):
@@ -1742,3 +1891,8 @@ class InterfaceUtil:
         for node in nodes.values():
             if node[u"type"] == NodeType.DUT:
                 InterfaceUtil.vpp_round_robin_rx_placement(node, prefix)
+
+
+PapiSocketExecutor.disconnect_hooks.append(
+    InterfaceUtil._invalidate_interface_table_by_key
+)
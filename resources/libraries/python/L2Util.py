@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -15,6 +15,8 @@
 
 from enum import IntEnum
 
+from robot.api import logger
+
 from resources.libraries.python.Constants import Constants
 from resources.libraries.python.PapiExecutor import PapiSocketExecutor
 from resources.libraries.python.topology import Topology
@@ -130,6 +132,99 @@ class L2Util:
         with PapiSocketExecutor(node) as papi_exec:
             papi_exec.add(cmd, **args).get_reply(err_msg)
 
+    @staticmethod
+    def vpp_add_l2fib_entry_bulk(
+            node, mac, interface, bd_id, count, increment=1, static_mac=1,
+            filter_mac=0, bvi_mac=0, verify=False,
+            chunk_size=Constants.PAPI_BULK_CHUNK_SIZE):
+        """Create a range of static L2FIB entries on a VPP node.
+
+        The i-th entry has MAC address mac + i * increment
+        (MAC addresses treated as 48-bit integers),
+        all other fields are the same for all entries.
+
+        The messages are sent in chunks (using batch PAPI commands),
+        progress is logged after each chunk.
+        Replies are checked for retval but not kept.
+
+        If verify is True, L2FIB table of the bridge domain is dumped
+        and entries with MAC addresses from the range are counted,
+        the count has to match the number of added entries.
+
+        :param node: Node to add L2FIB entries on.
+        :param mac: First MAC address in string format 01:02:03:04:05:06.
+        :param interface: Interface name or sw_if_index.
+        :param bd_id: Bridge domain index.
+        :param count: Number of entries to add.
+        :param increment: Increment between MAC addresses.
+        :param static_mac: Set to 1 to create static MAC entries.
+        :param filter_mac: Set to 1 to drop packets with the MAC addresses.
+        :param bvi_mac: Set to 1 to create entries pointing to BVI interface.
+        :param verify: Whether to check the entries are present in L2FIB.
+        :param chunk_size: Number of entries sent in one batch.
+        :type node: dict
+        :type mac: str
+        :type interface: str or int
+        :type bd_id: int or str
+        :type count: int
+        :type increment: int
+        :type static_mac: int or str
+        :type filter_mac: int or str
+        :type bvi_mac: int or str
+        :type verify: bool
+        :type chunk_size: int
+        :raises RuntimeError: If the MAC range overflows or verification fails.
+        """
+        if isinstance(interface, str):
+            sw_if_index = Topology.get_interface_sw_index(node, interface)
+        else:
+            sw_if_index = interface
+        count = int(count)
+        increment = int(increment)
+        mac_int = L2Util.mac_to_int(mac)
+        if mac_int + (count - 1) * increment >= 1 << 48:
+            raise RuntimeError(f"MAC range from {mac} overflows: {count}")
+
+        cmd = u"l2fib_add_del"
+        err_msg = f"Failed to add L2FIB entries on host {node[u'host']}"
+        args = dict(
+            bd_id=int(bd_id),
+            sw_if_index=sw_if_index,
+            is_add=True,
+            static_mac=int(static_mac),
+            filter_mac=int(filter_mac),
+            bvi_mac=int(bvi_mac)
+        )
+        with PapiSocketExecutor(node) as papi_exec:
+            for start in range(0, count, chunk_size):
+                stop = min(start + chunk_size, count)
+                macs = [
+                    (mac_int + i * increment).to_bytes(6, u"big")
+                    for i in range(start, stop)
+                ]
+                papi_exec.add_batch(
+                    cmd, dict(mac=macs), keep_replies=False, **args
+                ).get_replies(err_msg)
+                if count > chunk_size:
+                    logger.debug(
+                        f"Added {stop}/{count} L2FIB entries "
+                        f"on host {node[u'host']}"
+                    )
+        if not verify:
+            return
+        found = 0
+        for entry in L2Util.get_l2_fib_table(node, bd_id):
+            index, rest = divmod(
+                L2Util.mac_to_int(entry[u"mac"]) - mac_int, increment
+            )
+            if not rest and 0 <= index < count:
+                found += 1
+        if found != count:
+            raise RuntimeError(
+                f"{count - found} of {count} L2FIB entries missing in BD "
+                f"{bd_id} on host {node[u'host']}"
+            )
+
     @staticmethod
     def create_l2_bd(
             node, bd_id, flood=True, uu_flood=True, forward=True, learn=True,
@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -14,10 +14,24 @@
 """Module defining AbstractMeasurer class."""
 
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 
 class AbstractMeasurer(metaclass=ABCMeta):
-    """Abstract class defining common API for measurement providers."""
+    """Abstract class defining common API for measurement providers.
+
+    Besides the synchronous measure(), there is asynchronous API:
+    submit() starts a trial and returns a handle, poll() tells whether
+    the trial has finished, result() waits for the trial and returns
+    the measurement.
+
+    The default implementation of the asynchronous API runs measure()
+    in a single worker thread owned by the measurer instance,
+    so trials submitted to the same instance are measured one at a time,
+    in submission order. Instances bound to different TG ports
+    can measure concurrently. The worker thread is created on first submit,
+    call close() when the asynchronous API is no longer needed.
+    """
 
     @abstractmethod
     def measure(self, duration, transmit_rate):
@@ -30,3 +44,55 @@ class AbstractMeasurer(metaclass=ABCMeta):
         :returns: Structure containing the result of the measurement.
         :rtype: ReceiveRateMeasurement.ReceiveRateMeasurement
         """
+
+    def submit(self, duration, transmit_rate):
+        """Start trial measurement, return handle to get the result with.
+
+        :param duration: Trial duration [s].
+        :param transmit_rate: Target transmit rate [tps].
+        :type duration: float
+        :type transmit_rate: float
+        :returns: Handle of the trial, to pass to poll() or result().
+        :rtype: concurrent.futures.Future
+        """
+        executor = getattr(self, u"_trial_executor", None)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1)
+            self._trial_executor = executor
+        return executor.submit(self.measure, duration, transmit_rate)
+
+    def poll(self, handle):
+        """Return whether the submitted trial has finished.
+
+        :param handle: Handle returned by submit().
+        :type handle: concurrent.futures.Future
+        :returns: True if the result is available without waiting.
+        :rtype: bool
+        """
+        return handle.done()
+
+    def result(self, handle, timeout=None):
+        """Wait for the submitted trial to finish and return its result.
+
+        Exception raised by the measurement is re-raised here.
+
+        :param handle: Handle returned by submit().
+        :param timeout: Maximal time to wait [s], None means no limit.
+        :type handle: concurrent.futures.Future
+        :type timeout: Optional[float]
+        :returns: Structure containing the result of the measurement.
+        :rtype: ReceiveRateMeasurement.ReceiveRateMeasurement
+        :raises concurrent.futures.TimeoutError: If timeout is reached.
+        """
+        return handle.result(timeout)
+
+    def close(self):
+        """Stop the worker thread of the asynchronous API, if started.
+
+        Trials already submitted are finished first.
+        Calling submit() later starts a new worker thread.
+        """
+        executor = getattr(self, u"_trial_executor", None)
+        if executor is not None:
+            self._trial_executor = None
+            executor.shutdown(wait=True)
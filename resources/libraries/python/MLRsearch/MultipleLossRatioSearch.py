@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -75,6 +75,17 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
     trial duration, interval width is less than the width goal
     for current phase.
 
+    Optionally, a wall-clock time budget can be given. Before each
+    non-initial phase, its trial duration and width goal are chosen
+    so that the estimated time of the phase fits its share
+    of the remaining budget. The estimate uses the current intervals
+    (from earlier trials) to count the bisections needed,
+    and the measured per-trial overhead. Trial duration is shortened first
+    (not below the initial trial duration), the width goal is relaxed
+    only if that is not enough. When the budget is exhausted,
+    the current phase performs only the trials needed to make
+    invalid bounds valid, then ends with the current intervals.
+
     TODO: Review and update this docstring according to rst docs.
     TODO: Support configurable number of Packet Loss Ratios.
     """
@@ -116,7 +127,8 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
     def __init__(
             self, measurer, final_relative_width=0.005,
             final_trial_duration=30.0, initial_trial_duration=1.0,
-            number_of_intermediate_phases=2, timeout=600.0, doublings=1):
+            number_of_intermediate_phases=2, timeout=600.0, doublings=1,
+            time_budget=None, clock=None):
         """Store the measurer object and additional arguments.
 
         :param measurer: Rate provider to use by this search object.
@@ -132,6 +144,11 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
         :param doublings: How many doublings to do in external search step.
             Default 1 is suitable for fairly stable tests,
             less stable tests might get better overal duration with 2 or more.
+        :param time_budget: If set, adapt trial durations and width goals
+            to finish within this overall time [s]. None disables this.
+        :param clock: Callable returning current time [s] for time budget
+            accounting. Default is time.monotonic, simulations
+            can use a virtual clock.
         :type measurer: AbstractMeasurer.AbstractMeasurer
         :type final_relative_width: float
         :type final_trial_duration: float
@@ -139,6 +156,8 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
         :type number_of_intermediate_phases: int
         :type timeout: float
         :type doublings: int
+        :type time_budget: Optional[float]
+        :type clock: Optional[Callable[[], float]]
         """
         super(MultipleLossRatioSearch, self).__init__(measurer)
         self.final_trial_duration = float(final_trial_duration)
@@ -147,6 +166,10 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
         self.initial_trial_duration = float(initial_trial_duration)
         self.timeout = float(timeout)
         self.doublings = int(doublings)
+        self.time_budget = float(time_budget) if time_budget else None
+        self.clock = time.monotonic if clock is None else clock
+        self._deadline = None
+        self._trial_overhead = 0.0
 
     @staticmethod
     def double_relative_width(relative_width):
@@ -272,7 +295,10 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
         minimum_transmit_rate = float(min_rate)
         maximum_transmit_rate = float(max_rate)
         packet_loss_ratio = float(packet_loss_ratio)
-        max_measurement = self.measurer.measure(
+        if self.time_budget:
+            self._deadline = self.clock() + self.time_budget
+        self._trial_overhead = 0.0
+        max_measurement = self._measure(
             self.initial_trial_duration, maximum_transmit_rate)
         initial_width_goal = self.final_relative_width
         for _ in range(self.number_of_intermediate_phases):
@@ -281,9 +307,7 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
         mrr = max(minimum_transmit_rate, min(
             max_lo, max_measurement.relative_receive_rate
         ))
-        mrr_measurement = self.measurer.measure(
-            self.initial_trial_duration, mrr
-        )
+        mrr_measurement = self._measure(self.initial_trial_duration, mrr)
         # Attempt to get narrower width.
         if mrr_measurement.loss_fraction > 0.0:
             max2_lo = mrr * (1.0 - initial_width_goal)
@@ -292,7 +316,7 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
             mrr2 = mrr / (1.0 - initial_width_goal)
         if minimum_transmit_rate < mrr2 < maximum_transmit_rate:
             max_measurement = mrr_measurement
-            mrr_measurement = self.measurer.measure(
+            mrr_measurement = self._measure(
                 self.initial_trial_duration, mrr2)
             if mrr2 > mrr:
                 max_measurement, mrr_measurement = \
@@ -308,6 +332,99 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
         state = self.ndrpdr(state)
         return state.result
 
+    def _measure(self, duration, transmit_rate):
+        """Perform trial measurement, track per-trial overhead.
+
+        The overhead is the wall-clock time of the trial
+        above the trial duration, averaged over recent trials.
+
+        :param duration: Trial duration [s].
+        :param transmit_rate: Target transmit rate [tps].
+        :type duration: float
+        :type transmit_rate: float
+        :returns: Structure containing the result of the measurement.
+        :rtype: ReceiveRateMeasurement.ReceiveRateMeasurement
+        """
+        time_start = self.clock()
+        measurement = self.measurer.measure(duration, transmit_rate)
+        overhead = max(0.0, self.clock() - time_start - duration)
+        self._trial_overhead += (overhead - self._trial_overhead) / 2.0
+        return measurement
+
+    def _phase_duration(self, phase):
+        """Return the trial duration configured for the phase.
+
+        :param phase: Index of non-initial phase, the final one is
+            number_of_intermediate_phases.
+        :type phase: int
+        :returns: Trial duration [s].
+        :rtype: float
+        """
+        if self.number_of_intermediate_phases < 1:
+            return self.final_trial_duration
+        return self.initial_trial_duration * math.pow(
+            self.final_trial_duration / self.initial_trial_duration,
+            float(phase) / self.number_of_intermediate_phases
+        )
+
+    @staticmethod
+    def _estimate_trials(state, width_goal):
+        """Return estimated number of trials a phase needs.
+
+        Bisections needed to narrow current intervals to the goal
+        are counted, plus re-measurement of distinct bounds
+        at the phase duration.
+
+        :param state: State at the start of the phase.
+        :param width_goal: Relative width goal to estimate for.
+        :type state: ProgressState
+        :type width_goal: float
+        :returns: Estimated number of trials.
+        :rtype: int
+        """
+        intervals = (state.result.ndr_interval, state.result.pdr_interval)
+        trials = len({
+            bound.target_tr for interval in intervals
+            for bound in (interval.measured_low, interval.measured_high)
+        })
+        log_goal = -math.log(1.0 - width_goal)
+        for interval in intervals:
+            log_width = -math.log(1.0 - min(interval.rel_tr_width, 0.999))
+            if log_width > log_goal:
+                trials += int(math.ceil(math.log2(log_width / log_goal)))
+        return trials
+
+    def _apply_time_budget(self, state):
+        """Adapt duration and width goal of the phase to the remaining budget.
+
+        The remaining time is shared among this and later phases
+        in proportion to their configured trial durations.
+
+        :param state: State at the start of the phase, to be updated.
+        :type state: ProgressState
+        """
+        remaining = self._deadline - self.clock()
+        # Phases before the current one are done.
+        durations = [
+            self._phase_duration(index) for index in
+            range(state.phases, self.number_of_intermediate_phases + 1)
+        ]
+        share = remaining * durations[0] / sum(durations)
+        min_duration = min(state.duration, self.initial_trial_duration)
+        for _ in range(8):
+            trials = self._estimate_trials(state, state.width_goal)
+            duration = share / trials - self._trial_overhead
+            if duration >= min_duration:
+                state.duration = min(state.duration, duration)
+                break
+            state.duration = min_duration
+            state.width_goal = self.double_relative_width(state.width_goal)
+        logging.info(
+            f"time budget: remaining {remaining}, phase share {share}, "
+            f"overhead {self._trial_overhead}, duration {state.duration}, "
+            f"width goal {state.width_goal}"
+        )
+
     def _measure_and_update_state(self, state, transmit_rate):
         """Perform trial measurement, update bounds, return new state.
 
@@ -325,7 +442,7 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
             f"relative widths in goals: "
             f"{state.result.width_in_goals(self.final_relative_width)}"
         )
-        measurement = self.measurer.measure(state.duration, transmit_rate)
+        measurement = self._measure(state.duration, transmit_rate)
         ndr_interval = self._new_interval(
             state.result.ndr_interval, measurement, 0.0
         )
@@ -428,6 +545,8 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
             state.width_goal = saved_width
             state.phases = saved_phases  # Not needed, but just in case.
 
+        if self._deadline is not None:
+            self._apply_time_budget(state)
         logging.info(
             f"starting iterations with duration {state.duration} and relative "
             f"width goal {state.width_goal}"
@@ -435,6 +554,10 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
         while 1:
             if time.time() > start_time + self.timeout:
                 raise RuntimeError(u"Optimized search takes too long.")
+            # Even with exhausted budget, invalid bounds are fixed,
+            # only narrowing and duration re-measurements are skipped.
+            budget_exhausted = self._deadline is not None \
+                and self.clock() > self._deadline
             # Order of priorities: invalid bounds (nl, pl, nh, ph),
             # then narrowing relative Tr widths.
             # Durations are not priorities yet,
@@ -460,6 +583,10 @@ class MultipleLossRatioSearch(AbstractSearchAlgorithm):
                 state = self._measure_and_update_state(state, new_tr)
                 continue
 
+            if budget_exhausted:
+                logging.info(u"time budget exhausted, phase done")
+                break
+
             # If we are hitting maximum_transmit_rate,
             # it is still worth narrowing width,
             # hoping large enough loss fraction will happen.
@@ -0,0 +1,61 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Module defining ScheduledMeasurer class."""
+
+from .AbstractMeasurer import AbstractMeasurer
+
+
+class ScheduledMeasurer(AbstractMeasurer):
+    """Measurer passing each trial to TrialScheduler.
+
+    Search algorithms use this as any other synchronous measurer,
+    the scheduler decides which of the eligible TG port pairs
+    performs the first trial, and when each trial is performed.
+    The search is then pinned to the port pair of its first trial,
+    so all its trial results come from the same TG ports.
+    """
+
+    def __init__(self, scheduler, eligible):
+        """Store the scheduler and indices of usable measurers.
+
+        :param scheduler: The scheduler owning the real measurers.
+        :param eligible: Indices of scheduler measurers able to perform
+            trials for this search, in order of preference.
+        :type scheduler: TrialScheduler.TrialScheduler
+        :type eligible: Sequence[int]
+        """
+        self.scheduler = scheduler
+        self.eligible = tuple(eligible)
+        self.pinned = None
+
+    def measure(self, duration, transmit_rate):
+        """Wait for the measurer of this search, perform trial, return result.
+
+        Before the first trial, any of the eligible measurers can be used,
+        the one used becomes the pinned measurer for all later trials.
+
+        :param duration: Trial duration [s].
+        :param transmit_rate: Target transmit rate [tps].
+        :type duration: float
+        :type transmit_rate: float
+        :returns: Structure containing the result of the measurement.
+        :rtype: ReceiveRateMeasurement.ReceiveRateMeasurement
+        """
+        eligible = self.eligible if self.pinned is None else (self.pinned,)
+        index, measurement = self.scheduler.measure(
+            eligible, duration, transmit_rate
+        )
+        self.pinned = index
+        return measurement
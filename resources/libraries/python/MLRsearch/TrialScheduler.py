@@ -0,0 +1,206 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Module defining TrialScheduler class."""
+
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .ScheduledMeasurer import ScheduledMeasurer
+
+
+class TrialScheduler:
+    """Interleave trials of several searches over a pool of measurers.
+
+    Each measurer in the pool represents one TG port pair, performing
+    one trial at a time. Each search runs in its own thread
+    and sees an ordinary synchronous measurer (ScheduledMeasurer),
+    so semantics of any single search is not changed, only trials
+    of independent searches are performed at the same time
+    when they do not compete for the same port pair.
+    Each search lists the port pairs it is eligible for,
+    and stays on the port pair its first trial was performed on.
+
+    Waiting trials are served in arrival order, a trial never takes
+    a port pair an earlier waiting trial is also eligible for.
+
+    The scheduler owns the measurers, close() (or leaving the with block)
+    stops their worker threads.
+    """
+
+    def __init__(self, measurers):
+        """Store the measurers, initialize scheduling state.
+
+        :param measurers: Measurers to perform trials on,
+            each supporting the asynchronous API of AbstractMeasurer.
+        :type measurers: Sequence[AbstractMeasurer.AbstractMeasurer]
+        :raises ValueError: If no measurer is given.
+        """
+        self.measurers = tuple(measurers)
+        if not self.measurers:
+            raise ValueError(u"At least one measurer is needed.")
+        self._busy = set()
+        self._waiting = deque()
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        """Return self, measurers are closed when the with block ends.
+
+        :returns: This scheduler.
+        :rtype: TrialScheduler
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the measurers, do not suppress any exception.
+
+        :param exc_type: Exception type, if any.
+        :param exc_value: Exception instance, if any.
+        :param traceback: Traceback of the exception, if any.
+        """
+        self.close()
+
+    def close(self):
+        """Stop worker threads of all measurers.
+
+        Should be called after all searches have finished.
+        """
+        for measurer in self.measurers:
+            measurer.close()
+
+    def measurer_for(self, eligible):
+        """Return measurer for a search, limited to the eligible port pairs.
+
+        The search is pinned to the port pair of its first trial.
+
+        :param eligible: Indices of measurers the search can use.
+        :type eligible: Iterable[int]
+        :returns: Synchronous measurer to give to the search.
+        :rtype: ScheduledMeasurer.ScheduledMeasurer
+        :raises ValueError: If an index is out of range or none is given.
+        """
+        eligible = tuple(eligible)
+        if not eligible:
+            raise ValueError(u"No eligible measurer given.")
+        for index in eligible:
+            if not 0 <= index < len(self.measurers):
+                raise ValueError(f"Measurer index out of range: {index!r}")
+        return ScheduledMeasurer(self, eligible)
+
+    def _pick(self, ticket):
+        """Return free measurer index for the waiting ticket, or None.
+
+        Earlier waiting tickets reserve the first free measurer
+        they are eligible for.
+
+        Called with the condition held.
+
+        :param ticket: Entry of the waiting queue to find measurer for.
+        :type ticket: tuple of Sequence[int]
+        :returns: Index of measurer to use, or None if all are taken.
+        :rtype: Optional[int]
+        """
+        taken = set(self._busy)
+        for waiting in self._waiting:
+            free = next(
+                (index for index in waiting[0] if index not in taken), None
+            )
+            if waiting is ticket:
+                return free
+            if free is not None:
+                taken.add(free)
+        return None
+
+    def _acquire(self, eligible):
+        """Wait until an eligible measurer is free, mark it busy.
+
+        :param eligible: Indices of measurers the trial can use.
+        :type eligible: Sequence[int]
+        :returns: Index of the acquired measurer.
+        :rtype: int
+        """
+        ticket = (eligible,)
+        with self._condition:
+            self._waiting.append(ticket)
+            while 1:
+                index = self._pick(ticket)
+                if index is not None:
+                    break
+                self._condition.wait()
+            self._waiting.remove(ticket)
+            self._busy.add(index)
+        return index
+
+    def _release(self, index):
+        """Mark the measurer as free, wake up waiting trials.
+
+        :param index: Index of the measurer to release.
+        :type index: int
+        """
+        with self._condition:
+            self._busy.discard(index)
+            self._condition.notify_all()
+
+    def measure(self, eligible, duration, transmit_rate):
+        """Perform one trial on the first free eligible measurer.
+
+        :param eligible: Indices of measurers the trial can use.
+        :param duration: Trial duration [s].
+        :param transmit_rate: Target transmit rate [tps].
+        :type eligible: Sequence[int]
+        :type duration: float
+        :type transmit_rate: float
+        :returns: Index of the measurer used, and the measurement result.
+        :rtype: int, ReceiveRateMeasurement.ReceiveRateMeasurement
+        """
+        index = self._acquire(eligible)
+        try:
+            measurer = self.measurers[index]
+            measurement = measurer.result(
+                measurer.submit(duration, transmit_rate)
+            )
+        finally:
+            self._release(index)
+        return index, measurement
+
+    def run(self, searches):
+        """Run searches concurrently, return their results in order.
+
+        Each search is a pair of a callable and eligible measurer indices.
+        The callable takes a measurer (and nothing else) and returns
+        the search result, for example a closure calling
+        MultipleLossRatioSearch.narrow_down_ndr_and_pdr.
+
+        All searches are allowed to finish, if any of them failed,
+        the exception of the first failed one (in input order) is raised.
+
+        :param searches: Searches to run.
+        :type searches: Iterable[Tuple[Callable, Iterable[int]]]
+        :returns: Results of the searches, in input order.
+        :rtype: list
+        """
+        jobs = [
+            (function, self.measurer_for(eligible))
+            for function, eligible in searches
+        ]
+        if not jobs:
+            return list()
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = [
+                executor.submit(function, measurer)
+                for function, measurer in jobs
+            ]
+        return [future.result() for future in futures]
@@ -1,4 +1,4 @@
-# Copyright (c) 2019 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -18,6 +18,7 @@ from enum import IntEnum
 
 from robot.api import logger
 
+from resources.libraries.python.InterfaceUtil import InterfaceUtil
 from resources.libraries.python.topology import NodeType, Topology
 from resources.libraries.python.PapiExecutor import PapiSocketExecutor
 
@@ -149,6 +150,7 @@ class Memif:
         sw_if_index = Memif._memif_create(
             node, mid, sid, rxq=rxq, txq=txq, role=role
         )
+        InterfaceUtil.invalidate_interface_table_entry(node, sw_if_index)
 
         # Update Topology
         if_key = Topology.add_new_port(node, u"memif")
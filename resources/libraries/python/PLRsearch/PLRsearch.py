@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -22,6 +22,7 @@ from collections import namedtuple
 
 import dill
 
+from scipy.optimize import brentq
 from scipy.special import erfcx, erfc
 
 # TODO: Teach FD.io CSIT to use multiple dirs in PYTHONPATH,
@@ -29,6 +30,7 @@ from scipy.special import erfcx, erfc
 # Current usage of relative imports is just a short term workaround.
 from . import Integrator
 from . import stat_trackers
+from .trial_groups import TrialGroups
 from .log_plus import log_plus, log_minus
 
 
@@ -51,6 +53,13 @@ class PLRsearch:
 
     xerfcx_limit = math.pow(math.acos(0), -0.5)
     log_xerfcx_10 = math.log(xerfcx_limit - math.exp(10) * erfcx(math.exp(10)))
+    # Absolute tolerance for log of critical rate, see find_critical_rate.
+    log_rate_tolerance = 1e-12
+    # Initial width of load and duration bins for trial grouping,
+    # as a difference of natural logarithms, see trial_groups module.
+    trial_group_resolution = 1e-3
+    # Limit on number of trial groups, bounding cost of log_weight.
+    max_trial_groups = 256
 
     def __init__(
             self, measurer, trial_duration_per_trial, packet_loss_ratio_target,
@@ -176,7 +185,11 @@ class PLRsearch:
             f"Started search with min_rate {min_rate!r}, "
             f"max_rate {max_rate!r}"
         )
-        trial_result_list = list()
+        trial_result_list = TrialGroups(
+            load_resolution=self.trial_group_resolution,
+            duration_resolution=self.trial_group_resolution,
+            max_groups=self.max_trial_groups
+        )
         trial_number = self.trial_number_offset
         focus_trackers = (None, None)
         transmit_rate = (min_rate + max_rate) / 2.0
@@ -374,18 +387,20 @@ class PLRsearch:
 
         This is basically an inverse function to lfit_func
         when parameters are fixed.
-        Instead of implementing effective implementation
-        of the inverse function, this implementation uses
-        brute force binary search. It is bisecting (nim_rate, max_rate) interval
-        until the critical load is found (or interval becomes degenerate).
-        This implementation assures min and max rate limits are honored.
-
-        TODO: Use some method with faster convergence?
+        The equation is solved in logarithmic form, the excess
+        of log loss ratio over log target is a monotonic function
+        of log of the load. Brent's method (secant and inverse quadratic
+        interpolation steps, with bisection fallback) is used,
+        so the root stays bracketed within (min_rate, max_rate) interval
+        at all times, while converging much faster than plain bisection.
+        If the target is not achieved within the interval,
+        the corresponding bound is returned, so min and max rate limits
+        are honored.
 
         :param trace: A multiprocessing-friendly logging function (closure).
         :param lfit_func: Fitting function, typically lfit_spread or lfit_erf.
-        :param min_rate: Lower bound for binary search [pps].
-        :param max_rate: Upper bound for binary search [pps].
+        :param min_rate: Lower bound for the search [pps].
+        :param max_rate: Upper bound for the search [pps].
         :param loss_ratio_target: Fitting function should return loss rate
             giving this ratio at the returned load and parameters [1].
         :param mrr: The mrr parameter for the fitting function [pps].
@@ -401,26 +416,37 @@ class PLRsearch:
         :rtype: float
         """
         trace("Finding critical rate for loss_ratio_target", loss_ratio_target)
-        rate_lo = min_rate
-        rate_hi = max_rate
-        loss_ratio = -1
-        while loss_ratio != loss_ratio_target:
-            rate = (rate_hi + rate_lo) / 2.0
-            if rate in (rate_hi, rate_lo):
-                break
-            loss_rate = math.exp(lfit_func(trace, rate, mrr, spread))
-            loss_ratio = loss_rate / rate
-            if loss_ratio > loss_ratio_target:
-                trace(u"halving down", rate)
-                rate_hi = rate
-            elif loss_ratio < loss_ratio_target:
-                trace(u"halving up", rate)
-                rate_lo = rate
+        log_target = math.log(loss_ratio_target)
+
+        def excess(log_rate):
+            """Return log of loss ratio at the load, minus log of target.
+
+            :param log_rate: Natural logarithm of offered load [pps].
+            :type log_rate: float
+            :returns: Logarithmic excess of loss ratio over target.
+            :rtype: float
+            """
+            rate = math.exp(log_rate)
+            trace(u"trying", rate)
+            return lfit_func(trace, rate, mrr, spread) - log_rate - log_target
+
+        log_lo = math.log(min_rate)
+        if excess(log_lo) >= 0.0:
+            trace(u"found at min", min_rate)
+            return min_rate
+        log_hi = math.log(max_rate)
+        if excess(log_hi) <= 0.0:
+            trace(u"found at max", max_rate)
+            return max_rate
+        log_rate = brentq(
+            excess, log_lo, log_hi, xtol=PLRsearch.log_rate_tolerance
+        )
+        rate = min(max_rate, max(min_rate, math.exp(log_rate)))
         trace(u"found", rate)
         return rate
 
     @staticmethod
-    def log_weight(trace, lfit_func, trial_result_list, mrr, spread):
+    def log_weight(trace, lfit_func, trial_groups, mrr, spread):
         """Return log of weight of trial results by the function and parameters.
 
         Integrator assumes uniform distribution, but over different parameters.
@@ -428,21 +454,24 @@ class PLRsearch:
 
         Each trial has an offered load, a duration and a loss count.
         Fitting function is used to compute the average loss per second.
-        Poisson distribution (with average loss per trial) is used
+        Geometric distribution (with average loss per trial) is used
         to get likelihood of one trial result, the overal likelihood
         is a product of all trial likelihoods.
         As likelihoods can be extremely small, logarithms are tracked instead.
 
-        TODO: Copy ReceiveRateMeasurement from MLRsearch.
+        Trials are compressed into groups (see trial_groups module),
+        the log-likelihood of a trial is linear in its loss count,
+        so a group of trials with the same load and duration
+        contributes the same as its trials would separately.
 
         :param trace: A multiprocessing-friendly logging function (closure).
         :param lfit_func: Fitting function, typically lfit_spread or lfit_erf.
-        :param trial_result_list: List of trial measurement results.
+        :param trial_groups: Snapshot of compressed trial results.
         :param mrr: The mrr parameter for the fitting function.
         :param spread: The spread parameter for the fitting function.
         :type trace: function (str, object) -> None
         :type lfit_func: Function from 3 floats to float.
-        :type trial_result_list: list of MLRsearch.ReceiveRateMeasurement
+        :type trial_groups: tuple of 4-tuple, see TrialGroups.snapshot
         :type mrr: float
         :type spread: float
         :returns: Logarithm of result weight for given function and parameters.
@@ -451,23 +480,26 @@ class PLRsearch:
         log_likelihood = 0.0
         trace(u"log_weight for mrr", mrr)
         trace(u"spread", spread)
-        for result in trial_result_list:
-            trace(u"for tr", result.target_tr)
-            trace(u"lc", result.loss_count)
-            trace(u"d", result.duration)
+        for target_tr, log_duration, trial_count, loss_count in trial_groups:
+            trace(u"for tr", target_tr)
+            trace(u"lc", loss_count)
+            trace(u"tc", trial_count)
             # _rel_ values use units of target_tr (transactions per second).
             log_avg_rel_loss_per_second = lfit_func(
-                trace, result.target_tr, mrr, spread
+                trace, target_tr, mrr, spread
             )
             # _abs_ values use units of loss count (maybe packets).
             # There can be multiple packets per transaction.
-            log_avg_abs_loss_per_trial = log_avg_rel_loss_per_second + math.log(
-                result.transmit_count / result.target_tr
+            # The log_duration is log of transmit count divided by target_tr.
+            log_avg_abs_loss_per_trial = (
+                log_avg_rel_loss_per_second + log_duration
             )
             # Geometric probability computation for logarithms.
             log_trial_likelihood = log_plus(0.0, -log_avg_abs_loss_per_trial)
-            log_trial_likelihood *= -result.loss_count
-            log_trial_likelihood -= log_plus(0.0, +log_avg_abs_loss_per_trial)
+            log_trial_likelihood *= -loss_count
+            log_trial_likelihood -= trial_count * log_plus(
+                0.0, +log_avg_abs_loss_per_trial
+            )
             log_likelihood += log_trial_likelihood
             trace(u"avg_loss_per_trial", math.exp(log_avg_abs_loss_per_trial))
             trace(u"log_trial_likelihood", log_trial_likelihood)
@@ -508,7 +540,8 @@ class PLRsearch:
 
         :param trial_duration: Length of the measurement in seconds.
         :param transmit_rate: Offered load in packets per second.
-        :param trial_result_list: Results of previous measurements.
+        :param trial_result_list: Results of previous measurements,
+            either already compressed, or a plain list.
         :param min_rate: Practical minimum of possible ofered load.
         :param max_rate: Practical maximum of possible ofered load.
         :param focus_trackers: Pair of trackers initialized
@@ -516,7 +549,8 @@ class PLRsearch:
         :param max_samples: Limit for integrator samples, for debugging.
         :type trial_duration: float
         :type transmit_rate: float
-        :type trial_result_list: list of MLRsearch.ReceiveRateMeasurement
+        :type trial_result_list: TrialGroups
+            or list of MLRsearch.ReceiveRateMeasurement
         :type min_rate: float
         :type max_rate: float
         :type focus_trackers: 2-tuple of None or stat_trackers.VectorStatTracker
@@ -531,6 +565,11 @@ class PLRsearch:
             f"focus_trackers {focus_trackers!r}, max_samples {max_samples!r}"
         )
         # Preparation phase.
+        if not isinstance(trial_result_list, TrialGroups):
+            trial_groups = TrialGroups()
+            trial_groups.extend(trial_result_list)
+            trial_result_list = trial_groups
+        trial_groups = trial_result_list.snapshot()
         dimension = 2
         stretch_focus_tracker, erf_focus_tracker = focus_trackers
         if stretch_focus_tracker is None:
@@ -560,9 +599,10 @@ class PLRsearch:
                 """Return log of critical rate and log of likelihood.
 
                 This is a closure. The ancestor function got
-                trial_result_list as a parameter, and we are accessing it.
+                trial_result_list as a parameter, and we are accessing
+                its compressed snapshot.
                 As integrator has strict conditions on function signature,
-                trial_result_list cannot be an explicit argument
+                trial_groups cannot be an explicit argument
                 of the current function.
                 This is also why we have to define this closure
                 at each invocation of the ancestor function anew.
@@ -590,7 +630,7 @@ class PLRsearch:
                 mrr = max_rate * (1.0 / (x_mrr + 1.0) - 0.5) + 1.0
                 spread = math.exp((x_spread + 1.0) / 2.0 * math.log(mrr))
                 logweight = self.log_weight(
-                    trace, fitting_function, trial_result_list, mrr, spread
+                    trace, fitting_function, trial_groups, mrr, spread
                 )
                 value = math.log(
                     self.find_critical_rate(
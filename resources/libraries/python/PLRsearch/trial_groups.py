@@ -0,0 +1,279 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module for compressing trial results into groups of similar trials.
+
+PLRsearch likelihood has to be evaluated for every integrator sample,
+so its cost grows with the number of trial results to evaluate.
+
+Within a group, sums of transmit counts, loss counts and effective durations
+are tracked. Geometric likelihood of a group is evaluated as if the group
+contained trial_count identical trials with average duration,
+which is exact for trials of equal load and duration,
+as the log-likelihood is linear in loss count.
+
+By default, only trials of identical offered load and transmit count
+(so also identical duration) are merged, the likelihood stays exact.
+
+Approximate grouping is opt-in, by giving load_resolution.
+Then offered load and trial duration are binned on logarithmic scale,
+group keys are bin indices. Bins are hierarchical, doubling the bin width
+maps old index k to new index k // 2, so groups can be merged without
+re-visiting the original trials. Duration bins start with width of factor
+two by default, as trial durations grow only linearly with trial number.
+If max_groups is also given, bins are widened when needed to bound
+the number of groups (and the likelihood cost).
+
+Error bound of approximate grouping: each trial is evaluated at the load
+and duration representing its group, which differ from the load
+and duration of the trial by a factor of at most exp(load_resolution)
+and exp(duration_resolution) respectively (current values, they double
+on each widening). The loss count of each trial is kept exactly.
+
+In terms of the likelihood: log-likelihood of a trial with loss count k
+is -k * log(1 + exp(-L)) - log(1 + exp(L)), where L is log of expected
+loss count of the trial. Its derivative by L is between -1 and k,
+so a shift of L by d changes it by at most max(k, 1) * |d|.
+Grouping shifts L of a trial by at most duration_resolution
+plus the change of the fitting function (log of loss per second)
+over load factor of exp(load_resolution). Summed over trials,
+the log-likelihood error is at most sum of max(k, 1) times that shift.
+"""
+
+import math
+
+
+class TrialGroup:
+    """Sufficient statistics of trials merged together."""
+
+    __slots__ = (u"trial_count", u"duration", u"transmit_count", u"loss_count")
+
+    def __init__(
+            self, trial_count=0, duration=0.0, transmit_count=0, loss_count=0):
+        """Store the sums.
+
+        :param trial_count: Number of trials merged into this group.
+        :param duration: Sum of effective trial durations, computed
+            as transmit count divided by target rate [s].
+        :param transmit_count: Sum of transmit counts [1].
+        :param loss_count: Sum of loss counts [1].
+        :type trial_count: int
+        :type duration: float
+        :type transmit_count: int
+        :type loss_count: int
+        """
+        self.trial_count = trial_count
+        self.duration = duration
+        self.transmit_count = transmit_count
+        self.loss_count = loss_count
+
+    def __repr__(self):
+        """Return string, which interpreted constructs state of self.
+
+        :returns: Expression constructing an equivalent instance.
+        :rtype: str
+        """
+        return f"TrialGroup(trial_count={self.trial_count!r}," \
+            f"duration={self.duration!r}," \
+            f"transmit_count={self.transmit_count!r}," \
+            f"loss_count={self.loss_count!r})"
+
+    @property
+    def target_tr(self):
+        """Return representative offered load of the group.
+
+        This is the average target rate, weighted by trial durations.
+
+        :returns: Representative offered load [tps].
+        :rtype: float
+        """
+        return self.transmit_count / self.duration
+
+    @property
+    def trial_duration(self):
+        """Return average effective duration of trials in the group.
+
+        :returns: Average trial duration [s].
+        :rtype: float
+        """
+        return self.duration / self.trial_count
+
+    def merge(self, other):
+        """Add sums from other group into self.
+
+        :param other: The group to merge into self.
+        :type other: TrialGroup
+        """
+        self.trial_count += other.trial_count
+        self.duration += other.duration
+        self.transmit_count += other.transmit_count
+        self.loss_count += other.loss_count
+
+
+class TrialGroups:
+    """Collection of trial groups, exact unless binning is requested.
+
+    In approximate mode, when number of groups exceeds the limit,
+    resolution of the quantity with more distinct bins (load on a tie)
+    is halved (bin width doubled) and groups falling into the same bin
+    are merged. So load and duration errors are kept comparable.
+
+    Logarithms are shifted by a constant before binning,
+    so that bin indices are non-negative, and repeated halving
+    eventually leads to a single bin.
+    """
+
+    log_offset = 64.0
+
+    def __init__(
+            self, load_resolution=None, duration_resolution=math.log(2.0),
+            max_groups=None):
+        """Initialize empty collection.
+
+        :param load_resolution: Initial width of load bin,
+            as a difference of natural logarithms of loads.
+            None means exact grouping (no binning), the default.
+        :param duration_resolution: Initial width of duration bin,
+            as a difference of natural logarithms of durations.
+            Ignored in exact grouping.
+        :param max_groups: The limit on number of groups, at least one.
+            None means no limit. Only allowed with approximate grouping.
+        :type load_resolution: Optional[float]
+        :type duration_resolution: float
+        :type max_groups: Optional[int]
+        :raises ValueError: If max_groups is given for exact grouping.
+        """
+        if load_resolution is None and max_groups is not None:
+            raise ValueError(u"Limit on groups requires load_resolution.")
+        self.exact = load_resolution is None
+        self.load_resolution = None if self.exact else float(load_resolution)
+        self.duration_resolution = None if self.exact \
+            else float(duration_resolution)
+        self.max_groups = None if max_groups is None \
+            else max(1, int(max_groups))
+        self.trial_count = 0
+        self.groups = dict()
+
+    def __repr__(self):
+        """Return string describing the state, for debugging.
+
+        Group keys are not included, only groups themselves.
+
+        :returns: Debug string listing the groups.
+        :rtype: str
+        """
+        return f"TrialGroups(load_resolution={self.load_resolution!r}," \
+            f"duration_resolution={self.duration_resolution!r}," \
+            f"trial_count={self.trial_count!r}," \
+            f"groups={list(self.groups.values())!r})"
+
+    def __len__(self):
+        """Return number of groups.
+
+        :returns: Number of groups.
+        :rtype: int
+        """
+        return len(self.groups)
+
+    def __iter__(self):
+        """Iterate over the groups.
+
+        :returns: Iterator over groups.
+        :rtype: Iterator[TrialGroup]
+        """
+        return iter(self.groups.values())
+
+    def append(self, measurement):
+        """Add measurement result into matching group, compress if needed.
+
+        :param measurement: Trial result to add.
+        :type measurement: MLRsearch.ReceiveRateMeasurement
+        """
+        duration = measurement.transmit_count / measurement.target_tr
+        group = TrialGroup(
+            1, duration, measurement.transmit_count, measurement.loss_count
+        )
+        if self.exact:
+            key = (measurement.target_tr, measurement.transmit_count)
+        else:
+            key = (
+                self._bin(measurement.target_tr, self.load_resolution),
+                self._bin(duration, self.duration_resolution)
+            )
+        self.trial_count += 1
+        if key in self.groups:
+            self.groups[key].merge(group)
+            return
+        self.groups[key] = group
+        if self.max_groups is None:
+            return
+        while len(self.groups) > self.max_groups:
+            self._coarsen()
+
+    def extend(self, measurements):
+        """Add multiple measurement results.
+
+        :param measurements: Trial results to add.
+        :type measurements: Iterable[MLRsearch.ReceiveRateMeasurement]
+        """
+        for measurement in measurements:
+            self.append(measurement)
+
+    def snapshot(self):
+        """Return immutable copy of the groups, suitable for workers.
+
+        Logarithm of average trial duration is precomputed,
+        as that is what the likelihood computation needs.
+
+        :returns: Groups as tuples of (target_tr, log_trial_duration,
+            trial_count, loss_count).
+        :rtype: tuple of 4-tuple
+        """
+        return tuple(
+            (group.target_tr, math.log(group.trial_duration),
+             group.trial_count, group.loss_count)
+            for group in self.groups.values()
+        )
+
+    @classmethod
+    def _bin(cls, value, resolution):
+        """Return index of logarithmic bin the positive value falls into.
+
+        :param value: The quantity to bin.
+        :param resolution: Width of the bin in logarithmic scale.
+        :type value: float
+        :type resolution: float
+        :returns: Non-negative bin index.
+        :rtype: int
+        """
+        log_value = max(0.0, math.log(value) + cls.log_offset)
+        return math.floor(log_value / resolution)
+
+    def _coarsen(self):
+        """Double the width of load (or duration) bins, merge groups."""
+        load_bins = len({load_key for load_key, _ in self.groups})
+        duration_bins = len({duration_key for _, duration_key in self.groups})
+        if load_bins >= duration_bins:
+            self.load_resolution *= 2.0
+            load_shift, duration_shift = 1, 0
+        else:
+            self.duration_resolution *= 2.0
+            load_shift, duration_shift = 0, 1
+        old_groups = self.groups
+        self.groups = dict()
+        for (load_key, duration_key), group in old_groups.items():
+            key = (load_key >> load_shift, duration_key >> duration_shift)
+            if key in self.groups:
+                self.groups[key].merge(group)
+            else:
+                self.groups[key] = group
@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -17,11 +17,13 @@
 import copy
 import glob
 import json
+import re
 import shutil
 import struct  # vpp-papi can raise struct.error
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 
 from pprint import pformat
@@ -33,6 +35,7 @@ from resources.libraries.python.FilteredLogger import FilteredLogger
 from resources.libraries.python.PapiHistory import PapiHistory
 from resources.libraries.python.ssh import (
     SSH, SSHTimeout, exec_cmd_no_error, scp_node)
+from resources.libraries.python.TestTiming import timed
 from resources.libraries.python.topology import Topology, SocketType
 from resources.libraries.python.VppApiCrc import VppApiCrcChecker
 
@@ -43,6 +46,14 @@ __all__ = [
     u"Disconnector",
 ]
 
+# Lines of CLI output indicating the command has failed,
+# VPP does not always set nonzero retval in cli_inband_reply.
+# Errors start either with parser message, or with name of the function
+# handling the command (e.g. "ipsec_tun_protect_cmd: unknown interface").
+CLI_ERROR_PATTERN = re.compile(
+    r"^(?:unknown input|parse error|\w+_(?:cmd|fn): )", re.MULTILINE
+)
+
 
 def dictize(obj):
     """A helper method, to make namedtuple-like object accessible as dict.
@@ -149,6 +160,19 @@ class PapiSocketExecutor:
         with PapiSocketExecutor(node) as papi_exec:
             details = papi_exec.add(cmd, sw_if_index=ifc['vpp_sw_index']).\
                 get_details(err_msg)
+
+    3. Many requests of the same type, differing only in some fields
+
+        cmd = 'sw_interface_add_del_address'
+        with PapiSocketExecutor(node) as papi_exec:
+            papi_exec.add_batch(
+                cmd, dict(prefix=prefixes), sw_if_index=1, is_add=True,
+                del_all=False, keep_replies=False
+            ).get_replies(err_msg)
+
+    4. Many CLI commands (for features without suitable API messages)
+
+        PapiSocketExecutor.run_cli_cmds(node, cli_cmds)
     """
 
     # Class cache for reuse between instances.
@@ -171,6 +195,13 @@ class PapiSocketExecutor:
     so on next connect we can reuse intead of creating new."""
     conn_cache = dict()
     """Mapping from node key to connected client instance."""
+    instance_lock = threading.Lock()
+    """Guards API files download and reusable client list,
+    as connections to different nodes may be created in parallel threads."""
+    disconnect_hooks = list()
+    """Callables taking node key, called on disconnect (also if not connected).
+    Disconnect usually precedes VPP restart, so libraries mirroring
+    VPP state use this to invalidate it."""
 
     def __init__(self, node, remote_vpp_socket=Constants.SOCKSVR_PATH):
         """Store the given arguments, declare managed variables.
@@ -347,6 +378,7 @@ class PapiSocketExecutor:
             logger.debug(f"Activated cached PAPI client for key: {key}")
         return ret
 
+    @timed(u"papi connect")
     def __enter__(self):
         """Create a tunnel, connect VPP instance.
 
@@ -381,7 +413,8 @@ class PapiSocketExecutor:
         time_enter = time.time()
         node = self._node
         # Parsing takes longer than connecting, prepare instance before tunnel.
-        vpp_instance = self.ensure_vpp_instance()
+        with self.__class__.instance_lock:
+            vpp_instance = self.ensure_vpp_instance()
         # Store into cache as soon as possible.
         # If connection fails, it is better to attempt disconnect anyway.
         self.set_connected_client(vpp_instance)
@@ -493,6 +526,8 @@ class PapiSocketExecutor:
         :param key: Tuple identifying the node (and socket).
         :type key: tuple of str
         """
+        for hook in cls.disconnect_hooks:
+            hook(key)
         client_instance = cls.conn_cache.get(key, None)
         if client_instance is None:
             return
@@ -600,19 +635,116 @@ class PapiSocketExecutor:
         :raises RuntimeError: If unverified or conflicting CRC is encountered.
         """
         self.crc_checker.report_initial_conflicts()
+        api_args = copy.deepcopy(kwargs)
         if history:
+            # History formats lazily, share the copy which is not mutated.
             PapiHistory.add_to_papi_history(
-                self._node, csit_papi_command, **kwargs
+                self._node, csit_papi_command, **api_args
+            )
+        self.crc_checker.check_api_name(csit_papi_command)
+        self._api_command_list.append(
+            dict(
+                api_name=csit_papi_command,
+                api_args=api_args
+            )
+        )
+        return self
+
+    def add_batch(
+            self, csit_papi_command, vectors, history=True, keep_replies=True,
+            **kwargs):
+        """Add many commands of the same type to command list; return self.
+
+        This is a low-allocation alternative to calling add() in a loop,
+        intended for scale configurations (many thousands of messages).
+        The kwargs act as a template common for all messages,
+        the vectors mapping holds per-index values for the remaining fields.
+        The i-th message is sent with the template fields
+        overridden by the i-th value of each vector.
+
+        The template is deep-copied once (not once per message),
+        each vector is only shallow-copied into a tuple,
+        so the vector items must not be mutated by the caller afterwards.
+        The actual argument dicts are created only when executing.
+
+        CRC checks are done once for the message type (not per message).
+        Unless disabled, single summary entry is added to PAPI history,
+        listing the first and the last value of each vector.
+
+        If keep_replies is False, replies to these messages are only checked
+        for retval (and CRC), but they are not dictized nor returned
+        by get_replies(), which saves memory when the caller does not need
+        the replies (e.g. when adding routes).
+
+        :param csit_papi_command: VPP API command.
+        :param vectors: Mapping from field name to per-index values.
+            All the vectors must have the same length,
+            zero length means nothing is added.
+        :param history: Enable/disable adding summary to PAPI command history.
+        :param keep_replies: Whether replies are returned by get_replies().
+        :param kwargs: Key-value arguments common for all the messages.
+        :type csit_papi_command: str
+        :type vectors: dict of str to Sequence
+        :type history: bool
+        :type keep_replies: bool
+        :type kwargs: dict
+        :returns: self, so that method chaining is possible.
+        :rtype: PapiSocketExecutor
+        :raises RuntimeError: If unverified or conflicting CRC is encountered,
+            or if the vectors are missing or of different lengths.
+        """
+        vectors = {key: tuple(val) for key, val in vectors.items()}
+        lengths = set(len(val) for val in vectors.values())
+        if len(lengths) != 1:
+            raise RuntimeError(
+                f"Batch of {csit_papi_command} needs vectors "
+                f"of the same length, got lengths {sorted(lengths)!r}"
+            )
+        count = lengths.pop()
+        if not count:
+            return self
+        self.crc_checker.report_initial_conflicts()
+        api_args = copy.deepcopy(kwargs)
+        if history:
+            PapiHistory.add_batch_to_papi_history(
+                self._node, csit_papi_command, count, vectors, **api_args
             )
         self.crc_checker.check_api_name(csit_papi_command)
         self._api_command_list.append(
             dict(
                 api_name=csit_papi_command,
-                api_args=copy.deepcopy(kwargs)
+                api_args=api_args,
+                api_vectors=vectors,
+                count=count,
+                keep_replies=keep_replies,
             )
         )
         return self
 
+    @staticmethod
+    def _iterate_api_args(command):
+        """Yield keyword arguments for each message of a queued command.
+
+        Ordinary commands (from add) yield their stored arguments once.
+        Batch commands (from add_batch) yield one dict per index,
+        created only at this point from the template and vectors.
+
+        :param command: Item of internal command list.
+        :type command: dict
+        :returns: Generator of keyword arguments for PAPI calls.
+        :rtype: Iterator[dict]
+        """
+        template = command[u"api_args"]
+        vectors = command.get(u"api_vectors")
+        if vectors is None:
+            yield template
+            return
+        for index in range(command[u"count"]):
+            api_args = dict(template)
+            for key, vector in vectors.items():
+                api_args[key] = vector[index]
+            yield api_args
+
     def get_replies(self, err_msg="Failed to get replies."):
         """Get replies from VPP Python API.
 
@@ -681,6 +813,87 @@ class PapiSocketExecutor:
         """
         return self._execute(err_msg)
 
+    @staticmethod
+    def run_in_parallel(*calls):
+        """Call each callable in a separate thread, return results in order.
+
+        This is intended for keywords configuring several nodes
+        which do not depend on each other, each call should work
+        with (PAPI connections to) a different node.
+        Connections are cached per node, so each thread uses its own.
+
+        Robot ignores log messages from other than main thread,
+        so messages logged by the calls are buffered
+        and logged after all calls have finished, in the order of calls.
+
+        All calls are waited for, even if some of them fail.
+        Then the exception of the first failed call (in the order of calls)
+        is raised, exceptions of other failed calls are logged as errors.
+
+        :param calls: Callables without arguments (e.g. functools.partial).
+        :type calls: Iterable[Callable[[], object]]
+        :returns: Return values of the calls.
+        :rtype: list
+        :raises Exception: Whatever the first failed call raised.
+        """
+        if len(calls) < 2:
+            return [call() for call in calls]
+        results = [None] * len(calls)
+        errors = [None] * len(calls)
+        buffers = [list() for _ in calls]
+        local = threading.local()
+        original_write = logger.write
+
+        def buffered_write(msg, level=u"INFO", html=False):
+            """Buffer the message if called from a worker thread.
+
+            :param msg: Message to log.
+            :param level: Log level of the message.
+            :param html: Whether the message is in HTML.
+            :type msg: str
+            :type level: str
+            :type html: bool
+            """
+            buffer = getattr(local, u"buffer", None)
+            if buffer is None:
+                original_write(msg, level, html)
+            else:
+                buffer.append((msg, level, html))
+
+        def worker(index):
+            """Run a call, store its result or exception.
+
+            :param index: Index of the call.
+            :type index: int
+            """
+            local.buffer = buffers[index]
+            try:
+                results[index] = calls[index]()
+            except Exception as err:  # pylint: disable=broad-except
+                errors[index] = err
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(len(calls))
+        ]
+        logger.write = buffered_write
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            logger.write = original_write
+        for buffer in buffers:
+            for msg, level, html in buffer:
+                original_write(msg, level, html)
+        failed = [err for err in errors if err is not None]
+        for err in failed[1:]:
+            logger.error(f"Parallel call also failed: {err!r}")
+        if failed:
+            raise failed[0]
+        return results
+
     @staticmethod
     def run_cli_cmd(
             node, cli_cmd, log=True, remote_vpp_socket=Constants.SOCKSVR_PATH):
@@ -733,6 +946,131 @@ class PapiSocketExecutor:
                     node, cli_cmd, log=log, remote_vpp_socket=socket
                 )
 
+    @staticmethod
+    def run_cli_cmds(
+            node, cli_cmds, history=True, error_pattern=CLI_ERROR_PATTERN,
+            remote_vpp_socket=Constants.SOCKSVR_PATH):
+        """Run many CLI commands as pipelined cli_inband, return outputs.
+
+        This is the bulk alternative to running a CLI script by VAT
+        (or vppctl exec): no file is copied to the node, the commands
+        are streamed over the already connected API socket.
+        Up to Constants.PAPI_PIPELINE_DEPTH messages are sent
+        before waiting for replies, so the round trip latency
+        is not paid for each command.
+
+        The commands are executed in the given order.
+        Execution does not stop at the first failure, all failed commands
+        are reported in the raised exception, numbered from one.
+        A command fails if the reply retval is nonzero,
+        or if the reply text matches the error pattern.
+
+        :param node: Node to run the commands on.
+        :param cli_cmds: The CLI commands to run, without "exec" prefix.
+        :param history: If True, the commands are added to PAPI history.
+        :param error_pattern: Regular expression marking failed output,
+            or None to check only retval. Pass a command specific pattern
+            if the default one does not fit the commands.
+        :param remote_vpp_socket: Path to remote socket to tunnel to.
+        :type node: dict
+        :type cli_cmds: Iterable[str]
+        :type history: bool
+        :type error_pattern: Optional[re.Pattern]
+        :type remote_vpp_socket: str
+        :returns: CLI output of each command.
+        :rtype: list of str
+        :raises RuntimeError: If any of the commands fails.
+        """
+        cli_cmds = [cli_cmd.strip() for cli_cmd in cli_cmds]
+        if history:
+            for cli_cmd in cli_cmds:
+                PapiHistory.add_to_papi_history(
+                    node, u"cli_inband", cmd=cli_cmd
+                )
+        with PapiSocketExecutor(node, remote_vpp_socket) as papi_exec:
+            results = papi_exec._execute_cli_pipelined(
+                cli_cmds, Constants.PAPI_PIPELINE_DEPTH
+            )
+        failures = list()
+        for index, (cli_cmd, (retval, reply)) in enumerate(
+                zip(cli_cmds, results)):
+            if retval or (error_pattern and error_pattern.search(reply)):
+                failures.append(
+                    f"{index + 1}: {cli_cmd} (retval {retval}): "
+                    f"{reply.strip()}"
+                )
+        if failures:
+            shown = u"\n".join(failures[:20])
+            if len(failures) > 20:
+                shown += f"\n... and {len(failures) - 20} more"
+            raise RuntimeError(
+                f"{len(failures)} of {len(cli_cmds)} CLI commands failed "
+                f"on host {node[u'host']}:\n{shown}"
+            )
+        return [reply for _, reply in results]
+
+    @timed(u"papi")
+    def _execute_cli_pipelined(self, cli_cmds, depth):
+        """Send cli_inband messages without waiting, return retvals and outputs.
+
+        At most depth messages are unanswered at any time.
+        Replies are matched to commands by message context,
+        messages with unknown context (e.g. events) are ignored.
+
+        Unlike _execute, no reconnect is attempted on error,
+        as an unknown number of the commands has already been applied.
+
+        :param cli_cmds: The CLI commands to run.
+        :param depth: Maximal number of unanswered messages.
+        :type cli_cmds: list of str
+        :type depth: int
+        :returns: Retval and output of each command, in the given order.
+        :rtype: list of Tuple[int, str]
+        :raises RuntimeError: If communication fails or a reply times out.
+        """
+        vpp_instance = self.get_connected_client()
+        self.crc_checker.report_initial_conflicts()
+        self.crc_checker.check_api_name(u"cli_inband")
+        msgdef = vpp_instance.messages[u"cli_inband"]
+        msg_index = vpp_instance.transport.get_msg_index(
+            f"cli_inband_{msgdef.crc[2:]}"
+        )
+        results = [None] * len(cli_cmds)
+        # Mapping from message context to command index.
+        pending = dict()
+        sent = 0
+        received = 0
+        while received < len(cli_cmds):
+            try:
+                while sent < len(cli_cmds) and len(pending) < max(depth, 1):
+                    # Public PAPI methods always wait for the reply.
+                    # pylint: disable=protected-access
+                    context = vpp_instance._call_vpp_async(
+                        msg_index, msgdef, cmd=cli_cmds[sent]
+                    )
+                    pending[context] = sent
+                    sent += 1
+                reply = vpp_instance.read_blocking()
+            except (IOError, struct.error) as err:
+                raise RuntimeError(
+                    f"Pipelined CLI failed on host {self._node[u'host']} "
+                    f"after {received} of {len(cli_cmds)} replies"
+                ) from err
+            if reply is None:
+                raise RuntimeError(
+                    f"Timed out waiting for CLI reply "
+                    f"on host {self._node[u'host']} "
+                    f"after {received} of {len(cli_cmds)} replies"
+                )
+            index = pending.pop(getattr(reply, u"context", None), None)
+            if index is None:
+                continue
+            if not received:
+                self.crc_checker.check_api_name(reply.__class__.__name__)
+            results[index] = (reply.retval, reply.reply)
+            received += 1
+        return results
+
     @staticmethod
     def dump_and_log(node, cmds):
         """Dump and log requested information, return None.
@@ -747,6 +1085,7 @@ class PapiSocketExecutor:
                 dump = papi_exec.add(cmd).get_details()
                 logger.debug(f"{cmd}:\n{pformat(dump)}")
 
+    @timed(u"papi")
     def _execute(self, err_msg=u"Undefined error message", exp_rv=0):
         """Turn internal command list into data and execute; return replies.
 
@@ -771,39 +1110,45 @@ class PapiSocketExecutor:
         # Clear first as execution may fail.
         self._api_command_list = list()
         replies = list()
+        # Reply CRCs are checked once per message type and execution.
+        checked_names = set()
         for command in local_list:
             api_name = command[u"api_name"]
+            keep_replies = command.get(u"keep_replies", True)
             papi_fn = getattr(vpp_instance.api, api_name)
-            try:
+            for api_args in self._iterate_api_args(command):
                 try:
-                    reply = papi_fn(**command[u"api_args"])
-                except (IOError, struct.error) as err:
-                    # Occasionally an error happens, try reconnect.
-                    logger.warn(f"Reconnect after error: {err!r}")
-                    vpp_instance.disconnect()
-                    # Testing shows immediate reconnect fails.
-                    time.sleep(1)
-                    vpp_instance.connect_sync(u"csit_socket")
-                    logger.trace(u"Reconnected.")
-                    reply = papi_fn(**command[u"api_args"])
-            except (AttributeError, IOError, struct.error) as err:
-                raise AssertionError(err_msg) from err
-            # *_dump commands return list of objects, convert, ordinary reply.
-            if not isinstance(reply, list):
-                reply = [reply]
-            for item in reply:
-                self.crc_checker.check_api_name(item.__class__.__name__)
-                dict_item = dictize(item)
-                if u"retval" in dict_item.keys():
+                    try:
+                        reply = papi_fn(**api_args)
+                    except (IOError, struct.error) as err:
+                        # Occasionally an error happens, try reconnect.
+                        logger.warn(f"Reconnect after error: {err!r}")
+                        vpp_instance.disconnect()
+                        # Testing shows immediate reconnect fails.
+                        time.sleep(1)
+                        vpp_instance.connect_sync(u"csit_socket")
+                        logger.trace(u"Reconnected.")
+                        reply = papi_fn(**api_args)
+                except (AttributeError, IOError, struct.error) as err:
+                    raise AssertionError(err_msg) from err
+                # *_dump commands return list of objects, convert, ordinary.
+                if not isinstance(reply, list):
+                    reply = [reply]
+                for item in reply:
+                    reply_name = item.__class__.__name__
+                    if reply_name not in checked_names:
+                        self.crc_checker.check_api_name(reply_name)
+                        checked_names.add(reply_name)
                     # *_details messages do not contain retval.
-                    retval = dict_item[u"retval"]
+                    retval = getattr(item, u"retval", exp_rv)
                     if retval != exp_rv:
                         # TODO: What exactly to log and raise here?
                         raise AssertionError(
                             f"Retval {retval!r} does not match expected "
                             f"retval {exp_rv!r}"
                         )
-                replies.append(dict_item)
+                    if keep_replies:
+                        replies.append(dictize(item))
         return replies
 
 
@@ -916,14 +1261,13 @@ class PapiExecutor:
         :returns: self, so that method chaining is possible.
         :rtype: PapiExecutor
         """
+        api_args = copy.deepcopy(kwargs)
         if history:
             PapiHistory.add_to_papi_history(
-                self._node, csit_papi_command, **kwargs
+                self._node, csit_papi_command, **api_args
             )
         self._api_command_list.append(
-            dict(
-                api_name=csit_papi_command, api_args=copy.deepcopy(kwargs)
-            )
+            dict(api_name=csit_papi_command, api_args=api_args)
         )
         return self
 
@@ -996,6 +1340,7 @@ class PapiExecutor:
             )
         return api_data_processed
 
+    @timed(u"papi")
     def _execute_papi(
             self, api_data, method=u"request", err_msg=u"", timeout=120,
             socket=None):
@@ -1,4 +1,4 @@
-# Copyright (c) 2019 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -11,10 +11,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""DUT PAPI command history setup library."""
+"""DUT PAPI command history setup library.
+
+History of each DUT is bounded in memory. Consecutive commands
+of the same name form a run, only a few commands at the start
+and at the end of each run are kept (others are only counted).
+Only a limited number of runs is kept, from the start
+and from the end of the history.
+Command arguments are formatted only when the history is shown,
+so they must not be mutated after being added.
+"""
+
+import json
+
+from collections import deque
 
 from robot.api import logger
 
+from resources.libraries.python.Constants import Constants
 from resources.libraries.python.topology import NodeType, DICT__nodes
 
 __all__ = [u"DICT__DUTS_PAPI_HISTORY", u"PapiHistory"]
@@ -23,6 +37,214 @@ __all__ = [u"DICT__DUTS_PAPI_HISTORY", u"PapiHistory"]
 DICT__DUTS_PAPI_HISTORY = dict()
 
 
+class _HistoryRun:
+    """Consecutive commands of the same kind and name.
+
+    Each command item is a tuple of (kind, name, args, vectors, count),
+    args and vectors are None for VAT commands,
+    vectors and count are None for single PAPI commands.
+    """
+
+    __slots__ = (u"key", u"head", u"tail", u"count")
+
+    def __init__(self, key, edge):
+        """Create empty run.
+
+        :param key: Kind and name of the commands in this run.
+        :param edge: Number of items kept at each end of the run.
+        :type key: Tuple[str, str]
+        :type edge: int
+        """
+        self.key = key
+        self.head = list()
+        self.tail = deque(maxlen=edge)
+        self.count = 0
+
+    def add(self, item):
+        """Count the item, keep it if near start or (for now) near end.
+
+        :param item: The command item.
+        :type item: tuple
+        """
+        self.count += 1
+        if len(self.head) < self.tail.maxlen:
+            self.head.append(item)
+        else:
+            self.tail.append(item)
+
+    @property
+    def omitted(self):
+        """Number of commands not kept.
+
+        :returns: Count minus kept items.
+        :rtype: int
+        """
+        return self.count - len(self.head) - len(self.tail)
+
+
+class _PapiHistoryRecorder:
+    """Bounded history of commands executed on a single DUT."""
+
+    def __init__(self, max_runs, edge):
+        """Create empty history.
+
+        :param max_runs: Number of runs to keep (at least 2).
+        :param edge: Number of items kept at each end of a run (at least 1).
+        :type max_runs: int
+        :type edge: int
+        """
+        max_runs = max(max_runs, 2)
+        self._edge = max(edge, 1)
+        self._head_limit = max_runs // 2
+        self.head = list()
+        self.tail = deque(maxlen=max_runs - self._head_limit)
+        self.omitted_runs = 0
+        self.omitted_commands = 0
+        self._last = None
+
+    def add(self, item):
+        """Append the command item, dropping old middle runs if needed.
+
+        :param item: The command item, see _HistoryRun.
+        :type item: tuple
+        """
+        run = self._last
+        key = item[:2]
+        if run is None or run.key != key:
+            run = self._last = _HistoryRun(key, self._edge)
+            if len(self.head) < self._head_limit:
+                self.head.append(run)
+            else:
+                if len(self.tail) == self.tail.maxlen:
+                    self.omitted_runs += 1
+                    self.omitted_commands += self.tail[0].count
+                self.tail.append(run)
+        run.add(item)
+
+    def __bool__(self):
+        """Return True if any command has been added.
+
+        :returns: Whether the history is not empty.
+        :rtype: bool
+        """
+        return self._last is not None
+
+    def _iter_parts(self):
+        """Yield kept runs in order, with omission count in the middle.
+
+        :returns: Generator of runs, and int if any runs were omitted.
+        :rtype: Iterator[Union[_HistoryRun, int]]
+        """
+        yield from self.head
+        if self.omitted_runs:
+            yield self.omitted_commands
+        yield from self.tail
+
+    def format_lines(self):
+        """Format kept commands as text lines, one line per command.
+
+        :returns: Generator of lines.
+        :rtype: Iterator[str]
+        """
+        for part in self._iter_parts():
+            if isinstance(part, int):
+                yield f"... {part} commands in {self.omitted_runs} runs " \
+                    f"omitted ..."
+                continue
+            for item in part.head:
+                yield _format_item(item)
+            if part.omitted:
+                yield f"... {part.omitted} more {part.key[1]} commands ..."
+            for item in part.tail:
+                yield _format_item(item)
+
+    def serialize(self):
+        """Return kept commands as JSON-serializable structured data.
+
+        Argument values are stored as their repr strings.
+
+        :returns: One dict per run, the omitted runs represented by a dict
+            with "omitted_runs" and "omitted_commands" keys.
+        :rtype: list of dict
+        """
+        data = list()
+        for part in self._iter_parts():
+            if isinstance(part, int):
+                data.append(
+                    dict(
+                        omitted_runs=self.omitted_runs,
+                        omitted_commands=part
+                    )
+                )
+                continue
+            data.append(
+                dict(
+                    kind=part.key[0],
+                    command=part.key[1],
+                    count=part.count,
+                    first=[_item_as_dict(item) for item in part.head],
+                    last=[_item_as_dict(item) for item in part.tail],
+                )
+            )
+        return data
+
+
+def _format_item(item):
+    """Format a command item as a single line.
+
+    :param item: The command item, see _HistoryRun.
+    :type item: tuple
+    :returns: Formatted command.
+    :rtype: str
+    """
+    _, name, args, vectors, count = _serialize_item(item)
+    if args is None:
+        return name
+    args = [f"{key}={val}" for key, val in args.items()]
+    if vectors is None:
+        return f"{name}({u','.join(args)})"
+    for key, (first, last) in vectors.items():
+        if count == 1:
+            args.append(f"{key}={first}")
+        else:
+            args.append(f"{key}=[{first}, ..., {last}]")
+    return f"{count}x {name}({u','.join(args)})"
+
+
+def _serialize_item(item):
+    """Convert argument values of a command item to repr strings.
+
+    Only the first and the last value of each vector is kept.
+
+    :param item: The command item, see _HistoryRun.
+    :type item: tuple
+    :returns: Item of the same structure, with string values.
+    :rtype: tuple
+    """
+    kind, name, args, vectors, count = item
+    if args is not None:
+        args = {key: repr(val) for key, val in args.items()}
+    if vectors is not None:
+        vectors = {
+            key: [repr(val[0]), repr(val[-1])]
+            for key, val in vectors.items()
+        }
+    return kind, name, args, vectors, count
+
+
+def _item_as_dict(item):
+    """Serialize a command item as dict, skipping kind and name.
+
+    :param item: The command item, see _HistoryRun.
+    :type item: tuple
+    :returns: Dict with args, vectors and count (only those not None).
+    :rtype: dict
+    """
+    _, _, args, vectors, count = _serialize_item(item)
+    data = dict(args=args, vectors=vectors, count=count)
+    return {key: val for key, val in data.items() if val is not None}
+
+
 class PapiHistory:
     """Contains methods to set up DUT PAPI command history.
     """
@@ -34,7 +256,9 @@ class PapiHistory:
         :param node: DUT node to reset PAPI command history for.
         :type node: dict
         """
-        DICT__DUTS_PAPI_HISTORY[node[u"host"]] = list()
+        DICT__DUTS_PAPI_HISTORY[node[u"host"]] = _PapiHistoryRecorder(
+            Constants.PAPI_HISTORY_MAX_RUNS, Constants.PAPI_HISTORY_RUN_EDGE
+        )
 
     @staticmethod
     def reset_papi_history_on_all_duts(nodes):
@@ -51,7 +275,8 @@ class PapiHistory:
     def add_to_papi_history(node, csit_papi_command, papi=True, **kwargs):
         """Add command to PAPI command history on DUT node.
 
-        Repr strings are used for argument values.
+        Repr strings are used for argument values, formatted only when shown.
+        The values must not be mutated by the caller afterwards.
 
         The argument name 'csit_papi_command' must be unique enough as it cannot
         be repeated in kwargs.
@@ -84,28 +309,82 @@ class PapiHistory:
         :type kwargs: dict
         """
         if papi:
-            args = list()
-            for key, val in kwargs.items():
-                args.append(f"{key}={val!r}")
-            item = f"{csit_papi_command}({u','.join(args)})"
+            item = (u"papi", csit_papi_command, kwargs, None, None)
         else:
             # This else part is here to store VAT commands.
             # VAT history is not used.
             # TODO: Remove when VatExecutor is completely removed.
-            item = f"{csit_papi_command}"
-        DICT__DUTS_PAPI_HISTORY[node[u"host"]].append(item)
+            item = (u"vat", csit_papi_command, None, None, None)
+        DICT__DUTS_PAPI_HISTORY[node[u"host"]].add(item)
+
+    @staticmethod
+    def add_batch_to_papi_history(
+            node, csit_papi_command, count, vectors, **kwargs):
+        """Add single summary item for a batch of PAPI commands.
+
+        Repr strings are used for the common argument values,
+        per-index values are summarized by the first and the last value.
+        Formatting is done only when shown, the values must not be mutated.
+
+        Example of PAPI history item:
+
+            3x ip_route_add_del(is_add=True,route=[{...}, ..., {...}])
+
+        :param node: DUT node to add command to PAPI command history for.
+        :param csit_papi_command: Command to be added to PAPI command history.
+        :param count: Number of commands in the batch.
+        :param vectors: Mapping from field name to per-index values.
+        :param kwargs: Key-value arguments common for all the commands.
+        :type node: dict
+        :type csit_papi_command: str
+        :type count: int
+        :type vectors: dict of str to Sequence
+        :type kwargs: dict
+        """
+        DICT__DUTS_PAPI_HISTORY[node[u"host"]].add(
+            (u"batch", csit_papi_command, kwargs, vectors, count)
+        )
+
+    @staticmethod
+    def get_papi_history(node):
+        """Return PAPI command history for DUT node as structured data.
+
+        Each item describes a run of consecutive commands of the same name,
+        with count and arguments (as repr strings) of the first
+        and the last few commands. If some runs were omitted,
+        an item with "omitted_runs" and "omitted_commands" keys
+        is in their place.
+
+        :param node: DUT node to get PAPI command history for.
+        :type node: dict
+        :returns: JSON-serializable history.
+        :rtype: list of dict
+        """
+        return DICT__DUTS_PAPI_HISTORY[node[u"host"]].serialize()
 
     @staticmethod
     def show_papi_history(node):
         """Show PAPI command history for DUT node.
 
+        If any command was executed, the structured form
+        (see get_papi_history) is logged first, as a separate one-line
+        JSON message, for tools processing the logs (PAL reads it
+        instead of the text form, which follows).
+
         :param node: DUT node to show PAPI command history for.
         :type node: dict
         """
-        history_list = DICT__DUTS_PAPI_HISTORY[node[u"host"]]
-        if not history_list:
-            history_list = (u"No PAPI command executed", )
-        history = u'\n'.join(history_list)
+        recorder = DICT__DUTS_PAPI_HISTORY[node[u"host"]]
+        if recorder:
+            structured = json.dumps(
+                PapiHistory.get_papi_history(node), separators=(u",", u":")
+            )
+            logger.info(
+                f"{node[u'host']} PAPI command history JSON: {structured}"
+            )
+            history = u"\n".join(recorder.format_lines())
+        else:
+            history = u"No PAPI command executed"
         logger.info(f"{node[u'host']} PAPI command history:\n{history}\n")
 
     @staticmethod
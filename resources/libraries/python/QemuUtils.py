@@ -26,6 +26,7 @@ from resources.libraries.python.DpdkUtil import DpdkUtil
 from resources.libraries.python.DUTSetup import DUTSetup
 from resources.libraries.python.OptionString import OptionString
 from resources.libraries.python.ssh import exec_cmd, exec_cmd_no_error
+from resources.libraries.python.TestTiming import timed
 from resources.libraries.python.topology import NodeType, Topology
 from resources.libraries.python.VhostUser import VirtioFeaturesFlags
 from resources.libraries.python.VhostUser import VirtioFeatureMask
@@ -710,6 +711,7 @@ class QemuUtils:
             else:
                 interface[u"name"] = if_name
 
+    @timed(u"qemu")
     def qemu_start(self):
         """Start QEMU and wait until VM boot.
 
@@ -733,6 +735,7 @@ class QemuUtils:
             raise
         return self._vm_info
 
+    @timed(u"qemu")
     def qemu_kill(self):
         """Kill qemu process."""
         exec_cmd(
@@ -747,6 +750,7 @@ class QemuUtils:
             exec_cmd(self._node, f"cat {value}", sudo=True)
             exec_cmd(self._node, f"rm -f {value}", sudo=True)
 
+    @timed(u"qemu")
     def qemu_kill_all(self):
         """Kill all qemu processes on DUT node if specified."""
         exec_cmd(self._node, u"pkill -SIGKILL qemu", sudo=True)
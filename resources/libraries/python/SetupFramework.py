@@ -1,4 +1,4 @@
-# Copyright (c) 2019 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -16,28 +16,44 @@ nodes. All tasks required to be run before the actual tests are started is
 supposed to end up here.
 """
 
-from os import environ, remove
+from fnmatch import fnmatch
+from hashlib import sha256
+from os import environ, lstat, readlink, remove, walk
+from os.path import islink, join, normpath
+from stat import S_ISLNK
 from tempfile import NamedTemporaryFile
+import tarfile
 import threading
 
 from robot.api import logger
 
 from resources.libraries.python.Constants import Constants as con
-from resources.libraries.python.ssh import exec_cmd_no_error, scp_node
+from resources.libraries.python.ssh import exec_cmd, exec_cmd_no_error, \
+    scp_node
 from resources.libraries.python.LocalExecution import run
 from resources.libraries.python.topology import NodeType
+from resources.libraries.python.TrafficScriptExecutor import (
+    TrafficScriptExecutor
+)
 
 __all__ = [u"SetupFramework"]
 
+# Names excluded by tar --exclude-vcs, as used by pack_framework_dir.
+VCS_NAMES = frozenset((
+    u".git", u".gitignore", u".gitattributes", u".gitmodules", u".svn",
+    u".hg", u".hgignore", u".hgtags", u".bzr", u".bzrignore", u"CVS",
+    u".cvsignore"
+))
 
-def pack_framework_dir():
-    """Pack the testing WS into temp file, return its name.
 
-    :returns: Tarball file name.
+def temp_file_name(suffix):
+    """Return name for a new temporary file, placed in TMPDIR if set.
+
+    :param suffix: Suffix of the file name.
+    :type suffix: str
+    :returns: Temporary file name.
     :rtype: str
-    :raises Exception: When failed to pack testing framework.
     """
-
     try:
         directory = environ[u"TMPDIR"]
     except KeyError:
@@ -45,12 +61,23 @@ def pack_framework_dir():
 
     if directory is not None:
         tmpfile = NamedTemporaryFile(
-            suffix=u".tgz", prefix=u"csit-testing-", dir=f"{directory}"
+            suffix=suffix, prefix=u"csit-testing-", dir=f"{directory}"
         )
     else:
-        tmpfile = NamedTemporaryFile(suffix=u".tgz", prefix=u"csit-testing-")
+        tmpfile = NamedTemporaryFile(suffix=suffix, prefix=u"csit-testing-")
     file_name = tmpfile.name
     tmpfile.close()
+    return file_name
+
+
+def pack_framework_dir():
+    """Pack the testing WS into temp file, return its name.
+
+    :returns: Tarball file name.
+    :rtype: str
+    :raises Exception: When failed to pack testing framework.
+    """
+    file_name = temp_file_name(u".tgz")
 
     run(
         [
@@ -62,6 +89,153 @@ def pack_framework_dir():
     return file_name
 
 
+def framework_files():
+    """Yield paths of files pack_framework_dir would pack.
+
+    Symlinks (also to directories) are yielded as files.
+
+    :returns: Generator of paths relative to the testing WS.
+    :rtype: Iterator[str]
+    """
+    for root, dirs, files in walk(u"."):
+        names = list(files)
+        subdirs = list()
+        for name in dirs:
+            if name in VCS_NAMES or (root == u"." and name == u"tmp"):
+                continue
+            if islink(join(root, name)):
+                names.append(name)
+            else:
+                subdirs.append(name)
+        dirs[:] = subdirs
+        for name in names:
+            if name in VCS_NAMES or fnmatch(name, u"output*.xml"):
+                continue
+            yield normpath(join(root, name))
+
+
+def build_framework_manifest():
+    """Hash files of the testing WS, write manifest to temp file.
+
+    Each line contains path, sha256 of the content (or of symlink target)
+    and permission bits, separated by tabs. Lines are sorted bytewise,
+    so manifests can be compared by comm on remote nodes.
+
+    :returns: Manifest file name.
+    :rtype: str
+    :raises RuntimeError: If a file name cannot be represented in manifest.
+    """
+    lines = list()
+    for path in framework_files():
+        if u"\t" in path or u"\n" in path:
+            raise RuntimeError(f"Unsupported file name: {path!r}")
+        mode = lstat(path).st_mode
+        if S_ISLNK(mode):
+            digest = sha256(f"link:{readlink(path)}".encode()).hexdigest()
+        else:
+            hasher = sha256()
+            with open(path, u"rb") as file_handle:
+                for chunk in iter(lambda: file_handle.read(1 << 20), b""):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+        lines.append(f"{path}\t{digest}\t{mode & 0o7777:o}\n")
+    lines.sort(key=lambda line: line.encode())
+    file_name = temp_file_name(u".manifest")
+    with open(file_name, u"w") as manifest:
+        manifest.writelines(lines)
+    return file_name
+
+
+def pack_framework_files(paths):
+    """Pack the given files of the testing WS into temp file, return its name.
+
+    :param paths: Paths relative to the testing WS.
+    :type paths: Iterable[str]
+    :returns: Tarball file name.
+    :rtype: str
+    """
+    file_name = temp_file_name(u".tgz")
+    with tarfile.open(file_name, u"w:gz") as tar:
+        for path in paths:
+            tar.add(path, recursive=False)
+    return file_name
+
+
+def sync_framework_to_node(manifest, node):
+    """Update persistent framework copy at node, transfer only changes.
+
+    The node keeps the manifest of its copy. Files with different path,
+    hash or mode than in the local manifest are packed and transferred,
+    files missing locally are deleted. The remote manifest is removed
+    during the update, so an interrupted update leads to fresh copy
+    (full transfer) next time, instead of inconsistent copy.
+
+    :param manifest: Path to local manifest file.
+    :param node: Dictionary created from topology.
+    :type manifest: str
+    :type node: dict
+    :raises RuntimeError: When failed to update the copy.
+    """
+    cache = con.REMOTE_FW_CACHE_DIR
+    message = f"Failed to sync framework to node {node[u'type']} " \
+        f"host {node[u'host']}, port {node[u'port']}"
+    exec_cmd_no_error(
+        node, f"mkdir -p {cache} && cd {cache} && if [ -f manifest ]; then "
+        f"mv manifest manifest.old; else rm -rf tree && : > manifest.old; fi "
+        f"&& mkdir -p tree",
+        message=message, timeout=30, include_reason=True
+    )
+    scp_node(node, manifest, f"{cache}/manifest.new")
+    stdout, _ = exec_cmd_no_error(
+        node, f"cd {cache} && LC_ALL=C comm -13 manifest.old manifest.new "
+        f"| cut -f1", message=message, timeout=30, include_reason=True
+    )
+    paths = stdout.splitlines()
+    logger.console(
+        f"Transferring {len(paths)} changed files to {node[u'type']} "
+        f"host {node[u'host']}, port {node[u'port']}."
+    )
+    if paths:
+        tarball = pack_framework_files(paths)
+        try:
+            scp_node(node, tarball, f"{cache}/delta.tgz")
+        finally:
+            remove(tarball)
+        exec_cmd_no_error(
+            node, f"tar -zxf {cache}/delta.tgz -C {cache}/tree && "
+            f"rm -f {cache}/delta.tgz",
+            message=message, timeout=30, include_reason=True
+        )
+    exec_cmd_no_error(
+        node, f"cd {cache} && LC_ALL=C comm -23 <(cut -f1 manifest.old) "
+        f"<(cut -f1 manifest.new) | (cd tree && xargs -r -d '\\n' rm -f) && "
+        f"mv manifest.new manifest && rm -f manifest.old",
+        message=message, timeout=30, include_reason=True
+    )
+
+
+def install_framework_from_cache(node):
+    """Replace framework directory at node by the synced copy.
+
+    Virtualenv left in framework directory is moved to cache first,
+    so it can be reused.
+
+    :param node: Dictionary created from topology.
+    :type node: dict
+    :raises RuntimeError: When failed to copy the framework.
+    """
+    fw_dir, cache = con.REMOTE_FW_DIR, con.REMOTE_FW_CACHE_DIR
+    cmd = f"if [ -d {fw_dir}/env ] && [ ! -d {cache}/env ]; then " \
+        f"mv {fw_dir}/env {cache}/env; fi; " \
+        f"sudo rm -rf {fw_dir} && cp -a {cache}/tree {fw_dir}"
+    exec_cmd_no_error(
+        node, cmd,
+        message=f"Failed to install framework at node {node[u'type']} "
+        f"host {node[u'host']}, port {node[u'port']}",
+        timeout=30, include_reason=True
+    )
+
+
 def copy_tarball_to_node(tarball, node):
     """Copy tarball file from local host to remote node.
 
@@ -138,6 +312,61 @@ def create_env_directory_at_node(node):
     )
 
 
+def reuse_env_directory_at_node(node):
+    """Move cached virtualenv in place, or create a new one.
+
+    The cached virtualenv is reused only if it was created
+    for the same requirements.txt content. Virtualenv is always created
+    and used at the same path, it is only moved away between jobs.
+
+    :param node: Node to set up virtualenv on.
+    :type node: dict
+    :raises RuntimeError: When failed to setup virtualenv.
+    """
+    fw_dir, cache = con.REMOTE_FW_DIR, con.REMOTE_FW_CACHE_DIR
+    requirements = f"$(sha256sum {fw_dir}/requirements.txt | cut -d' ' -f1)"
+    cmd = f"[ -d {cache}/env ] && " \
+        f"[ \"$(cat {cache}/env.sha256 2>/dev/null)\" = \"{requirements}\" ] " \
+        f"&& mv {cache}/env {fw_dir}/env"
+    ret_code, _, _ = exec_cmd(node, cmd, timeout=30)
+    if ret_code == 0:
+        logger.console(
+            f"Reused virtualenv on {node[u'type']} host {node[u'host']}, "
+            f"port {node[u'port']}."
+        )
+        return
+    exec_cmd_no_error(
+        node, f"rm -rf {cache}/env {cache}/env.sha256",
+        message=f"Failed to remove cached virtualenv at node {node[u'type']} "
+        f"host {node[u'host']}, port {node[u'port']}",
+        timeout=30, include_reason=True
+    )
+    create_env_directory_at_node(node)
+    exec_cmd_no_error(
+        node, f"echo {requirements} > {cache}/env.sha256",
+        message=f"Failed to store requirements hash at node {node[u'type']} "
+        f"host {node[u'host']}, port {node[u'port']}",
+        timeout=30, include_reason=True
+    )
+
+
+def park_env_directory_at_node(node):
+    """Move virtualenv from framework directory to cache, for reuse.
+
+    :param node: Node to park virtualenv on.
+    :type node: dict
+    :raises RuntimeError: When failed to move the virtualenv.
+    """
+    fw_dir, cache = con.REMOTE_FW_DIR, con.REMOTE_FW_CACHE_DIR
+    exec_cmd_no_error(
+        node, f"if [ -d {fw_dir}/env ]; then rm -rf {cache}/env && "
+        f"mv {fw_dir}/env {cache}/env; fi",
+        message=f"Failed to park virtualenv at node {node[u'type']} "
+        f"host {node[u'host']}, port {node[u'port']}",
+        timeout=30, include_reason=True
+    )
+
+
 def setup_node(node, tarball, remote_tarball, results=None):
     """Copy a tarball to a node and extract it.
 
@@ -175,6 +404,41 @@ def setup_node(node, tarball, remote_tarball, results=None):
     return result
 
 
+def sync_node(node, manifest, results=None):
+    """Sync framework to a node, transferring only changed files.
+
+    :param node: A node where the framework will be synced.
+    :param manifest: Local path of the framework manifest.
+    :param results: A list where to store the result of node setup, optional.
+    :type node: dict
+    :type manifest: str
+    :type results: list
+    :returns: True - success, False - error
+    :rtype: bool
+    """
+    try:
+        sync_framework_to_node(manifest, node)
+        install_framework_from_cache(node)
+        if node[u"type"] == NodeType.TG:
+            reuse_env_directory_at_node(node)
+    except RuntimeError as exc:
+        logger.console(
+            f"Node {node[u'type']} host {node[u'host']}, port {node[u'port']} "
+            f"sync failed, error: {exc!r}"
+        )
+        result = False
+    else:
+        logger.console(
+            f"Sync of node {node[u'type']} host {node[u'host']}, "
+            f"port {node[u'port']} done."
+        )
+        result = True
+
+    if isinstance(results, list):
+        results.append(result)
+    return result
+
+
 def delete_local_tarball(tarball):
     """Delete local tarball to prevent disk pollution.
 
@@ -218,6 +482,10 @@ def cleanup_node(node, results=None):
     :rtype: bool
     """
     try:
+        if node[u"type"] == NodeType.TG:
+            TrafficScriptExecutor.stop_traffic_script_agent(node)
+            if con.FRAMEWORK_DELTA_SYNC:
+                park_env_directory_at_node(node)
         delete_framework_dir(node)
     except RuntimeError:
         logger.error(
@@ -243,6 +511,10 @@ class SetupFramework:
     Many VAT/CLI based tests need the scripts at remote hosts before executing
     them. This class packs the whole testing directory and copies it over
     to all nodes in topology under /tmp/
+
+    With FRAMEWORK_DELTA_SYNC, only files changed since the previous job
+    are transferred to a persistent copy on each node,
+    and TG virtualenv is reused if requirements did not change.
     """
 
     @staticmethod
@@ -253,6 +525,9 @@ class SetupFramework:
         :type nodes: dict
         :raises RuntimeError: If setup framework failed.
         """
+        if con.FRAMEWORK_DELTA_SYNC:
+            SetupFramework.sync_framework(nodes)
+            return
 
         tarball = pack_framework_dir()
         msg = f"Framework packed to {tarball}"
@@ -289,6 +564,36 @@ class SetupFramework:
         else:
             raise RuntimeError(u"Failed to setup framework.")
 
+    @staticmethod
+    def sync_framework(nodes):
+        """Hash the testing directory and sync changed files to each node.
+
+        :param nodes: Topology nodes.
+        :type nodes: dict
+        :raises RuntimeError: If sync framework failed.
+        """
+        manifest = build_framework_manifest()
+        logger.console(f"Framework manifest written to {manifest}")
+
+        results = list()
+        threads = list()
+        for node in nodes.values():
+            thread = threading.Thread(
+                target=sync_node, args=(node, manifest, results)
+            )
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        logger.info(f"Results: {results}")
+
+        remove(manifest)
+        if all(results):
+            logger.console(u"All nodes are ready.")
+        else:
+            raise RuntimeError(u"Failed to sync framework.")
+
 
 class CleanupFramework:
     """Clean up suite run on topology nodes."""
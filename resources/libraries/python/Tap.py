@@ -90,6 +90,7 @@ class Tap:
 
         with PapiSocketExecutor(node) as papi_exec:
             sw_if_index = papi_exec.add(cmd, **args).get_sw_if_index(err_msg)
+        InterfaceUtil.invalidate_interface_table_entry(node, sw_if_index)
 
         if_key = Topology.add_new_port(node, u"tap")
         Topology.update_interface_sw_if_index(node, if_key, sw_if_index)
@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -13,7 +13,7 @@
 
 """Special test configurations library."""
 
-from ipaddress import ip_address, AddressValueError
+from ipaddress import ip_address
 from robot.api import logger
 
 from resources.libraries.python.Constants import Constants
@@ -23,7 +23,6 @@ from resources.libraries.python.IPAddress import IPAddress
 from resources.libraries.python.IPUtil import IPUtil
 from resources.libraries.python.PapiExecutor import PapiSocketExecutor
 from resources.libraries.python.topology import Topology
-from resources.libraries.python.VatExecutor import VatExecutor
 
 
 class TestConfig:
@@ -41,6 +40,11 @@ class TestConfig:
         Put each pair of VXLAN tunnel interface and VLAN sub-interface to
         separate bridge-domain.
 
+        All messages of the same type are sent as PAPI batches
+        (in chunks of Constants.PAPI_BULK_CHUNK_SIZE), the sw_if_indexes
+        of created interfaces are taken from the replies, so the time
+        grows linearly with the number of tunnels.
+
         :param node: VPP node to create VXLAN tunnel interfaces.
         :param node_vxlan_if: VPP node interface key to create VXLAN tunnel
             interfaces.
@@ -68,23 +72,51 @@ class TestConfig:
         :type bd_id_start: int
         """
         # configure IPs, create VXLAN interfaces and VLAN sub-interfaces
-        vxlan_count = TestConfig.vpp_create_vxlan_and_vlan_interfaces(
-            node, node_vxlan_if, node_vlan_if, n_tunnels, vni_start,
-            src_ip_start, dst_ip_start, ip_step
-        )
+        vxlan_indices, vlan_indices = \
+            TestConfig.vpp_create_vxlan_and_vlan_interfaces(
+                node, node_vxlan_if, node_vlan_if, n_tunnels, vni_start,
+                src_ip_start, dst_ip_start, ip_step
+            )
 
         # update topology with VXLAN interfaces and VLAN sub-interfaces data
         # and put interfaces up
         TestConfig.vpp_put_vxlan_and_vlan_interfaces_up(
-            node, vxlan_count, node_vlan_if
+            node, vxlan_indices, vlan_indices
         )
 
         # configure bridge domains, ARPs and routes
         TestConfig.vpp_put_vxlan_and_vlan_interfaces_to_bridge_domain(
-            node, node_vxlan_if, vxlan_count, op_node, op_node_if, dst_ip_start,
-            ip_step, bd_id_start
+            node, node_vxlan_if, vxlan_indices, vlan_indices, op_node,
+            op_node_if, dst_ip_start, ip_step, bd_id_start
         )
 
+    @staticmethod
+    def _limit_address_range(count, ip_step, *ip_starts):
+        """Return how many addresses of the ranges fit into address space.
+
+        :param count: Requested number of addresses in each range.
+        :param ip_step: IP address incremental step.
+        :param ip_starts: The first addresses of the ranges.
+        :type count: int
+        :type ip_step: int
+        :type ip_starts: list of IPv4Address or IPv6Address
+        :returns: Number of addresses, at most count.
+        :rtype: int
+        """
+        count = int(count)
+        for ip_start in ip_starts:
+            if ip_step <= 0:
+                break
+            max_int = (1 << ip_start.max_prefixlen) - 1
+            fit = (max_int - int(ip_start)) // ip_step + 1
+            if fit < count:
+                logger.warn(
+                    u"Can't do more iterations - IP address limit "
+                    u"has been reached."
+                )
+                count = fit
+        return count
+
     @staticmethod
     def vpp_create_vxlan_and_vlan_interfaces(
             node, node_vxlan_if, node_vlan_if, vxlan_count, vni_start,
@@ -111,214 +143,141 @@ class TestConfig:
         :type src_ip_start: str
         :type dst_ip_start: str
         :type ip_step: int
-        :returns: Number of created VXLAN interfaces.
-        :rtype: int
+        :returns: The sw_if_indexes of created VXLAN interfaces
+            and of created VLAN sub-interfaces. The number of created
+            interfaces may be lower than requested, if address limit
+            has been reached.
+        :rtype: list of int, list of int
         """
         src_ip_start = ip_address(src_ip_start)
         dst_ip_start = ip_address(dst_ip_start)
-
-        if vxlan_count > 10:
-            commands = list()
-            for i in range(0, vxlan_count):
-                try:
-                    src_ip = src_ip_start + i * ip_step
-                    dst_ip = dst_ip_start + i * ip_step
-                except AddressValueError:
-                    logger.warn(
-                        u"Can't do more iterations - IP address limit "
-                        u"has been reached."
-                    )
-                    vxlan_count = i
-                    break
-                commands.append(
-                    f"sw_interface_add_del_address sw_if_index "
-                    f"{Topology.get_interface_sw_index(node, node_vxlan_if)} "
-                    f"{src_ip}/{128 if src_ip.version == 6 else 32}\n"
-                )
-                commands.append(
-                    f"vxlan_add_del_tunnel src {src_ip} dst {dst_ip} "
-                    f"vni {vni_start + i}\n"
-                )
-                commands.append(
-                    f"create_vlan_subif sw_if_index "
-                    f"{Topology.get_interface_sw_index(node, node_vlan_if)} "
-                    f"vlan {i + 1}\n"
-                )
-            VatExecutor().write_and_execute_script(
-                node, u"/tmp/create_vxlan_interfaces.config", commands
-            )
-            return vxlan_count
+        ip_step = int(ip_step)
+        vxlan_count = TestConfig._limit_address_range(
+            vxlan_count, ip_step, src_ip_start, dst_ip_start
+        )
+        src_prefix_len = 128 if src_ip_start.version == 6 else 32
 
         cmd1 = u"sw_interface_add_del_address"
         args1 = dict(
             sw_if_index=InterfaceUtil.get_interface_index(node, node_vxlan_if),
             is_add=True,
-            del_all=False,
-            prefix=None
+            del_all=False
         )
         cmd2 = u"vxlan_add_del_tunnel"
         args2 = dict(
             is_add=True,
             instance=Constants.BITWISE_NON_ZERO,
-            src_address=None,
-            dst_address=None,
             mcast_sw_if_index=Constants.BITWISE_NON_ZERO,
             encap_vrf_id=0,
-            decap_next_index=Constants.BITWISE_NON_ZERO,
-            vni=None
+            decap_next_index=Constants.BITWISE_NON_ZERO
         )
         cmd3 = u"create_vlan_subif"
         args3 = dict(
-            sw_if_index=InterfaceUtil.get_interface_index(
-                node, node_vlan_if),
-            vlan_id=None
+            sw_if_index=InterfaceUtil.get_interface_index(node, node_vlan_if)
         )
+        err_msg = f"Failed to create VXLAN and VLAN interfaces " \
+            f"on host {node[u'host']}"
+        chunk_size = Constants.PAPI_BULK_CHUNK_SIZE
+        vxlan_indices = list()
+        vlan_indices = list()
 
         with PapiSocketExecutor(node) as papi_exec:
-            for i in range(0, vxlan_count):
-                try:
-                    src_ip = src_ip_start + i * ip_step
-                    dst_ip = dst_ip_start + i * ip_step
-                except AddressValueError:
-                    logger.warn(
-                        u"Can't do more iterations - IP address limit "
-                        u"has been reached."
-                    )
-                    vxlan_count = i
-                    break
-                args1[u"prefix"] = IPUtil.create_prefix_object(
-                    src_ip, 128 if src_ip_start.version == 6 else 32
+            for start in range(0, vxlan_count, chunk_size):
+                stop = min(start + chunk_size, vxlan_count)
+                src_ips = [
+                    src_ip_start + i * ip_step for i in range(start, stop)
+                ]
+                papi_exec.add_batch(
+                    cmd1, dict(
+                        prefix=[
+                            IPUtil.create_prefix_object(src_ip, src_prefix_len)
+                            for src_ip in src_ips
+                        ]
+                    ), keep_replies=False, **args1
                 )
-                args2[u"src_address"] = IPAddress.create_ip_address_object(
-                    src_ip
+                papi_exec.add_batch(
+                    cmd2, dict(
+                        src_address=[
+                            IPAddress.create_ip_address_object(src_ip)
+                            for src_ip in src_ips
+                        ],
+                        dst_address=[
+                            IPAddress.create_ip_address_object(
+                                dst_ip_start + i * ip_step
+                            ) for i in range(start, stop)
+                        ],
+                        vni=range(int(vni_start) + start, int(vni_start) + stop)
+                    ), **args2
                 )
-                args2[u"dst_address"] = IPAddress.create_ip_address_object(
-                    dst_ip
+                papi_exec.add_batch(
+                    cmd3, dict(vlan_id=range(start + 1, stop + 1)), **args3
                 )
-                args2[u"vni"] = int(vni_start) + i
-                args3[u"vlan_id"] = i + 1
-                history = bool(not 1 < i < vxlan_count - 1)
-                papi_exec.add(cmd1, history=history, **args1).\
-                    add(cmd2, history=history, **args2).\
-                    add(cmd3, history=history, **args3)
-            papi_exec.get_replies()
+                replies = papi_exec.get_replies(err_msg)
+                vxlan_indices.extend(
+                    reply[u"sw_if_index"] for reply in replies[:stop - start]
+                )
+                vlan_indices.extend(
+                    reply[u"sw_if_index"] for reply in replies[stop - start:]
+                )
+                if vxlan_count > chunk_size:
+                    logger.debug(
+                        f"Created {stop}/{vxlan_count} VXLAN and VLAN "
+                        f"interfaces on host {node[u'host']}"
+                    )
 
-        return vxlan_count
+        return vxlan_indices, vlan_indices
 
     @staticmethod
-    def vpp_put_vxlan_and_vlan_interfaces_up(node, vxlan_count, node_vlan_if):
+    def vpp_put_vxlan_and_vlan_interfaces_up(node, vxlan_indices, vlan_indices):
         """
         Update topology with VXLAN interfaces and VLAN sub-interfaces data
         and put interfaces up.
 
+        Interface names are read by a single interface dump.
+
         :param node: VPP node.
-        :param vxlan_count: Number of tunnel interfaces.
-        :param node_vlan_if: VPP node interface key where VLAN sub-interfaces
-            have been created.
+        :param vxlan_indices: The sw_if_indexes of VXLAN interfaces.
+        :param vlan_indices: The sw_if_indexes of VLAN sub-interfaces.
         :type node: dict
-        :type vxlan_count: int
-        :type node_vlan_if: str
+        :type vxlan_indices: list of int
+        :type vlan_indices: list of int
         """
-        if_data = InterfaceUtil.vpp_get_interface_data(node)
-        if vxlan_count > 10:
-            commands = list()
-            for i in range(0, vxlan_count):
-                vxlan_subif_key = Topology.add_new_port(node, u"vxlan_tunnel")
-                vxlan_subif_name = f"vxlan_tunnel{i}"
-                founds = dict(vxlan=False, vlan=False)
-                vxlan_subif_idx = None
-                vlan_subif_key = Topology.add_new_port(node, u"vlan_subif")
-                vlan_subif_name = \
-                    f"{Topology.get_interface_name(node, node_vlan_if)}.{i + 1}"
-                vlan_idx = None
-                for data in if_data:
-                    if_name = data[u"interface_name"]
-                    if not founds[u"vxlan"] and if_name == vxlan_subif_name:
-                        vxlan_subif_idx = data[u"sw_if_index"]
-                        founds[u"vxlan"] = True
-                    elif not founds[u"vlan"] and if_name == vlan_subif_name:
-                        vlan_idx = data[u"sw_if_index"]
-                        founds[u"vlan"] = True
-                    if founds[u"vxlan"] and founds[u"vlan"]:
-                        break
-                Topology.update_interface_sw_if_index(
-                    node, vxlan_subif_key, vxlan_subif_idx)
-                Topology.update_interface_name(
-                    node, vxlan_subif_key, vxlan_subif_name)
-                commands.append(
-                    f"sw_interface_set_flags sw_if_index {vxlan_subif_idx} "
-                    f"admin-up link-up\n"
-                )
+        names = {
+            data[u"sw_if_index"]: data[u"interface_name"]
+            for data in InterfaceUtil.vpp_get_interface_data(node)
+        }
+        for ptype, sw_if_indices in (
+                (u"vxlan_tunnel", vxlan_indices),
+                (u"vlan_subif", vlan_indices)):
+            if_keys = Topology.add_new_ports(node, ptype, len(sw_if_indices))
+            for if_key, sw_if_index in zip(if_keys, sw_if_indices):
                 Topology.update_interface_sw_if_index(
-                    node, vlan_subif_key, vlan_idx
+                    node, if_key, sw_if_index
                 )
                 Topology.update_interface_name(
-                    node, vlan_subif_key, vlan_subif_name
-                )
-                commands.append(
-                    f"sw_interface_set_flags sw_if_index {vlan_idx} admin-up "
-                    f"link-up\n"
+                    node, if_key, names.get(sw_if_index)
                 )
-            VatExecutor().write_and_execute_script(
-                node, u"/tmp/put_subinterfaces_up.config", commands
-            )
-            return
 
         cmd = u"sw_interface_set_flags"
-        args1 = dict(
-            sw_if_index=None,
-            flags=InterfaceStatusFlags.IF_STATUS_API_FLAG_ADMIN_UP.value
-        )
-        args2 = dict(
-            sw_if_index=None,
+        args = dict(
             flags=InterfaceStatusFlags.IF_STATUS_API_FLAG_ADMIN_UP.value
         )
+        err_msg = f"Failed to set interfaces up on host {node[u'host']}"
+        sw_if_indices = list(vxlan_indices) + list(vlan_indices)
+        chunk_size = Constants.PAPI_BULK_CHUNK_SIZE
 
         with PapiSocketExecutor(node) as papi_exec:
-            for i in range(0, vxlan_count):
-                vxlan_subif_key = Topology.add_new_port(node, u"vxlan_tunnel")
-                vxlan_subif_name = f"vxlan_tunnel{i}"
-                founds = dict(vxlan=False, vlan=False)
-                vxlan_subif_idx = None
-                vlan_subif_key = Topology.add_new_port(node, u"vlan_subif")
-                vlan_subif_name = \
-                    f"{Topology.get_interface_name(node, node_vlan_if)}.{i+1}"
-                vlan_idx = None
-                for data in if_data:
-                    if not founds[u"vxlan"] \
-                            and data[u"interface_name"] == vxlan_subif_name:
-                        vxlan_subif_idx = data[u"sw_if_index"]
-                        founds[u"vxlan"] = True
-                    elif not founds[u"vlan"] \
-                            and data[u"interface_name"] == vlan_subif_name:
-                        vlan_idx = data[u"sw_if_index"]
-                        founds[u"vlan"] = True
-                    if founds[u"vxlan"] and founds[u"vlan"]:
-                        break
-                Topology.update_interface_sw_if_index(
-                    node, vxlan_subif_key, vxlan_subif_idx
-                )
-                Topology.update_interface_name(
-                    node, vxlan_subif_key, vxlan_subif_name
-                )
-                args1[u"sw_if_index"] = vxlan_subif_idx
-                Topology.update_interface_sw_if_index(
-                    node, vlan_subif_key, vlan_idx
-                )
-                Topology.update_interface_name(
-                    node, vlan_subif_key, vlan_subif_name
-                )
-                args2[u"sw_if_index"] = vlan_idx
-                history = bool(not 1 < i < vxlan_count - 1)
-                papi_exec.add(cmd, history=history, **args1). \
-                    add(cmd, history=history, **args2)
-                papi_exec.add(cmd, **args1).add(cmd, **args2)
-            papi_exec.get_replies()
+            for start in range(0, len(sw_if_indices), chunk_size):
+                papi_exec.add_batch(
+                    cmd, dict(
+                        sw_if_index=sw_if_indices[start:start + chunk_size]
+                    ), keep_replies=False, **args
+                ).get_replies(err_msg)
 
     @staticmethod
     def vpp_put_vxlan_and_vlan_interfaces_to_bridge_domain(
-            node, node_vxlan_if, vxlan_count, op_node, op_node_if, dst_ip_start,
-            ip_step, bd_id_start):
+            node, node_vxlan_if, vxlan_indices, vlan_indices, op_node,
+            op_node_if, dst_ip_start, ip_step, bd_id_start):
         """
         Configure ARPs and routes for VXLAN interfaces and put each pair of
         VXLAN tunnel interface and VLAN sub-interface to separate bridge-domain.
@@ -326,7 +285,8 @@ class TestConfig:
         :param node: VPP node.
         :param node_vxlan_if: VPP node interface key where VXLAN tunnel
             interfaces have been created.
-        :param vxlan_count: Number of tunnel interfaces.
+        :param vxlan_indices: The sw_if_indexes of VXLAN interfaces.
+        :param vlan_indices: The sw_if_indexes of VLAN sub-interfaces.
         :param op_node: Opposite VPP node for VXLAN tunnel interfaces.
         :param op_node_if: Opposite VPP node interface key for VXLAN tunnel
             interfaces.
@@ -335,112 +295,89 @@ class TestConfig:
         :param bd_id_start: Bridge-domain ID start.
         :type node: dict
         :type node_vxlan_if: str
-        :type vxlan_count: int
+        :type vxlan_indices: list of int
+        :type vlan_indices: list of int
         :type op_node: dict
-        :type op_node_if:
+        :type op_node_if: str
         :type dst_ip_start: str
         :type ip_step: int
         :type bd_id_start: int
         """
         dst_ip_start = ip_address(dst_ip_start)
-
-        if vxlan_count > 1:
-            idx_vxlan_if = Topology.get_interface_sw_index(node, node_vxlan_if)
-            commands = list()
-            for i in range(0, vxlan_count):
-                dst_ip = dst_ip_start + i * ip_step
-                commands.append(
-                    f"exec ip neighbor "
-                    f"{Topology.get_interface_name(node, node_vxlan_if)} "
-                    f"{dst_ip} "
-                    f"{Topology.get_interface_mac(op_node, op_node_if)} static "
-                    f"\n"
-                )
-                commands.append(
-                    f"ip_route_add_del "
-                    f"{dst_ip}/{128 if dst_ip.version == 6 else 32} count 1 "
-                    f"via {dst_ip} sw_if_index {idx_vxlan_if}\n"
-                )
-                sw_idx_vxlan = Topology.get_interface_sw_index(
-                    node, f"vxlan_tunnel{i + 1}"
-                )
-                commands.append(
-                    f"sw_interface_set_l2_bridge sw_if_index {sw_idx_vxlan} "
-                    f"bd_id {bd_id_start + i} shg 0 enable\n"
-                )
-                sw_idx_vlan = Topology.get_interface_sw_index(
-                    node, f"vlan_subif{i + 1}"
-                )
-                commands.append(
-                    f"sw_interface_set_l2_bridge sw_if_index {sw_idx_vlan} "
-                    f"bd_id {bd_id_start + i} shg 0 enable\n"
-                )
-            VatExecutor().write_and_execute_script(
-                node, u"/tmp/configure_routes_and_bridge_domains.config",
-                commands
-            )
-            return
+        ip_step = int(ip_step)
+        bd_id_start = int(bd_id_start)
+        dst_prefix_len = 128 if dst_ip_start.version == 6 else 32
+        vxlan_count = len(vxlan_indices)
 
         cmd1 = u"ip_neighbor_add_del"
         neighbor = dict(
             sw_if_index=Topology.get_interface_sw_index(node, node_vxlan_if),
             flags=0,
-            mac_address=Topology.get_interface_mac(op_node, op_node_if),
-            ip_address=u""
+            mac_address=Topology.get_interface_mac(op_node, op_node_if)
         )
         args1 = dict(
-            is_add=1,
-            neighbor=neighbor
+            is_add=1
         )
         cmd2 = u"ip_route_add_del"
-        kwargs = dict(
-            interface=node_vxlan_if,
-            gateway=str(dst_ip_start)
-        )
         route = IPUtil.compose_vpp_route_structure(
-            node, str(dst_ip_start),
-            128 if dst_ip_start.version == 6 else 32, **kwargs
+            node, str(dst_ip_start), dst_prefix_len, interface=node_vxlan_if,
+            gateway=str(dst_ip_start)
         )
+        path = route[u"paths"][0]
         args2 = dict(
             is_add=1,
-            is_multipath=0,
-            route=route
+            is_multipath=0
         )
         cmd3 = u"sw_interface_set_l2_bridge"
         args3 = dict(
-            rx_sw_if_index=None,
-            bd_id=None,
-            shg=0,
-            port_type=0,
-            enable=1
-        )
-        args4 = dict(
-            rx_sw_if_index=None,
-            bd_id=None,
             shg=0,
             port_type=0,
             enable=1
         )
+        err_msg = f"Failed to configure bridge domains on host {node[u'host']}"
+        chunk_size = Constants.PAPI_BULK_CHUNK_SIZE
 
         with PapiSocketExecutor(node) as papi_exec:
-            for i in range(0, vxlan_count):
-                args1[u"neighbor"][u"ip_address"] = \
-                    str(dst_ip_start + i * ip_step)
-                args2[u"route"][u"prefix"][u"address"][u"un"] = \
-                    IPAddress.union_addr(dst_ip_start + i * ip_step)
-                args2[u"route"][u"paths"][0][u"nh"][u"address"] = \
-                    IPAddress.union_addr(dst_ip_start + i * ip_step)
-                args3[u"rx_sw_if_index"] = Topology.get_interface_sw_index(
-                    node, f"vxlan_tunnel{i+1}"
+            for start in range(0, vxlan_count, chunk_size):
+                stop = min(start + chunk_size, vxlan_count)
+                dst_ips = [
+                    dst_ip_start + i * ip_step for i in range(start, stop)
+                ]
+                papi_exec.add_batch(
+                    cmd1, dict(
+                        neighbor=[
+                            dict(neighbor, ip_address=str(dst_ip))
+                            for dst_ip in dst_ips
+                        ]
+                    ), keep_replies=False, **args1
+                )
+                papi_exec.add_batch(
+                    cmd2, dict(
+                        route=[
+                            dict(
+                                route, prefix=IPUtil.create_prefix_object(
+                                    dst_ip, dst_prefix_len
+                                ), paths=[
+                                    dict(path, nh=dict(
+                                        path[u"nh"],
+                                        address=IPAddress.union_addr(dst_ip)
+                                    ))
+                                ]
+                            ) for dst_ip in dst_ips
+                        ]
+                    ), keep_replies=False, **args2
                 )
-                args3[u"bd_id"] = int(bd_id_start+i)
-                args4[u"rx_sw_if_index"] = Topology.get_interface_sw_index(
-                    node, f"vlan_subif{i+1}"
+                bd_ids = range(bd_id_start + start, bd_id_start + stop)
+                papi_exec.add_batch(
+                    cmd3, dict(
+                        rx_sw_if_index=vxlan_indices[start:stop]
+                        + vlan_indices[start:stop],
+                        bd_id=list(bd_ids) * 2
+                    ), keep_replies=False, **args3
                 )
-                args4[u"bd_id"] = int(bd_id_start+i)
-                history = bool(not 1 < i < vxlan_count - 1)
-                papi_exec.add(cmd1, history=history, **args1). \
-                    add(cmd2, history=history, **args2). \
-                    add(cmd3, history=history, **args3). \
-                    add(cmd3, history=history, **args4)
-            papi_exec.get_replies()
+                papi_exec.get_replies(err_msg)
+                if vxlan_count > chunk_size:
+                    logger.debug(
+                        f"Configured {stop}/{vxlan_count} bridge domains "
+                        f"on host {node[u'host']}"
+                    )
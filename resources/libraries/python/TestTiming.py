@@ -0,0 +1,331 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Library recording where test time goes, as categorized timing spans.
+
+Library code marks expensive operations (SSH commands, PAPI calls,
+traffic generator trials, ...) with timed decorator or timing_span
+context manager. Spans are aggregated per category, per phase
+(setup, body, teardown) of the current test, or of the current suite
+if no test is running.
+
+When imported by Robot, the library acts as a listener switching
+the phases, and (if Constants.TEST_TIMING_FILE is set) appending
+one JSON line per test and per suite to that file.
+
+Spans may be nested, e.g. PAPI connection runs SSH commands.
+Span "total" includes nested spans, "self" excludes them,
+so "self" times of all categories can be summed.
+"""
+
+import json
+import threading
+
+from contextlib import contextmanager
+from functools import wraps
+from time import monotonic
+
+from robot.api import logger
+
+from resources.libraries.python.Constants import Constants
+
+__all__ = [u"TestTiming", u"timed", u"timing_span"]
+
+
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+
+
+class _TimingRecord:
+    """Spans aggregated for one test (or suite) so far."""
+
+    def __init__(self, phase):
+        """Start the first phase.
+
+        :param phase: Name of the first phase.
+        :type phase: str
+        """
+        self.phases = dict()
+        self.phase = phase
+        self.phase_start = monotonic()
+
+    def switch(self, phase):
+        """Finish the current phase, start the next one.
+
+        :param phase: Name of the next phase.
+        :type phase: str
+        """
+        now = monotonic()
+        item = self.phases.setdefault(
+            self.phase, dict(duration=0.0, spans=dict())
+        )
+        item[u"duration"] += now - self.phase_start
+        self.phase = phase
+        self.phase_start = now
+
+    def add(self, category, total, self_time):
+        """Aggregate a finished span into the current phase.
+
+        :param category: Category of the span.
+        :param total: Duration of the span, including nested spans [s].
+        :param self_time: Duration excluding nested spans [s].
+        :type category: str
+        :type total: float
+        :type self_time: float
+        """
+        spans = self.phases.setdefault(
+            self.phase, dict(duration=0.0, spans=dict())
+        )[u"spans"]
+        stats = spans.get(category)
+        if stats is None:
+            spans[category] = dict(
+                count=1, total=total, self=self_time, max=total
+            )
+            return
+        stats[u"count"] += 1
+        stats[u"total"] += total
+        stats[u"self"] += self_time
+        stats[u"max"] = max(stats[u"max"], total)
+
+
+# Record of the running test, or of the suite outside tests.
+_RECORD = _TimingRecord(u"suite")
+
+
+@contextmanager
+def timing_span(category):
+    """Measure the duration of the with block as a span of the category.
+
+    :param category: Category of the span, e.g. "ssh" or "papi".
+    :type category: str
+    :returns: Context manager measuring the block.
+    :rtype: contextmanager
+    """
+    stack = getattr(_LOCAL, u"stack", None)
+    if stack is None:
+        stack = _LOCAL.stack = list()
+    # Nested spans add their durations to this item.
+    stack.append(0.0)
+    start = monotonic()
+    try:
+        yield
+    finally:
+        total = monotonic() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += total
+        with _LOCK:
+            _RECORD.add(category, total, total - nested)
+
+
+def timed(category):
+    """Return decorator measuring each call of a function as a span.
+
+    :param category: Category of the span, e.g. "ssh" or "papi".
+    :type category: str
+    :returns: Decorator to apply to functions or methods.
+    :rtype: callable
+    """
+    def decorator(func):
+        """Wrap the function into a timing span.
+
+        :param func: The function to measure.
+        :type func: callable
+        :returns: The wrapped function.
+        :rtype: callable
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            """Call the function inside a timing span.
+
+            :param args: Positional arguments of the function.
+            :param kwargs: Keyword arguments of the function.
+            :type args: list
+            :type kwargs: dict
+            :returns: Return value of the function.
+            :rtype: object
+            """
+            with timing_span(category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _swap_record(record):
+    """Replace the global record, finishing the current phase of the old one.
+
+    :param record: The record to aggregate the following spans into.
+    :type record: _TimingRecord
+    :returns: The replaced record.
+    :rtype: _TimingRecord
+    """
+    global _RECORD
+    with _LOCK:
+        old_record = _RECORD
+        old_record.switch(old_record.phase)
+        record.phase_start = old_record.phase_start
+        _RECORD = record
+    return old_record
+
+
+def _switch_phase(phase):
+    """Switch the phase of the global record.
+
+    :param phase: Name of the next phase.
+    :type phase: str
+    """
+    with _LOCK:
+        _RECORD.switch(phase)
+
+
+class _TimingListener:
+    """Robot listener switching timing phases and exporting the records.
+
+    Kept separate from the library, so its methods are not keywords.
+    """
+
+    ROBOT_LISTENER_API_VERSION = 2
+
+    def __init__(self):
+        """Initialize the stack of interrupted records."""
+        self._stack = list()
+        self._suite = None
+        self._test = None
+
+    def _export(self, record, status):
+        """Append the record as a JSON line to the timing file.
+
+        Phases without spans shorter than a millisecond are omitted.
+
+        :param record: The finished record.
+        :param status: Status of the test or suite.
+        :type record: _TimingRecord
+        :type status: str
+        """
+        if not Constants.TEST_TIMING_FILE:
+            return
+        phases = {
+            phase: item for phase, item in record.phases.items()
+            if item[u"spans"] or item[u"duration"] >= 0.001
+        }
+        line = json.dumps(
+            dict(
+                suite=self._suite, test=self._test, status=status,
+                phases=phases
+            ), sort_keys=True
+        )
+        try:
+            with open(Constants.TEST_TIMING_FILE, u"at") as timing_file:
+                timing_file.write(line + u"\n")
+        except OSError as err:
+            logger.warn(f"Cannot write test timing: {err!r}")
+
+    def start_suite(self, name, attrs):
+        """Start recording a suite.
+
+        :param name: Name of the suite.
+        :param attrs: Attributes of the suite.
+        :type name: str
+        :type attrs: dict
+        """
+        _ = name
+        self._stack.append(_swap_record(_TimingRecord(u"suite")))
+        self._suite = attrs[u"longname"]
+
+    def end_suite(self, name, attrs):
+        """Export the suite level record, restore the parent one.
+
+        :param name: Name of the suite.
+        :param attrs: Attributes of the suite.
+        :type name: str
+        :type attrs: dict
+        """
+        _ = name
+        self._suite = attrs[u"longname"]
+        parent = self._stack.pop() if self._stack \
+            else _TimingRecord(u"suite")
+        self._export(_swap_record(parent), attrs[u"status"])
+
+    def start_test(self, name, attrs):
+        """Start recording a test.
+
+        :param name: Name of the test.
+        :param attrs: Attributes of the test.
+        :type name: str
+        :type attrs: dict
+        """
+        _ = attrs
+        self._stack.append(_swap_record(_TimingRecord(u"body")))
+        self._test = name
+
+    def end_test(self, name, attrs):
+        """Export the test record, restore the suite one.
+
+        :param name: Name of the test.
+        :param attrs: Attributes of the test.
+        :type name: str
+        :type attrs: dict
+        """
+        self._test = name
+        parent = self._stack.pop() if self._stack \
+            else _TimingRecord(u"suite")
+        self._export(_swap_record(parent), attrs[u"status"])
+        self._test = None
+
+    def start_keyword(self, name, attrs):
+        """Switch to setup or teardown phase.
+
+        :param name: Name of the keyword.
+        :param attrs: Attributes of the keyword.
+        :type name: str
+        :type attrs: dict
+        """
+        _ = name
+        if attrs[u"type"] in (u"Setup", u"Teardown"):
+            prefix = u"" if self._test else u"suite "
+            _switch_phase(f"{prefix}{attrs[u'type'].lower()}")
+
+    def end_keyword(self, name, attrs):
+        """Switch back from setup phase.
+
+        :param name: Name of the keyword.
+        :param attrs: Attributes of the keyword.
+        :type name: str
+        :type attrs: dict
+        """
+        _ = name
+        if attrs[u"type"] == u"Setup":
+            _switch_phase(u"body" if self._test else u"suite")
+
+
+class TestTiming:
+    """Robot library recording timing spans of tests and suites."""
+
+    ROBOT_LIBRARY_SCOPE = u"GLOBAL"
+
+    def __init__(self):
+        """Register the listener."""
+        self.ROBOT_LIBRARY_LISTENER = _TimingListener()
+
+    @staticmethod
+    def set_test_timing_phase(phase):
+        """Attribute the following spans to the phase of the current test.
+
+        Useful to separate e.g. measurement from configuration in test body.
+        The phase lasts until the next switch (e.g. to teardown).
+
+        :param phase: Name of the phase.
+        :type phase: str
+        """
+        _switch_phase(phase)
@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -27,6 +27,7 @@ from .MLRsearch.ReceiveRateMeasurement import ReceiveRateMeasurement
 from .PLRsearch.PLRsearch import PLRsearch
 from .OptionString import OptionString
 from .ssh import exec_cmd_no_error, exec_cmd
+from .TestTiming import timed
 from .topology import NodeType
 from .topology import NodeSubTypeTG
 from .topology import Topology
@@ -247,6 +248,7 @@ class TrafficGenerator(AbstractMeasurer):
         )
 
     # TODO: pylint says disable=too-many-locals.
+    @timed(u"trex setup")
     def initialize_traffic_generator(
             self, tg_node, tg_if1, tg_if2, tg_if1_adj_node, tg_if1_adj_if,
             tg_if2_adj_node, tg_if2_adj_if, osi_layer, tg_if1_dst_mac=None,
@@ -346,6 +348,7 @@ class TrafficGenerator(AbstractMeasurer):
             )
 
     @staticmethod
+    @timed(u"trex setup")
     def startup_trex(tg_node, osi_layer, subtype=None):
         """Startup sequence for the TRex traffic generator.
 
@@ -741,6 +744,7 @@ class TrafficGenerator(AbstractMeasurer):
             self._duration = duration
             self._parse_traffic_results(stdout)
 
+    @timed(u"trex traffic")
     def send_traffic_on_tg(
             self,
             duration,
@@ -1130,6 +1134,7 @@ class TrafficGenerator(AbstractMeasurer):
         measurement.latency = self.get_latency_int()
         return measurement
 
+    @timed(u"trex traffic")
     def measure(self, duration, transmit_rate):
         """Run trial measurement, parse and return results.
 
@@ -1270,6 +1275,7 @@ class OptimizedSearch:
             transaction_scale=0,
             transaction_type=u"packet",
             use_latency=False,
+            time_budget=None,
     ):
         """Setup initialized TG, perform optimized search, return intervals.
 
@@ -1312,6 +1318,9 @@ class OptimizedSearch:
             transactions. Default: "packet".
         :param use_latency: Whether to measure latency during the trial.
             Default: False.
+        :param time_budget: If set, the search adapts trial durations
+            and width goals to finish within this time [s].
+            Default: None (use PERF_SEARCH_TIME_BUDGET, if set).
         :type frame_size: str or int
         :type traffic_profile: str
         :type minimum_transmit_rate: float
@@ -1330,6 +1339,7 @@ class OptimizedSearch:
         :type transaction_scale: int
         :type transaction_type: str
         :type use_latency: bool
+        :type time_budget: Optional[float]
         :returns: Structure containing narrowed down NDR and PDR intervals
             and their measurements.
         :rtype: NdrPdrResult
@@ -1348,6 +1358,8 @@ class OptimizedSearch:
             final_trial_duration = 2.0
             number_of_intermediate_phases = 0
             timeout = 3600.0
+        if time_budget is None:
+            time_budget = Constants.PERF_SEARCH_TIME_BUDGET or None
         tg_instance.set_rate_provider_defaults(
             frame_size=frame_size,
             traffic_profile=traffic_profile,
@@ -1368,6 +1380,7 @@ class OptimizedSearch:
             initial_trial_duration=initial_trial_duration,
             timeout=timeout,
             doublings=doublings,
+            time_budget=time_budget,
         )
         result = algorithm.narrow_down_ndr_and_pdr(
             min_rate=minimum_transmit_rate,
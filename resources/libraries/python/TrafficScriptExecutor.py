@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -13,8 +13,10 @@
 
 """Traffic script executor library."""
 
+from robot.api import logger
+
 from resources.libraries.python.Constants import Constants
-from resources.libraries.python.ssh import SSH
+from resources.libraries.python.ssh import SSH, exec_cmd
 
 __all__ = [u"TrafficScriptExecutor"]
 
@@ -22,6 +24,12 @@ __all__ = [u"TrafficScriptExecutor"]
 class TrafficScriptExecutor:
     """Traffic script executor utilities."""
 
+    # Unix socket the traffic script agent listens on, at TG node.
+    # Kept outside of the framework directory, which is removed on cleanup.
+    AGENT_SOCKET = u"/tmp/csit_traffic_script_agent.sock"
+    # Agent state per (host, port), True if running, False if start failed.
+    _agents = dict()
+
     @staticmethod
     def _escape(string):
         """Escape quotation mark and dollar mark for shell command.
@@ -33,11 +41,73 @@ class TrafficScriptExecutor:
         """
         return string.replace(u'"', u'\\"').replace(u"$", u"\\$")
 
+    @staticmethod
+    def start_traffic_script_agent(node):
+        """Start resident traffic script agent on the TG node, if not started.
+
+        The agent is started once per node and test run. Virtualenv is created
+        only if missing, agent left from previous start is stopped first.
+        The agent preloads scapy, so this waits until it is listening.
+
+        :param node: TG node to start the agent on.
+        :type node: dict
+        :returns: True if the agent is running.
+        :rtype: bool
+        """
+        key = (node[u"host"], node[u"port"])
+        if key in TrafficScriptExecutor._agents:
+            return TrafficScriptExecutor._agents[key]
+        sock = TrafficScriptExecutor.AGENT_SOCKET
+        TrafficScriptExecutor.stop_traffic_script_agent(node)
+        cmd = f"cd {Constants.REMOTE_FW_DIR}; test -x env/bin/python || " \
+            f"virtualenv -p $(which python3) --system-site-packages " \
+            f"--never-download env && export PYTHONPATH=${{PWD}}; cd GPL; " \
+            f"setsid nohup ${{PYTHONPATH}}/env/bin/python " \
+            f"-m traffic_scripts.agent --socket {sock} --serve " \
+            f"< /dev/null > {sock}.log 2>&1 & " \
+            f"for i in $(seq 300); do test -S {sock} && break; sleep 0.1; " \
+            f"done; test -S {sock}"
+        ret_code, _, _ = exec_cmd(
+            node, f'sh -c "{TrafficScriptExecutor._escape(cmd)}"', timeout=60,
+            sudo=True
+        )
+        running = ret_code == 0
+        if not running:
+            logger.warn(
+                f"Traffic script agent failed to start on {node[u'host']}, "
+                f"running traffic scripts as separate processes."
+            )
+        TrafficScriptExecutor._agents[key] = running
+        return running
+
+    @staticmethod
+    def stop_traffic_script_agent(node):
+        """Stop traffic script agent on the TG node, if running.
+
+        The agent is found by its command line, so also an agent
+        whose pid file got lost is stopped. The bracket in the pattern
+        prevents matching the shell running the pkill command.
+
+        :param node: TG node to stop the agent on.
+        :type node: dict
+        """
+        sock = TrafficScriptExecutor.AGENT_SOCKET
+        cmd = f"pkill -f 'traffic_script[s].agent --socket {sock} --serve'; " \
+            f"rm -f {sock} {sock}.pid"
+        exec_cmd(
+            node, f'sh -c "{TrafficScriptExecutor._escape(cmd)}"', sudo=True
+        )
+        TrafficScriptExecutor._agents.pop((node[u"host"], node[u"port"]), None)
+
     @staticmethod
     def run_traffic_script_on_node(
             script_file_name, node, script_args, timeout=60):
         """Run traffic script on the TG node.
 
+        Unless disabled by TRAFFIC_SCRIPT_AGENT environment variable,
+        the script is run by the resident traffic script agent,
+        which is started on first use.
+
         :param script_file_name: Traffic script name.
         :param node: Node to run traffic script on.
         :param script_args: Traffic scripts arguments.
@@ -56,10 +126,18 @@ class TrafficScriptExecutor:
         ssh = SSH()
         ssh.connect(node)
         module_name = script_file_name[:-3].replace('/', '.')
-        cmd = f"cd {Constants.REMOTE_FW_DIR}; virtualenv -p $(which python3) " \
-            f"--system-site-packages --never-download env && " \
-            f"export PYTHONPATH=${{PWD}}; . ${{PWD}}/env/bin/activate; " \
-            f"cd GPL; python -m traffic_scripts.{module_name} {script_args}"
+        if Constants.TRAFFIC_SCRIPT_AGENT and \
+                TrafficScriptExecutor.start_traffic_script_agent(node):
+            cmd = f"cd {Constants.REMOTE_FW_DIR}/GPL; " \
+                f"../env/bin/python -m traffic_scripts.agent " \
+                f"--socket {TrafficScriptExecutor.AGENT_SOCKET} " \
+                f"--timeout {timeout} --call {module_name} {script_args}"
+        else:
+            cmd = f"cd {Constants.REMOTE_FW_DIR}; virtualenv " \
+                f"-p $(which python3) --system-site-packages " \
+                f"--never-download env && export PYTHONPATH=${{PWD}}; " \
+                f". ${{PWD}}/env/bin/activate; cd GPL; " \
+                f"python -m traffic_scripts.{module_name} {script_args}"
         ret_code, stdout, stderr = ssh.exec_command_sudo(
             f'sh -c "{TrafficScriptExecutor._escape(cmd)}"', timeout=timeout
         )
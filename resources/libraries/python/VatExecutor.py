@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -25,6 +25,7 @@ import resources.libraries.python.DUTSetup as PidLib
 from resources.libraries.python.Constants import Constants
 from resources.libraries.python.PapiHistory import PapiHistory
 from resources.libraries.python.ssh import SSH, SSHTimeout
+from resources.libraries.python.TestTiming import timed
 
 __all__ = [u"VatExecutor"]
 
@@ -74,6 +75,7 @@ class VatExecutor:
         self._ret_code = None
         self._script_name = None
 
+    @timed(u"vat")
     def execute_script(
             self, vat_name, node, timeout=120, json_out=True,
             copy_on_execute=False, history=True):
@@ -290,6 +292,7 @@ class VatTerminal:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.vat_terminal_close()
 
+    @timed(u"vat")
     def vat_terminal_exec_cmd(self, cmd):
         """Execute command on the opened VAT terminal.
 
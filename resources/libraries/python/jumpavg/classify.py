@@ -1,4 +1,4 @@
-# Copyright (c) 2019 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -24,32 +24,42 @@ from .AvgStdevStats import AvgStdevStats
 from .BitCountingGroupList import BitCountingGroupList
 
 
-def classify(values):
+def classify(values, max_value=None):
     """Return the values in groups of optimal bit count.
 
-    Here, a value is either a float, or an iterable of floats.
+    Here, a value is either a float, or an iterable of floats,
+    or AvgStdevStats instance.
     Such iterables represent an undivisible sequence of floats.
 
     Internally, such sequence is replaced by AvgStdevStats
     after maximal value is found.
 
+    Values already aggregated into AvgStdevStats instances do not
+    carry their maximum, so max_value should be given by the caller then.
+
     :param values: Sequence of runs to classify.
-    :type values: Iterable[Union[float, Iterable[float]]]
+    :param max_value: Maximal value of all runs, computed if None.
+    :type values: Iterable[Union[float, Iterable[float], AvgStdevStats]]
+    :type max_value: Optional[float]
     :returns: Classified group list.
     :rtype: BitCountingGroupList
     """
     processed_values = list()
-    max_value = 0.0
+    computed_max_value = 0.0
     for value in values:
         if isinstance(value, (float, int)):
-            if value > max_value:
-                max_value = value
+            if value > computed_max_value:
+                computed_max_value = value
+            processed_values.append(value)
+        elif isinstance(value, AvgStdevStats):
             processed_values.append(value)
         else:
             for subvalue in value:
-                if subvalue > max_value:
-                    max_value = subvalue
+                if subvalue > computed_max_value:
+                    computed_max_value = subvalue
             processed_values.append(AvgStdevStats.for_runs(value))
+    if max_value is None:
+        max_value = computed_max_value
     open_at = list()
     closed_before = [BitCountingGroupList(max_value=max_value)]
     for index, value in enumerate(processed_values):
@@ -1,4 +1,4 @@
-# Copyright (c) 2019 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -25,6 +25,7 @@ from robot.api import logger
 from scp import SCPClient, SCPException
 
 from resources.libraries.python.OptionString import OptionString
+from resources.libraries.python.TestTiming import timed
 
 __all__ = [
     u"exec_cmd", u"exec_cmd_no_error", u"SSH", u"SSHTimeout", u"scp_node"
@@ -58,6 +59,7 @@ class SSH:
         """
         return hash(frozenset([node[u"host"], node[u"port"]]))
 
+    @timed(u"ssh connect")
     def connect(self, node, attempts=5):
         """Connect to node prior to running exec_command or scp.
 
@@ -142,6 +144,7 @@ class SSH:
             f"Reconnecting peer done: {node[u'host']}, {node[u'port']}"
         )
 
+    @timed(u"ssh")
     def exec_command(self, cmd, timeout=10, log_stdout_err=True):
         """Execute SSH command on a new channel on the connected Node.
 
@@ -362,6 +365,7 @@ class SSH:
         """
         chan.close()
 
+    @timed(u"scp")
     def scp(
             self, local_path, remote_path, get=False, timeout=30,
             wildcard=False):
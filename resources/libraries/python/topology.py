@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -16,6 +16,7 @@
 import re
 
 from collections import Counter
+from heapq import heappop, heappush
 
 from yaml import safe_load
 
@@ -93,6 +94,10 @@ class Topology:
     does not rely on the data retrieved from nodes, this allows to call most of
     the methods without having filled active topology with internal nodes data.
     """
+
+    INDEXED_FIELDS = (u"name", u"vpp_sw_index", u"link")
+    """Interface fields with reverse index (value to interface key)."""
+
     @staticmethod
     def add_node_item(node, value, path):
         """Add item to topology node.
@@ -114,6 +119,94 @@ class Topology:
                 else {node[path[0]]: u""}
         Topology.add_node_item(node[path[0]], value, path[1:])
 
+    @staticmethod
+    def _get_port_allocator(node):
+        """Return port key allocator state of the node, create if missing.
+
+        The state is stored in the node dict under "port_allocator" key.
+        Its "types" item maps port type to a dict with "next" (lowest
+        number never allocated), "free" (heap of released numbers)
+        and "used" (count of allocated keys) items.
+        Its "keys" item maps allocated port key to (port type, number).
+
+        :param node: The node dictionary.
+        :type node: dict
+        :returns: Port allocator state of the node.
+        :rtype: dict
+        """
+        allocator = node.get(u"port_allocator")
+        if allocator is None:
+            allocator = dict(types=dict(), keys=dict())
+            node[u"port_allocator"] = allocator
+        return allocator
+
+    @staticmethod
+    def _release_port_key(node, iface_key):
+        """Return key of a removed port to the allocator, if allocated there.
+
+        When no key of the port type remains allocated, the type state
+        is reset, so the free list does not outlive the ports.
+
+        :param node: The node dictionary.
+        :param iface_key: Topology key of the removed interface.
+        :type node: dict
+        :type iface_key: str
+        """
+        allocator = node.get(u"port_allocator")
+        if allocator is None:
+            return
+        allocated = allocator[u"keys"].pop(iface_key, None)
+        if allocated is None:
+            return
+        ptype, number = allocated
+        state = allocator[u"types"][ptype]
+        state[u"used"] -= 1
+        if state[u"used"]:
+            heappush(state[u"free"], number)
+        else:
+            allocator[u"types"].pop(ptype)
+
+    @staticmethod
+    def add_new_ports(node, ptype, count):
+        """Add new ports to the node to active topology.
+
+        Keys are ptype followed by the lowest numbers (starting from 1)
+        not used by other ports, as with repeated add_new_port calls,
+        but each key is found in constant amortized time.
+
+        :param node: Node to add new ports on.
+        :param ptype: Port type, used as key prefix.
+        :param count: Number of ports to add.
+        :type node: dict
+        :type ptype: str
+        :type count: int
+        :returns: Port keys, in allocation order.
+        :rtype: list of str
+        """
+        ptype = str(ptype)
+        interfaces = node[u"interfaces"]
+        allocator = Topology._get_port_allocator(node)
+        state = allocator[u"types"].setdefault(
+            ptype, dict(next=1, free=list(), used=0)
+        )
+        free = state[u"free"]
+        if_keys = list()
+        while len(if_keys) < int(count):
+            if free and free[0] < state[u"next"]:
+                number = heappop(free)
+            else:
+                number = state[u"next"]
+                state[u"next"] += 1
+            iface = ptype + str(number)
+            # Keys may be added by editing the interfaces directly.
+            if iface in interfaces:
+                continue
+            interfaces[iface] = dict()
+            allocator[u"keys"][iface] = (ptype, number)
+            state[u"used"] += 1
+            if_keys.append(iface)
+        return if_keys
+
     @staticmethod
     def add_new_port(node, ptype):
         """Add new port to the node to active topology.
@@ -125,14 +218,7 @@ class Topology:
         :returns: Port key or None
         :rtype: string or None
         """
-        max_ports = 1000000
-        iface = None
-        for i in range(1, max_ports):
-            if node[u"interfaces"].get(str(ptype) + str(i)) is None:
-                iface = str(ptype) + str(i)
-                node[u"interfaces"][iface] = dict()
-                break
-        return iface
+        return Topology.add_new_ports(node, ptype, 1)[0]
 
     @staticmethod
     def remove_port(node, iface_key):
@@ -145,9 +231,26 @@ class Topology:
         :returns: Nothing
         """
         try:
+            Topology._unindex_interface(node, iface_key)
             node[u"interfaces"].pop(iface_key)
         except KeyError:
-            pass
+            return
+        Topology._release_port_key(node, iface_key)
+
+    @staticmethod
+    def _remove_matching_ports(node, predicate):
+        """Remove ports with keys matching the predicate, in a single pass.
+
+        :param node: Node to remove ports on.
+        :param predicate: Callable returning True for keys to remove.
+        :type node: dict
+        :type predicate: Callable[[str], bool]
+        """
+        for if_key in list(node[u"interfaces"]):
+            if predicate(if_key):
+                Topology._unindex_interface(node, if_key)
+                node[u"interfaces"].pop(if_key)
+                Topology._release_port_key(node, if_key)
 
     @staticmethod
     def remove_all_ports(node, ptype):
@@ -159,9 +262,10 @@ class Topology:
         :type ptype: str
         :returns: Nothing
         """
-        for if_key in list(node[u"interfaces"]):
-            if if_key.startswith(str(ptype)):
-                node[u"interfaces"].pop(if_key)
+        prefix = str(ptype)
+        Topology._remove_matching_ports(
+            node, lambda if_key: if_key.startswith(prefix)
+        )
 
     @staticmethod
     def remove_all_added_ports_on_all_duts_from_topology(nodes):
@@ -179,8 +283,9 @@ class Topology:
 
         for node_data in nodes.values():
             if node_data[u"type"] == NodeType.DUT:
-                for ptype in port_types:
-                    Topology.remove_all_ports(node_data, ptype)
+                Topology._remove_matching_ports(
+                    node_data, lambda if_key: if_key.startswith(port_types)
+                )
 
     @staticmethod
     def remove_all_vif_ports(node):
@@ -191,9 +296,9 @@ class Topology:
         :returns: Nothing
         """
         reg_ex = re.compile(r"port\d+_vif\d+")
-        for if_key in list(node[u"interfaces"]):
-            if re.match(reg_ex, if_key):
-                node[u"interfaces"].pop(if_key)
+        Topology._remove_matching_ports(
+            node, lambda if_key: re.match(reg_ex, if_key)
+        )
 
     @staticmethod
     def remove_all_added_vif_ports_on_all_duts_from_topology(nodes):
@@ -220,6 +325,9 @@ class Topology:
         :type sw_if_index: int
         """
         node[u"interfaces"][iface_key][u"vpp_sw_index"] = int(sw_if_index)
+        Topology._index_interface_value(
+            node, iface_key, u"vpp_sw_index", int(sw_if_index)
+        )
 
     @staticmethod
     def update_interface_name(node, iface_key, name):
@@ -233,6 +341,7 @@ class Topology:
         :type name: str
         """
         node[u"interfaces"][iface_key][u"name"] = str(name)
+        Topology._index_interface_value(node, iface_key, u"name", str(name))
 
     @staticmethod
     def update_interface_mac_address(node, iface_key, mac_address):
@@ -375,11 +484,86 @@ class Topology:
 
         return links
 
+    @staticmethod
+    def _get_interface_index(node):
+        """Return reverse interface indexes of the node, build if missing.
+
+        The indexes are stored in the node dict under "interface_index" key,
+        as mapping from indexed field name ("name", "vpp_sw_index", "link")
+        to mapping from field value to list of interface keys.
+
+        Update and remove methods of this class keep the indexes up to date,
+        but interface dicts may also be edited directly by other libraries,
+        so users of the indexes have to verify the hits.
+
+        :param node: The node dictionary.
+        :type node: dict
+        :returns: Reverse indexes of the node interfaces.
+        :rtype: dict
+        """
+        index = node.get(u"interface_index")
+        if index is None:
+            index = {field: dict() for field in Topology.INDEXED_FIELDS}
+            for if_key, if_val in node[u"interfaces"].items():
+                for field in Topology.INDEXED_FIELDS:
+                    value = if_val.get(field)
+                    if value is not None:
+                        index[field].setdefault(value, list()).append(if_key)
+            node[u"interface_index"] = index
+        return index
+
+    @staticmethod
+    def _index_interface_value(node, iface_key, field, value):
+        """Register new value of an indexed field of the interface.
+
+        The interface becomes the preferred result for lookups by the value.
+
+        :param node: The node dictionary.
+        :param iface_key: Topology key of the interface.
+        :param field: Name of the indexed field.
+        :param value: New value of the field.
+        :type node: dict
+        :type iface_key: str
+        :type field: str
+        :type value: object
+        """
+        mapping = Topology._get_interface_index(node)[field]
+        if_keys = mapping.get(value, list())
+        mapping[value] = [iface_key] + [
+            if_key for if_key in if_keys if if_key != iface_key
+        ]
+
+    @staticmethod
+    def _unindex_interface(node, iface_key):
+        """Remove the interface from all reverse indexes of the node.
+
+        :param node: The node dictionary.
+        :param iface_key: Topology key of the interface to be removed.
+        :type node: dict
+        :type iface_key: str
+        :raises KeyError: If the interface is not present in the node.
+        """
+        if_val = node[u"interfaces"][iface_key]
+        index = node.get(u"interface_index")
+        if index is None:
+            return
+        for field, mapping in index.items():
+            value = if_val.get(field)
+            if_keys = mapping.get(value, ())
+            if iface_key in if_keys:
+                if_keys.remove(iface_key)
+                if not if_keys:
+                    mapping.pop(value)
+
     @staticmethod
     def _get_interface_by_key_value(node, key, value):
         """Return node interface key from topology file
         according to key and value.
 
+        For indexed keys, the reverse index of the node is used first,
+        the (verified) hits are returned without scanning the interfaces.
+        On miss, all interfaces are scanned and a found result is indexed.
+
         :param node: The node dictionary.
         :param key: Key by which to select the interface.
         :param value: Value that should be found using the key.
@@ -390,6 +574,12 @@ class Topology:
         :rtype: string
         """
         interfaces = node[u"interfaces"]
+        mapping = None
+        if key in Topology.INDEXED_FIELDS:
+            mapping = Topology._get_interface_index(node)[key]
+            for if_key in mapping.get(value, ()):
+                if interfaces.get(if_key, dict()).get(key) == value:
+                    return if_key
         retval = None
         for if_key, if_val in interfaces.items():
             k_val = if_val.get(key)
@@ -397,6 +587,8 @@ class Topology:
                 if k_val == value:
                     retval = if_key
                     break
+        if retval is not None and mapping is not None:
+            Topology._index_interface_value(node, retval, key, value)
         return retval
 
     @staticmethod
@@ -574,10 +766,11 @@ class Topology:
                 )
         elif interface in Topology.get_node_interfaces(node):
             key = interface
-        elif interface in Topology.get_links({u"dut": node}):
-            key = Topology.get_interface_by_link_name(node, interface)
         elif isinstance(interface, str):
+            # Names are more frequent, and they are indexed as well as links.
             key = Topology.get_interface_by_name(node, interface)
+            if key is None:
+                key = Topology.get_interface_by_link_name(node, interface)
             if key is None:
                 raise RuntimeError(
                     f"Interface with key, name or link name \"{interface}\" "
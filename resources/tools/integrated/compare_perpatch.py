@@ -1,4 +1,4 @@
-# Copyright (c) 2019 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -20,108 +20,368 @@ This script then uses jumpavg library to determine whether there was
 a regression, progression or no change for each testcase.
 If number of tests does not match, or there was a regression,
 this script votes -1 (by exiting with code 1), otherwise it votes +1 (exit 0).
+
+If parent commit, test list and cache directory are given, aggregated
+parent statistics are read from the cache (parent result files are not needed
+then), or stored there after computing. The cache is keyed by the parent
+commit and a hash of the test names, and the names are compared on load,
+so stats of a different test selection are never used. The per_patch.sh
+library passes the parent commit, the test names parsed from the first
+current iteration and a cache directory (PERPATCH_CACHE_DIR if set).
+Tests are compared in parallel, detailed output for each test is printed
+unless --quiet is given. The verdict for each test can be written
+to a JSON file.
 """
 
+import argparse
+import hashlib
 import json
+import os
 import sys
 
+from concurrent.futures import ProcessPoolExecutor
+
 from resources.libraries.python import jumpavg
 
 
-def main():
-    """Execute the main logic, return the code to return as return code.
+def read_iterations(directory):
+    """Read results of all iterations stored in the directory.
 
-    :returns: Return code, 0 or 3 based on the comparison result.
-    :rtype: int
+    :param directory: Directory with numbered iteration subdirectories.
+    :type directory: str
+    :returns: Lines of results.txt (one per test) for each iteration.
+    :rtype: list of list of str
     """
-    iteration = -1
-    parent_iterations = list()
-    current_iterations = list()
-    num_tests = None
+    iterations = list()
     while 1:
-        iteration += 1
-        parent_lines = list()
-        current_lines = list()
-        filename = f"csit_parent/{iteration}/results.txt"
+        filename = f"{directory}/{len(iterations)}/results.txt"
         try:
-            with open(filename) as parent_file:
-                parent_lines = parent_file.readlines()
+            with open(filename) as results_file:
+                iterations.append(results_file.readlines())
         except IOError:
-            break
-        num_lines = len(parent_lines)
-        filename = f"csit_current/{iteration}/results.txt"
-        with open(filename) as current_file:
-            current_lines = current_file.readlines()
-        if num_lines != len(current_lines):
-            print(
-                f"Number of tests does not match within iteration {iteration}",
-                file=sys.stderr
-            )
-            return 1
+            return iterations
+
+
+def check_num_tests(iterations, name):
+    """Return number of tests, if it is the same in all iterations.
+
+    :param iterations: Lines of results for each iteration.
+    :param name: Build name to use in error messages.
+    :type iterations: list of list of str
+    :type name: str
+    :returns: Number of tests, or None if it does not match.
+    :rtype: Optional[int]
+    """
+    num_tests = None
+    for iteration, lines in enumerate(iterations):
         if num_tests is None:
-            num_tests = num_lines
-        elif num_tests != num_lines:
+            num_tests = len(lines)
+        elif num_tests != len(lines):
             print(
-                f"Number of tests does not match previous at iteration "
-                f"{iteration}", file=sys.stderr
+                f"Number of {name} tests does not match previous"
+                f" at iteration {iteration}", file=sys.stderr
             )
-            return 1
-        parent_iterations.append(parent_lines)
-        current_iterations.append(current_lines)
-    exit_code = 0
-    for test_index in range(num_tests):
-        parent_values = list()
-        current_values = list()
-        for iteration_index in range(len(parent_iterations)):
-            parent_values.extend(
-                json.loads(parent_iterations[iteration_index][test_index])
+            return None
+    return num_tests
+
+
+def test_values(iterations, test_index):
+    """Return time-ordered values of the test from all iterations.
+
+    :param iterations: Lines of results for each iteration.
+    :param test_index: Index of the test (line) to read.
+    :type iterations: list of list of str
+    :type test_index: int
+    :returns: Values of the test.
+    :rtype: list of float
+    """
+    values = list()
+    for lines in iterations:
+        values.extend(json.loads(lines[test_index]))
+    return values
+
+
+def aggregate(values):
+    """Return aggregated statistics of the values, as a dict.
+
+    :param values: Value-ordered values of the test.
+    :type values: list of float
+    :returns: Size, average, stdev and maximum of the values.
+    :rtype: dict
+    """
+    stats = jumpavg.AvgStdevStats.for_runs(values)
+    return dict(
+        size=stats.size, avg=stats.avg, stdev=stats.stdev,
+        max=max([0.0] + values)
+    )
+
+
+def compare_test(task):
+    """Compare parent and current results of one test.
+
+    This is executed in worker processes, output lines are returned
+    (not printed) so the main process can print them in order.
+
+    :param task: Test index, parent stats (as dict), current time-ordered
+        values, parent time-ordered values (or None if cached)
+        and verbosity flag.
+    :type task: tuple(int, dict, list of float, list of float, bool)
+    :returns: Verdict for the test, and lines to print.
+    :rtype: tuple(dict, list of str)
+    """
+    test_index, parent, current_values, parent_values, verbose = task
+    lines = list()
+    if verbose:
+        if parent_values is not None:
+            lines.append(
+                f"Time-ordered MRR values for parent build: {parent_values}"
             )
-            current_values.extend(
-                json.loads(current_iterations[iteration_index][test_index])
+        lines.append(
+            f"Time-ordered MRR values for current build: {current_values}"
+        )
+    current_values = sorted(current_values)
+    current = aggregate(current_values)
+    parent_stats = jumpavg.AvgStdevStats(
+        size=parent[u"size"], avg=parent[u"avg"], stdev=parent[u"stdev"]
+    )
+    current_stats = jumpavg.AvgStdevStats(
+        size=current[u"size"], avg=current[u"avg"], stdev=current[u"stdev"]
+    )
+    max_value = max(parent[u"max"], current[u"max"])
+    parent_group_list = jumpavg.BitCountingGroupList(
+        max_value=max(1.0, max_value)).append_group_of_runs([parent_stats])
+    combined_group_list = parent_group_list.copy(
+        ).extend_runs_to_last_group([current_stats])
+    separated_group_list = parent_group_list.append_group_of_runs(
+        [current_stats])
+    avg_diff = (current_stats.avg - parent_stats.avg) / parent_stats.avg
+    bits_diff = separated_group_list.bits - combined_group_list.bits
+    if verbose:
+        if parent_values is not None:
+            lines.append(
+                f"Value-ordered MRR values for parent build:"
+                f" {sorted(parent_values)}"
             )
-        print(f"Time-ordered MRR values for parent build: {parent_values}")
-        print(f"Time-ordered MRR values for current build: {current_values}")
-        parent_values = sorted(parent_values)
-        current_values = sorted(current_values)
-        max_value = max([1.0] + parent_values + current_values)
-        parent_stats = jumpavg.AvgStdevStats.for_runs(parent_values)
-        current_stats = jumpavg.AvgStdevStats.for_runs(current_values)
-        parent_group_list = jumpavg.BitCountingGroupList(
-            max_value=max_value).append_group_of_runs([parent_stats])
-        combined_group_list = parent_group_list.copy(
-            ).extend_runs_to_last_group([current_stats])
-        separated_group_list = parent_group_list.append_group_of_runs(
-            [current_stats])
-        print(f"Value-ordered MRR values for parent build: {parent_values}")
-        print(f"Value-ordered MRR values for current build: {current_values}")
-        avg_diff = (current_stats.avg - parent_stats.avg) / parent_stats.avg
-        print(f"Difference of averages relative to parent: {100 * avg_diff}%")
-        print(f"Jumpavg representation of parent group: {parent_stats}")
-        print(f"Jumpavg representation of current group: {current_stats}")
-        print(
+        lines.append(
+            f"Value-ordered MRR values for current build: {current_values}"
+        )
+        lines.append(
+            f"Difference of averages relative to parent: {100 * avg_diff}%"
+        )
+        lines.append(f"Jumpavg representation of parent group: {parent_stats}")
+        lines.append(
+            f"Jumpavg representation of current group: {current_stats}"
+        )
+        lines.append(
             f"Jumpavg representation of both as one group:"
             f" {combined_group_list[0].stats}"
         )
-        bits_diff = separated_group_list.bits - combined_group_list.bits
         compared = u"longer" if bits_diff >= 0 else u"shorter"
-        print(
+        lines.append(
             f"Separate groups are {compared} than single group"
             f" by {abs(bits_diff)} bits"
         )
-        # TODO: Version of classify that takes max_value and list of stats?
-        # That matters if only stats (not list of floats) are given.
-        classified_list = jumpavg.classify([parent_values, current_values])
-        if len(classified_list) < 2:
-            print(f"Test test_index {test_index}: normal (no anomaly)")
-            continue
+    classified_list = jumpavg.classify(
+        [parent_stats, current_stats], max_value=max_value
+    )
+    if len(classified_list) < 2:
+        anomaly = u"normal"
+        lines.append(f"Test test_index {test_index}: normal (no anomaly)")
+    else:
         anomaly = classified_list[1].comment
-        if anomaly == u"regression":
-            print(f"Test test_index {test_index}: anomaly regression")
+        lines.append(f"Test test_index {test_index}: anomaly {anomaly}")
+    verdict = dict(
+        test_index=test_index, parent=parent, current=current,
+        relative_diff=avg_diff, bits_diff=bits_diff, anomaly=anomaly
+    )
+    return verdict, lines
+
+
+def read_test_names(filename):
+    """Read names of the tests, one per line, in the order of results.
+
+    :param filename: File with the test names, or None.
+    :type filename: str
+    :returns: Test names, or None if no file is given.
+    :rtype: Optional[list of str]
+    """
+    if not filename:
+        return None
+    with open(filename) as names_file:
+        return [line.strip() for line in names_file if line.strip()]
+
+
+def parent_cache_file(cache_dir, parent_commit, test_names):
+    """Return path of the cache file, or None if the cache is not used.
+
+    :param cache_dir: Directory holding the cache files, or None.
+    :param parent_commit: Parent commit the stats belong to, or None.
+    :param test_names: Names of the tests, or None.
+    :type cache_dir: str
+    :type parent_commit: str
+    :type test_names: Optional[list of str]
+    :returns: Path of the cache file, or None.
+    :rtype: Optional[str]
+    """
+    if not (cache_dir and parent_commit and test_names):
+        return None
+    digest = hashlib.sha256(u"\n".join(test_names).encode(u"utf-8"))
+    return f"{cache_dir}/{parent_commit}-{digest.hexdigest()[:16]}.json"
+
+
+def load_parent_cache(cache_dir, parent_commit, test_names):
+    """Return cached parent statistics, or None if not cached.
+
+    Stats cached for different test names (hash collision) are not used.
+
+    :param cache_dir: Directory holding the cache files, or None.
+    :param parent_commit: Parent commit the stats belong to, or None.
+    :param test_names: Names of the tests, or None.
+    :type cache_dir: str
+    :type parent_commit: str
+    :type test_names: Optional[list of str]
+    :returns: Parent stats (as dict) for each test, or None.
+    :rtype: Optional[list of dict]
+    """
+    filename = parent_cache_file(cache_dir, parent_commit, test_names)
+    if filename is None:
+        return None
+    try:
+        with open(filename) as cache_file:
+            cached = json.load(cache_file)
+        if cached[u"test_names"] != test_names:
+            return None
+        return cached[u"tests"]
+    except (IOError, ValueError, KeyError):
+        return None
+
+
+def store_parent_cache(cache_dir, parent_commit, test_names, parent_list):
+    """Store parent statistics to the cache, atomically.
+
+    :param cache_dir: Directory holding the cache files, or None.
+    :param parent_commit: Parent commit the stats belong to, or None.
+    :param test_names: Names of the tests, or None.
+    :param parent_list: Parent stats (as dict) for each test.
+    :type cache_dir: str
+    :type parent_commit: str
+    :type test_names: Optional[list of str]
+    :type parent_list: list of dict
+    """
+    filename = parent_cache_file(cache_dir, parent_commit, test_names)
+    if filename is None:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(f"{filename}.tmp", u"w") as cache_file:
+        json.dump(
+            dict(
+                parent_commit=parent_commit, test_names=test_names,
+                tests=parent_list
+            ), cache_file
+        )
+    os.replace(f"{filename}.tmp", filename)
+
+
+def main():
+    """Execute the main logic, return the code to return as return code.
+
+    :returns: Return code, 0 or 3 based on the comparison result.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        u"--parent-commit", help=u"commit of parent build, the cache key"
+    )
+    parser.add_argument(
+        u"--test-list",
+        help=u"file with test names in order of results, part of the cache key"
+    )
+    parser.add_argument(
+        u"--cache-dir", help=u"directory with cached parent statistics"
+    )
+    parser.add_argument(
+        u"--verdict-file", help=u"write structured verdict to this JSON file"
+    )
+    parser.add_argument(
+        u"--jobs", type=int, default=os.cpu_count(),
+        help=u"number of worker processes"
+    )
+    parser.add_argument(
+        u"--quiet", action=u"store_true",
+        help=u"print only the verdict for each test"
+    )
+    args = parser.parse_args()
+    verbose = not args.quiet
+
+    current_iterations = read_iterations(u"csit_current")
+    num_tests = check_num_tests(current_iterations, u"current")
+    if num_tests is None:
+        return 1
+    test_names = read_test_names(args.test_list)
+    if test_names is not None and len(test_names) != num_tests:
+        print(
+            u"Number of test names does not match, not using the cache.",
+            file=sys.stderr
+        )
+        test_names = None
+    parent_list = load_parent_cache(
+        args.cache_dir, args.parent_commit, test_names
+    )
+    parent_iterations = None
+    if parent_list is None:
+        parent_iterations = read_iterations(u"csit_parent")
+        if len(parent_iterations) != len(current_iterations):
+            print(u"Number of iterations does not match", file=sys.stderr)
+            return 1
+        if check_num_tests(parent_iterations, u"parent") != num_tests:
+            print(u"Number of tests does not match", file=sys.stderr)
+            return 1
+        parent_list = list()
+        for test_index in range(num_tests or 0):
+            parent_list.append(aggregate(sorted(
+                test_values(parent_iterations, test_index)
+            )))
+        store_parent_cache(
+            args.cache_dir, args.parent_commit, test_names, parent_list
+        )
+    else:
+        print(f"Using cached parent stats for {args.parent_commit}")
+    tasks = [
+        (
+            test_index, parent_list[test_index],
+            test_values(current_iterations, test_index),
+            test_values(parent_iterations, test_index)
+            if parent_iterations and verbose else None,
+            verbose
+        ) for test_index in range(num_tests or 0)
+    ]
+    if args.jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(
+                compare_test, tasks,
+                chunksize=max(1, len(tasks) // (4 * args.jobs))
+            ))
+    else:
+        results = [compare_test(task) for task in tasks]
+    exit_code = 0
+    verdicts = list()
+    for verdict, lines in results:
+        for line in lines:
+            print(line)
+        if verdict[u"anomaly"] == u"regression":
             exit_code = 3  # 1 or 2 can be caused by other errors
-            continue
-        print(f"Test test_index {test_index}: anomaly {anomaly}")
+        verdicts.append(verdict)
+    if args.verdict_file:
+        with open(args.verdict_file, u"w") as verdict_file:
+            json.dump(
+                dict(
+                    parent_commit=args.parent_commit, exit_code=exit_code,
+                    tests=verdicts
+                ), verdict_file, indent=1
+            )
     print(f"Exit code: {exit_code}")
     return exit_code
 
+
 if __name__ == u"__main__":
     sys.exit(main())
@@ -0,0 +1,325 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Dependency-tracked incremental generation of PAL outputs.
+
+Every table, plot, file and trending chart is a node of the build graph.
+The node key is a hash of the specification element, identities
+(content hashes) of the input builds the element refers to,
+and the PAL source code.
+
+If a cache directory is given, the output files (and the return value)
+of each generated node are stored there under the node key.
+A node with its key present in the cache is not generated again,
+its outputs are restored from the cache instead.
+
+The outputs of a node are exactly the files its generator declares
+by passing their paths through output_file() when writing them.
+So files of other nodes, even those with a common prefix or generated
+at the same time, are never taken as outputs of the node.
+Declarations are only collected when caching is enabled,
+otherwise output_file() just returns the path.
+
+The nodes are independent of each other, stale nodes may be generated
+in parallel by forked worker processes.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from os import fsdecode, makedirs
+from os.path import dirname, isdir, isfile, join, normpath, realpath
+from shutil import copy2, rmtree
+
+
+# The graph being run, used by forked worker processes.
+_RUNNING_GRAPH = None
+# Output files declared by the node being executed, None if not collecting.
+_DECLARED_OUTPUTS = None
+
+
+def output_file(path):
+    """Declare the path as an output file of the node being generated.
+
+    Generators call this with the path of each file they write,
+    the path is returned unchanged, so the call can wrap the argument
+    of open() or of a plotting function.
+    Nodes are executed one at a time per process, so the declared
+    files belong to the node being executed.
+
+    :param path: Path of the file being written.
+    :type path: str
+    :returns: The same path.
+    :rtype: str
+    """
+    if _DECLARED_OUTPUTS is not None:
+        _DECLARED_OUTPUTS.add(normpath(fsdecode(path)))
+    return path
+
+
+def _source_hash():
+    """Return hash of PAL source code, so code changes invalidate outputs.
+
+    :returns: Hex digest of all python files of PAL.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    for name in sorted(glob(join(dirname(realpath(__file__)), u"*.py"))):
+        with open(name, u"rb") as src_file:
+            digest.update(src_file.read())
+    return digest.hexdigest()
+
+
+def _run_node_in_worker(index):
+    """Generate a node of the running graph, in a forked worker process.
+
+    :param index: Index of the node in the running graph.
+    :type index: int
+    :returns: Return value of the node function and its output files.
+    :rtype: tuple
+    """
+    return _RUNNING_GRAPH.nodes[index].execute(_RUNNING_GRAPH.caching)
+
+
+class BuildNode:
+    """Single output of PAL, generated by calling a function."""
+
+    def __init__(self, name, func, key):
+        """Initialization.
+
+        :param name: Unique name of the node, used in logs.
+        :param func: Function generating the output, called without arguments.
+            The return value has to be JSON serializable.
+            Files it writes have to be declared by output_file().
+        :param key: Hash identifying the inputs of the node.
+        :type name: str
+        :type func: callable
+        :type key: str
+        """
+        self.name = name
+        self.func = func
+        self.key = key
+
+    def execute(self, collect=False):
+        """Call the function generating the output, collect its output files.
+
+        Declared files removed by the function before it returned
+        are not outputs.
+
+        :param collect: Whether to collect the declared output files.
+        :type collect: bool
+        :returns: Return value of the function and sorted paths
+            of the output files (empty if not collecting).
+        :rtype: tuple
+        """
+        global _DECLARED_OUTPUTS
+
+        if not collect:
+            return self.func(), list()
+        _DECLARED_OUTPUTS = declared = set()
+        try:
+            result = self.func()
+        finally:
+            _DECLARED_OUTPUTS = None
+        return result, sorted(path for path in declared if isfile(path))
+
+
+class BuildGraph:
+    """Collection of PAL outputs, generating only the stale ones."""
+
+    def __init__(self, spec, cache_dir=u"", jobs=1):
+        """Initialization.
+
+        :param spec: Specification, with input builds already processed.
+        :param cache_dir: Directory with cached outputs, empty string
+            disables caching (all nodes are generated).
+        :param jobs: Number of worker processes generating stale nodes.
+        :type spec: Specification
+        :type cache_dir: str
+        :type jobs: int
+        """
+        self.nodes = list()
+        self._cache_dir = cache_dir
+        self._jobs = max(1, int(jobs))
+        self._results = dict()
+        self._salt = _source_hash()
+        self._builds = dict()
+        for job, builds in spec.builds.items():
+            for build in builds:
+                self._builds[(job, str(build[u"build"]))] = (
+                    build.get(u"file-hash"), build.get(u"status")
+                )
+
+    def _input_builds(self, element):
+        """Return identities of input builds referred to by the element.
+
+        Any dictionary in the element mapping a job to a list of builds
+        is considered a reference. If there is none, all builds are used.
+
+        :param element: Specification element.
+        :type element: dict
+        :returns: Sorted list of (job, build, file hash, status).
+        :rtype: list of tuple
+        """
+        found = set()
+        stack = [element]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, dict):
+                for key, value in item.items():
+                    if value and isinstance(value, (list, tuple)) and all(
+                            (key, str(build)) in self._builds
+                            for build in value):
+                        found.update((key, str(build)) for build in value)
+                    else:
+                        stack.append(value)
+            elif isinstance(item, (list, tuple)):
+                stack.extend(item)
+        if not found:
+            found = set(self._builds)
+        return sorted(
+            (job, build, *self._builds[(job, build)])
+            for job, build in found
+        )
+
+    @property
+    def caching(self):
+        """Whether outputs are cached (and so have to be collected).
+
+        :returns: True if cache directory is set.
+        :rtype: bool
+        """
+        return bool(self._cache_dir)
+
+    def add_node(self, name, element, func):
+        """Add an output to the graph.
+
+        The key is computed now, so the function may modify the element.
+
+        :param name: Unique name of the node, used in logs.
+        :param element: Specification element describing the output.
+        :param func: Function generating the output, called without arguments.
+            The return value has to be JSON serializable.
+            Files it writes have to be declared by output_file().
+        :type name: str
+        :type element: dict
+        :type func: callable
+        """
+        identity = json.dumps(
+            [self._salt, element, self._input_builds(element)],
+            sort_keys=True, default=str
+        )
+        key = hashlib.sha256(identity.encode(u"utf-8")).hexdigest()
+        self.nodes.append(BuildNode(name, func, key))
+
+    def result(self, name):
+        """Return the value returned by the node function.
+
+        :param name: Name of a node which has been run.
+        :type name: str
+        :returns: Return value of the node function (possibly cached).
+        :rtype: object
+        """
+        return self._results[name]
+
+    def _restore(self, node):
+        """Restore outputs of an up to date node from the cache.
+
+        :param node: The node to restore.
+        :type node: BuildNode
+        :returns: True if the node was restored.
+        :rtype: bool
+        """
+        if not self._cache_dir:
+            return False
+        node_dir = join(self._cache_dir, node.key)
+        if not isfile(join(node_dir, u"manifest.json")):
+            return False
+        try:
+            with open(join(node_dir, u"manifest.json"), u"rt") as in_file:
+                manifest = json.load(in_file)
+            for idx, path in enumerate(manifest[u"files"]):
+                makedirs(dirname(path) or u".", exist_ok=True)
+                copy2(join(node_dir, str(idx)), path)
+        except (OSError, ValueError, KeyError) as err:
+            logging.warning(
+                f"  Cannot restore {node.name} from cache: {repr(err)}"
+            )
+            return False
+        self._results[node.name] = manifest[u"result"]
+        return True
+
+    def _finish(self, node, result, files):
+        """Record the result of a generated node, store it in the cache.
+
+        :param node: The generated node.
+        :param result: Return value of the node function.
+        :param files: Paths of the output files of the node.
+        :type node: BuildNode
+        :type result: object
+        :type files: list of str
+        """
+        self._results[node.name] = result
+        if not self._cache_dir:
+            return
+        node_dir = join(self._cache_dir, node.key)
+        try:
+            if isdir(node_dir):
+                rmtree(node_dir)
+            makedirs(node_dir)
+            for idx, path in enumerate(files):
+                copy2(path, join(node_dir, str(idx)))
+            # The manifest is written last, it marks the entry as complete.
+            with open(join(node_dir, u"manifest.json"), u"wt") as out_file:
+                json.dump(dict(files=files, result=result), out_file)
+        except (OSError, TypeError, ValueError) as err:
+            logging.warning(f"  Cannot cache {node.name}: {repr(err)}")
+
+    def run(self):
+        """Generate all stale nodes not run yet, restore the others.
+
+        Nodes added after a run are processed by the next run.
+        """
+        global _RUNNING_GRAPH
+
+        pending = [
+            (idx, node) for idx, node in enumerate(self.nodes)
+            if node.name not in self._results
+        ]
+        stale = [(idx, node) for idx, node in pending
+                 if not self._restore(node)]
+        logging.info(
+            f"  Build graph: {len(pending) - len(stale)} of {len(pending)} "
+            f"outputs up to date, generating {len(stale)} ..."
+        )
+        if self._jobs == 1 or len(stale) < 2:
+            for _, node in stale:
+                self._finish(node, *node.execute(self.caching))
+            return
+        _RUNNING_GRAPH = self
+        try:
+            with ProcessPoolExecutor(
+                    max_workers=self._jobs,
+                    mp_context=multiprocessing.get_context(u"fork")) as pool:
+                futures = [
+                    pool.submit(_run_node_in_worker, idx) for idx, _ in stale
+                ]
+                for (_, node), future in zip(stale, futures):
+                    self._finish(node, *future.result())
+        finally:
+            _RUNNING_GRAPH = None
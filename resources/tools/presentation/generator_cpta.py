@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -18,6 +18,7 @@ import logging
 import csv
 
 from collections import OrderedDict
+from functools import partial
 from datetime import datetime
 from copy import deepcopy
 
@@ -26,6 +27,7 @@ import plotly.offline as ploff
 import plotly.graph_objs as plgo
 import plotly.exceptions as plerr
 
+from build_graph import output_file
 from pal_utils import archive_input_data, execute_command, classify_anomalies
 
 
@@ -119,20 +121,22 @@ COLORS = (
 )
 
 
-def generate_cpta(spec, data):
+def generate_cpta(spec, data, build_graph=None):
     """Generate all formats and versions of the Continuous Performance Trending
     and Analysis.
 
     :param spec: Specification read from the specification file.
     :param data: Full data set.
+    :param build_graph: Build graph used to generate only stale charts.
     :type spec: Specification
     :type data: InputData
+    :type build_graph: BuildGraph
     """
 
     logging.info(u"Generating the Continuous Performance Trending and Analysis "
                  u"...")
 
-    ret_code = _generate_all_charts(spec, data)
+    ret_code = _generate_all_charts(spec, data, build_graph)
 
     cmd = HTML_BUILDER.format(
         date=datetime.utcnow().strftime(u'%Y-%m-%d %H:%M UTC'),
@@ -361,13 +365,18 @@ def _generate_trending_traces(in_data, job_name, build_info,
     return traces, None
 
 
-def _generate_all_charts(spec, input_data):
+def _generate_all_charts(spec, input_data, build_graph=None):
     """Generate all charts specified in the specification file.
 
+    If the build graph is given, the charts are added to it and the graph
+    is run, so only stale charts are generated.
+
     :param spec: Specification.
     :param input_data: Full data set.
+    :param build_graph: Build graph to add the charts to.
     :type spec: Specification
     :type input_data: InputData
+    :type build_graph: BuildGraph
     """
 
     def _generate_chart(graph):
@@ -569,7 +578,7 @@ def _generate_all_charts(spec, input_data):
             plpl = plgo.Figure(data=traces, layout=layout)
             try:
                 ploff.plot(plpl, show_link=False, auto_open=False,
-                           filename=name_file)
+                           filename=output_file(name_file))
             except plerr.PlotlyEmptyDataError:
                 logging.warning(u"No data for the plot. Skipped.")
 
@@ -617,8 +626,19 @@ def _generate_all_charts(spec, input_data):
         header = f"Version:,{u','.join(versions)}\n"
         csv_tables[job_name].append(header)
 
-    for chart in spec.cpta[u"plots"]:
-        result = _generate_chart(chart)
+    if build_graph is None:
+        results = [_generate_chart(chart) for chart in spec.cpta[u"plots"]]
+    else:
+        names = list()
+        for index, chart in enumerate(spec.cpta[u"plots"]):
+            names.append(f"chart {index + 1}: {chart.get(u'title', u'')}")
+            build_graph.add_node(
+                names[-1], chart, partial(_generate_chart, chart)
+            )
+        build_graph.run()
+        results = [build_graph.result(name) for name in names]
+
+    for result in results:
         if not result:
             continue
 
@@ -631,7 +651,7 @@ def _generate_all_charts(spec, input_data):
     # Write the tables:
     for job_name, csv_table in csv_tables.items():
         file_name = f"{spec.cpta[u'output-file']}/{job_name}-trending"
-        with open(f"{file_name}.csv", u"wt") as file_handler:
+        with open(output_file(f"{file_name}.csv"), u"wt") as file_handler:
             file_handler.writelines(csv_table)
 
         txt_table = None
@@ -657,7 +677,7 @@ def _generate_all_charts(spec, input_data):
                         )
                 line_nr += 1
             txt_table.align[u"Build Number:"] = u"l"
-        with open(f"{file_name}.txt", u"wt") as txt_file:
+        with open(output_file(f"{file_name}.txt"), u"wt") as txt_file:
             txt_file.write(str(txt_table))
 
     # Evaluate result:
@@ -666,7 +686,7 @@ def _generate_all_charts(spec, input_data):
         for job_name, job_data in anomaly_classifications.items():
             file_name = \
                 f"{spec.cpta[u'output-file']}/regressions-{job_name}.txt"
-            with open(file_name, u'w') as txt_file:
+            with open(output_file(file_name), u'w') as txt_file:
                 for test_name, classification in job_data.items():
                     if classification == u"regression":
                         txt_file.write(test_name + u'\n')
@@ -674,7 +694,7 @@ def _generate_all_charts(spec, input_data):
                         result = u"FAIL"
             file_name = \
                 f"{spec.cpta[u'output-file']}/progressions-{job_name}.txt"
-            with open(file_name, u'w') as txt_file:
+            with open(output_file(file_name), u'w') as txt_file:
                 for test_name, classification in job_data.items():
                     if classification == u"progression":
                         txt_file.write(test_name + u'\n')
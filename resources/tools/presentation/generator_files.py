@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -18,9 +18,11 @@ import re
 
 from os.path import join
 from collections import OrderedDict
+from functools import partial
 
 import logging
 
+from build_graph import output_file
 from pal_utils import get_files, get_rst_title_char
 
 
@@ -37,13 +39,18 @@ RST_INCLUDE_TABLE = (u"\n.. only:: html\n\n"
 REGEX_NIC_SHORT = re.compile(r'(\d*ge\dp\d)(\D*\d*[a-z]*)-')
 
 
-def generate_files(spec, data):
+def generate_files(spec, data, graph=None):
     """Generate all files specified in the specification file.
 
+    If the build graph is given, the files are only added to it,
+    and generated (if stale) when the graph is run.
+
     :param spec: Specification read from the specification file.
     :param data: Data to process.
+    :param graph: Build graph to add the files to.
     :type spec: Specification
     :type data: InputData
+    :type graph: BuildGraph
     """
 
     generator = {
@@ -53,8 +60,12 @@ def generate_files(spec, data):
         u"file_test_results_html": file_test_results_html
     }
 
-    logging.info(u"Generating the files ...")
-    for file_spec in spec.files:
+    def _generate_file(file_spec):
+        """Generate the file, log if the algorithm is not defined.
+
+        :param file_spec: File to generate.
+        :type file_spec: pandas.Series
+        """
         try:
             generator[file_spec[u"algorithm"]](file_spec, data)
         except (NameError, KeyError) as err:
@@ -62,6 +73,16 @@ def generate_files(spec, data):
                 f"Probably algorithm {file_spec[u'algorithm']} is not defined: "
                 f"{repr(err)}"
             )
+
+    logging.info(u"Generating the files ...")
+    for index, file_spec in enumerate(spec.files):
+        if graph is None:
+            _generate_file(file_spec)
+        else:
+            graph.add_node(
+                f"file {index + 1}: {file_spec.get(u'title', u'')}", file_spec,
+                partial(_generate_file, file_spec)
+            )
     logging.info(u"Done.")
 
 
@@ -248,12 +269,13 @@ def file_details_split(file_spec, input_data, frmt=u"rst"):
         content_l1 = chapters.get(chapter_l1, None)
         if not content_l1:
             continue
-        with open(f"{fileset_file_name}/index.rst", u"a") as file_handler:
+        with open(output_file(f"{fileset_file_name}/index.rst"), u"a") as \
+                file_handler:
             file_handler.write(f"    {chapter_l1}\n")
         l1_file_name = f"{join(fileset_file_name, chapter_l1)}.rst"
         title = titles.get(chapter_l1, chapter_l1)
         logging.info(f"   Generating {title} ...")
-        with open(l1_file_name, u"w") as file_handler:
+        with open(output_file(l1_file_name), u"w") as file_handler:
             file_handler.write(
                 f"{title}\n"
                 f"{get_rst_title_char(1) * len(title)}\n\n"
@@ -272,11 +294,12 @@ def file_details_split(file_spec, input_data, frmt=u"rst"):
                 content_l3 = content_l2.get(chapter_l3, None)
                 if not content_l3:
                     continue
-                with open(l1_file_name, u"a") as file_handler:
+                with open(output_file(l1_file_name), u"a") as file_handler:
                     item = u"/".join(content_l3[u'rst_file'].split(u'/')[-2:])
                     file_handler.write(f"    ../{item}\n")
                 logging.info(f"    Writing the file {content_l3[u'rst_file']}")
-                with open(content_l3[u'rst_file'], u"w+") as file_handler:
+                with open(output_file(content_l3[u'rst_file']), u"w+") as \
+                        file_handler:
                     title = f"{chapter_l2}-{chapter_l3}"
                     file_handler.write(
                         f"{rst_header}\n"
@@ -389,14 +412,15 @@ def file_test_results(file_spec, input_data, frmt=u"rst"):
             chapter = suite_longname.split(u'.')[-1]
             file_name = f"{base_file_name}/{chapter}.rst"
             logging.info(f"    Writing file {file_name}")
-            with open(f"{base_file_name}/index.rst", u"a") as file_handler:
+            with open(output_file(f"{base_file_name}/index.rst"), u"a") as \
+                    file_handler:
                 file_handler.write(f"    {chapter}\n")
-            with open(file_name, u"a") as file_handler:
+            with open(output_file(file_name), u"a") as file_handler:
                 file_handler.write(rst_header)
 
         title_line = get_rst_title_char(suite[u"level"] - start_lvl + 2) * \
             len(suite[u"name"])
-        with open(file_name, u"a") as file_handler:
+        with open(output_file(file_name), u"a") as file_handler:
             if not (u"-ndrpdr" in suite[u"name"] or
                     u"-mrr" in suite[u"name"] or
                     u"-dev" in suite[u"name"]):
@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -19,17 +19,17 @@ import re
 import logging
 
 from collections import OrderedDict
+from functools import partial
 from copy import deepcopy
 
-import hdrh.histogram
-import hdrh.codec
 import pandas as pd
 import plotly.offline as ploff
 import plotly.graph_objs as plgo
 
 from plotly.exceptions import PlotlyError
 
-from pal_utils import mean, stdev
+from build_graph import output_file
+from pal_utils import mean, stdev, decode_hdrh, hdrh_percentiles
 
 
 COLORS = (
@@ -61,13 +61,18 @@ COLORS = (
 REGEX_NIC = re.compile(r'(\d*ge\dp\d\D*\d*[a-z]*)-')
 
 
-def generate_plots(spec, data):
+def generate_plots(spec, data, graph=None):
     """Generate all plots specified in the specification file.
 
+    If the build graph is given, the plots are only added to it,
+    and generated (if stale) when the graph is run.
+
     :param spec: Specification read from the specification file.
     :param data: Data to process.
+    :param graph: Build graph to add the plots to.
     :type spec: Specification
     :type data: InputData
+    :type graph: BuildGraph
     """
 
     generator = {
@@ -79,11 +84,16 @@ def generate_plots(spec, data):
         u"plot_hdrh_lat_by_percentile": plot_hdrh_lat_by_percentile
     }
 
-    logging.info(u"Generating the plots ...")
-    for index, plot in enumerate(spec.plots):
+    def _generate_plot(index, plot):
+        """Generate the plot, log if the algorithm is not defined.
+
+        :param index: Index of the plot in the specification.
+        :param plot: Plot to generate.
+        :type index: int
+        :type plot: pandas.Series
+        """
         try:
             logging.info(f"  Plot nr {index + 1}: {plot.get(u'title', u'')}")
-            plot[u"limits"] = spec.configuration[u"limits"]
             generator[plot[u"algorithm"]](plot, data)
             logging.info(u"  Done.")
         except NameError as err:
@@ -91,6 +101,17 @@ def generate_plots(spec, data):
                 f"Probably algorithm {plot[u'algorithm']} is not defined: "
                 f"{repr(err)}"
             )
+
+    logging.info(u"Generating the plots ...")
+    for index, plot in enumerate(spec.plots):
+        plot[u"limits"] = spec.configuration[u"limits"]
+        if graph is None:
+            _generate_plot(index, plot)
+        else:
+            graph.add_node(
+                f"plot {index + 1}: {plot.get(u'title', u'')}", plot,
+                partial(_generate_plot, index, plot)
+            )
     logging.info(u"Done.")
 
 
@@ -179,27 +200,28 @@ def plot_hdrh_lat_by_percentile(plot, input_data):
                         f"Percentile: 0.0%<br>"
                         f"Latency: 0.0uSec"
                     ]
-                    try:
-                        decoded = hdrh.histogram.HdrHistogram.decode(
-                            test[u"latency"][graph][direction][u"hdrh"]
-                        )
-                    except hdrh.codec.HdrLengthException:
+                    latency = test[u"latency"][graph][direction]
+                    hist = latency.get(u"hist", None)
+                    if hist is None:
+                        # Data parsed without the decoded histogram.
+                        hist = decode_hdrh(latency[u"hdrh"])
+                    if hist is None:
                         logging.warning(
                             f"No data for direction {(u'W-E', u'E-W')[idx % 2]}"
                         )
                         continue
 
-                    for item in decoded.get_recorded_iterator():
-                        percentile = item.percentile_level_iterated_to
+                    percentiles, values = hdrh_percentiles(hist)
+                    for percentile, value in zip(percentiles, values):
                         if percentile > 99.9:
                             continue
                         xaxis.append(percentile)
-                        yaxis.append(item.value_iterated_to)
+                        yaxis.append(value)
                         hovertext.append(
                             f"<b>{desc[graph]}</b><br>"
                             f"Direction: {(u'W-E', u'E-W')[idx % 2]}<br>"
                             f"Percentile: {percentile:.5f}%<br>"
-                            f"Latency: {item.value_iterated_to}uSec"
+                            f"Latency: {value}uSec"
                         )
                     fig.add_trace(
                         plgo.Scatter(
@@ -228,10 +250,10 @@ def plot_hdrh_lat_by_percentile(plot, input_data):
             try:
                 # Export Plot
                 ploff.plot(fig, show_link=False, auto_open=False,
-                           filename=file_name)
+                           filename=output_file(file_name))
                 # Add link to the file:
                 if file_links and target_links:
-                    with open(file_links, u"a") as file_handler:
+                    with open(output_file(file_links), u"a") as file_handler:
                         file_handler.write(
                             f"- `{name_link} "
                             f"<{target_links}/{file_name.split(u'/')[-1]}>`_\n"
@@ -244,10 +266,6 @@ def plot_hdrh_lat_by_percentile(plot, input_data):
             except PlotlyError as err:
                 logging.error(f"   Finished with error: {repr(err)}")
 
-        except hdrh.codec.HdrLengthException as err:
-            logging.warning(repr(err))
-            continue
-
         except (ValueError, KeyError) as err:
             logging.warning(repr(err))
             continue
@@ -338,7 +356,7 @@ def plot_nf_reconf_box_name(plot, input_data):
             plpl,
             show_link=False,
             auto_open=False,
-            filename=f"{plot[u'output-file']}{file_type}"
+            filename=output_file(f"{plot[u'output-file']}{file_type}")
         )
     except PlotlyError as err:
         logging.error(
@@ -505,7 +523,7 @@ def plot_perf_box_name(plot, input_data):
             plpl,
             show_link=False,
             auto_open=False,
-            filename=f"{plot[u'output-file']}.html"
+            filename=output_file(f"{plot[u'output-file']}.html")
         )
     except PlotlyError as err:
         logging.error(
@@ -866,7 +884,7 @@ def plot_tsa_name(plot, input_data):
             plpl,
             show_link=False,
             auto_open=False,
-            filename=f"{plot[u'output-file']}{file_type}"
+            filename=output_file(f"{plot[u'output-file']}{file_type}")
         )
     except PlotlyError as err:
         logging.error(
@@ -956,7 +974,9 @@ def plot_http_server_perf_box(plot, input_data):
             plpl,
             show_link=False,
             auto_open=False,
-            filename=f"{plot[u'output-file']}{plot[u'output-file-type']}"
+            filename=output_file(
+                f"{plot[u'output-file']}{plot[u'output-file-type']}"
+            )
         )
     except PlotlyError as err:
         logging.error(
@@ -1282,7 +1302,7 @@ def plot_nf_heatmap(plot, input_data):
             plpl,
             show_link=False,
             auto_open=False,
-            filename=f"{plot[u'output-file']}.html"
+            filename=output_file(f"{plot[u'output-file']}.html")
         )
     except PlotlyError as err:
         logging.error(
@@ -16,8 +16,15 @@
 
 import logging
 import datetime
+import hashlib
+import subprocess
 
-from shutil import make_archive
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from os import close, makedirs, pipe, read, rename
+from os.path import isfile, join
+from shutil import copy2, make_archive
+from tempfile import mkstemp
 
 from pal_utils import get_files, execute_command, archive_input_data
 
@@ -104,16 +111,27 @@ PDF_BUILDER = u'sphinx-build -v -c . -a ' \
               u'{working_dir} ' \
               u'{build_dir}'
 
+# Command to convert svg to pdf
+SVG_CONVERTER = u"inkscape -D -z --file={src} --export-pdf={dst}"
 
-def generate_report(release, spec, report_week):
+# Command to convert PyPLOT graphs in html format to pdf, needs an X display
+HTML_CONVERTER = u"{display}wkhtmltopdf {src} {dst}"
+
+
+def generate_report(release, spec, report_week, cache_dir=u"", jobs=1):
     """Generate all formats and versions of the report.
 
     :param release: Release string of the product.
     :param spec: Specification read from the specification file.
     :param report_week: Calendar week when the report is published.
+    :param cache_dir: Directory with files cached between report builds,
+        empty string disables caching.
+    :param jobs: Number of parallel file conversions.
     :type release: str
     :type spec: Specification
     :type report_week: str
+    :type cache_dir: str
+    :type jobs: int
     """
 
     logging.info(u"Generating the report ...")
@@ -124,25 +142,30 @@ def generate_report(release, spec, report_week):
     }
 
     for report_format in spec.output[u"format"]:
-        report[report_format](release, spec, report_week)
+        report[report_format](release, spec, report_week, cache_dir, jobs)
 
     archive_input_data(spec)
 
     logging.info(u"Done.")
 
 
-def generate_html_report(release, spec, report_version):
+def generate_html_report(
+        release, spec, report_version, cache_dir=u"", jobs=1):
     """Generate html format of the report.
 
     :param release: Release string of the product.
     :param spec: Specification read from the specification file.
     :param report_version: Version of the report.
+    :param cache_dir: Not used.
+    :param jobs: Not used.
     :type release: str
     :type spec: Specification
     :type report_version: str
+    :type cache_dir: str
+    :type jobs: int
     """
 
-    _ = report_version
+    _ = report_version, cache_dir, jobs
 
     logging.info(u"  Generating the html report, give me a few minutes, please "
                  u"...")
@@ -169,15 +192,20 @@ def generate_html_report(release, spec, report_version):
     logging.info(u"  Done.")
 
 
-def generate_pdf_report(release, spec, report_week):
-    """Generate html format of the report.
+def generate_pdf_report(release, spec, report_week, cache_dir=u"", jobs=1):
+    """Generate pdf format of the report.
 
     :param release: Release string of the product.
     :param spec: Specification read from the specification file.
     :param report_week: Calendar week when the report is published.
+    :param cache_dir: Directory with pdf files cached between report builds,
+        empty string disables caching.
+    :param jobs: Number of parallel file conversions.
     :type release: str
     :type spec: Specification
     :type report_week: str
+    :type cache_dir: str
+    :type jobs: int
     """
 
     logging.info(u"  Generating the pdf report, give me a few minutes, please "
@@ -187,20 +215,18 @@ def generate_pdf_report(release, spec, report_week):
 
     execute_command(f"cd {working_dir} && mv -f index.pdf.template index.rst")
 
-    _convert_all_svg_to_pdf(spec.environment[u"paths"][u"DIR[WORKING,SRC]"])
-
-    # Convert PyPLOT graphs in HTML format to PDF.
-    convert_plots = u"xvfb-run -a wkhtmltopdf {html} {pdf}"
+    # Convert SVG images and PyPLOT graphs in HTML format to PDF.
+    conversions = [
+        (SVG_CONVERTER, svg_file)
+        for svg_file in get_files(working_dir, u"svg", full_path=True)
+    ]
     plots = get_files(spec.environment[u"paths"][u"DIR[STATIC,VPP]"], u"html")
     plots.extend(
         get_files(spec.environment[u"paths"][u"DIR[STATIC,DPDK]"], u"html")
     )
-    pdf_plots = list()
-    for plot in plots:
-        file_name = f"{plot.rsplit(u'.', 1)[0]}.pdf"
-        pdf_plots.append(file_name)
-        logging.info(f"Converting {plot} to {file_name}")
-        execute_command(convert_plots.format(html=plot, pdf=file_name))
+    conversions.extend((HTML_CONVERTER, plot) for plot in plots)
+    pdf_plots = [f"{plot.rsplit(u'.', 1)[0]}.pdf" for plot in plots]
+    _convert_all_to_pdf(conversions, cache_dir, jobs)
 
     # Generate the LaTeX documentation
     build_dir = spec.environment[u"paths"][u"DIR[BUILD,LATEX]"]
@@ -251,17 +277,108 @@ def archive_report(spec):
     logging.info(u"  Done.")
 
 
-def _convert_all_svg_to_pdf(path):
-    """Convert all svg files on path "path" to pdf.
+@contextmanager
+def _virtual_display():
+    """Run one virtual X server for all conversions needing a display.
 
-    :param path: Path to the root directory with svg files to convert.
-    :type path: str
-    """
+    If Xvfb cannot be started, each conversion runs its own server
+    using xvfb-run, as before.
 
-    svg_files = get_files(path, u"svg", full_path=True)
-    for svg_file in svg_files:
-        pdf_file = f"{svg_file.rsplit(u'.', 1)[0]}.pdf"
-        logging.info(f"Converting {svg_file} to {pdf_file}")
-        execute_command(
-            f"inkscape -D -z --file={svg_file} --export-pdf={pdf_file}"
+    :returns: Context manager yielding the command prefix
+        setting the display.
+    :rtype: contextmanager
+    """
+    read_fd, write_fd = pipe()
+    try:
+        xvfb = subprocess.Popen(
+            [u"Xvfb", u"-displayfd", str(write_fd), u"-nolisten", u"tcp",
+             u"-screen", u"0", u"1280x1024x24"],
+            pass_fds=(write_fd,), stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
         )
+    except OSError as err:
+        close(read_fd)
+        close(write_fd)
+        logging.warning(f"Cannot start Xvfb, using xvfb-run: {repr(err)}")
+        yield u"xvfb-run -a "
+        return
+    close(write_fd)
+    display = b""
+    while not display.endswith(b"\n"):
+        chunk = read(read_fd, 16)
+        if not chunk:
+            break
+        display += chunk
+    close(read_fd)
+    try:
+        if display.strip():
+            yield f"DISPLAY=:{display.decode().strip()} "
+        else:
+            logging.warning(u"Xvfb did not report its display, using xvfb-run")
+            yield u"xvfb-run -a "
+    finally:
+        xvfb.terminate()
+        xvfb.wait()
+
+
+def _convert_to_pdf(command, src_file, cache_dir, display):
+    """Convert a file to pdf, or copy the pdf cached for the same content.
+
+    The pdf file has the name of the source file with pdf extension.
+
+    :param command: Conversion command with src, dst and display fields.
+    :param src_file: The file to convert.
+    :param cache_dir: Directory with cached pdf files, or empty string.
+    :param display: Command prefix setting the X display.
+    :type command: str
+    :type src_file: str
+    :type cache_dir: str
+    :type display: str
+    """
+    pdf_file = f"{src_file.rsplit(u'.', 1)[0]}.pdf"
+    cached_file = None
+    if cache_dir:
+        digest = hashlib.sha256(command.encode(u"utf-8"))
+        with open(src_file, u"rb") as in_file:
+            digest.update(in_file.read())
+        cached_file = join(cache_dir, f"{digest.hexdigest()}.pdf")
+        if isfile(cached_file):
+            logging.info(f"Using cached {pdf_file}")
+            copy2(cached_file, pdf_file)
+            return
+    logging.info(f"Converting {src_file} to {pdf_file}")
+    ret_code, _, _ = execute_command(
+        command.format(src=src_file, dst=pdf_file, display=display)
+    )
+    if cached_file and ret_code == 0 and isfile(pdf_file):
+        # Rename is atomic, concurrent conversions may share the cache.
+        tmp_fd, tmp_file = mkstemp(dir=cache_dir)
+        close(tmp_fd)
+        copy2(pdf_file, tmp_file)
+        rename(tmp_file, cached_file)
+
+
+def _convert_all_to_pdf(conversions, cache_dir=u"", jobs=1):
+    """Convert files to pdf using a bounded pool of workers.
+
+    :param conversions: Pairs of conversion command and file to convert.
+    :param cache_dir: Directory with files cached between report builds,
+        empty string disables caching.
+    :param jobs: Maximal number of conversions running in parallel.
+    :type conversions: list of tuple
+    :type cache_dir: str
+    :type jobs: int
+    """
+    pdf_cache_dir = join(cache_dir, u"pdf") if cache_dir else u""
+    if pdf_cache_dir:
+        makedirs(pdf_cache_dir, exist_ok=True)
+    with _virtual_display() as display, \
+            ThreadPoolExecutor(max_workers=max(1, int(jobs))) as pool:
+        futures = [
+            pool.submit(
+                _convert_to_pdf, command, src_file, pdf_cache_dir, display
+            )
+            for command, src_file in conversions
+        ]
+        for future in futures:
+            future.result()
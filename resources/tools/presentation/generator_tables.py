@@ -20,6 +20,7 @@ import csv
 import re
 
 from collections import OrderedDict
+from functools import partial
 from xml.etree import ElementTree as ET
 from datetime import datetime as dt
 from datetime import timedelta
@@ -32,6 +33,7 @@ import pandas as pd
 from numpy import nan, isnan
 from yaml import load, FullLoader, YAMLError
 
+from build_graph import output_file
 from pal_utils import mean, stdev, classify_anomalies, \
     convert_csv_to_pretty_txt, relative_change_stdev, relative_change
 
@@ -39,13 +41,18 @@ from pal_utils import mean, stdev, classify_anomalies, \
 REGEX_NIC = re.compile(r'(\d*ge\dp\d\D*\d*[a-z]*)')
 
 
-def generate_tables(spec, data):
+def generate_tables(spec, data, graph=None):
     """Generate all tables specified in the specification file.
 
+    If the build graph is given, the tables are only added to it,
+    and generated (if stale) when the graph is run.
+
     :param spec: Specification read from the specification file.
     :param data: Data to process.
+    :param graph: Build graph to add the tables to.
     :type spec: Specification
     :type data: InputData
+    :type graph: BuildGraph
     """
 
     generator = {
@@ -61,17 +68,31 @@ def generate_tables(spec, data):
         u"table_weekly_comparison": table_weekly_comparison
     }
 
-    logging.info(u"Generating the tables ...")
-    for table in spec.tables:
+    def _generate_table(table):
+        """Generate the table, log if the algorithm is not defined.
+
+        :param table: Table to generate.
+        :type table: pandas.Series
+        """
         try:
-            if table[u"algorithm"] == u"table_weekly_comparison":
-                table[u"testbeds"] = spec.environment.get(u"testbeds", None)
             generator[table[u"algorithm"]](table, data)
         except NameError as err:
             logging.error(
                 f"Probably algorithm {table[u'algorithm']} is not defined: "
                 f"{repr(err)}"
             )
+
+    logging.info(u"Generating the tables ...")
+    for index, table in enumerate(spec.tables):
+        if table[u"algorithm"] == u"table_weekly_comparison":
+            table[u"testbeds"] = spec.environment.get(u"testbeds", None)
+        if graph is None:
+            _generate_table(table)
+        else:
+            graph.add_node(
+                f"table {index + 1}: {table.get(u'title', u'')}", table,
+                partial(_generate_table, table)
+            )
     logging.info(u"Done.")
 
 
@@ -268,7 +289,7 @@ def table_oper_data_html(table, input_data):
             continue
         try:
             file_name = f"{table[u'output-file']}{suite[u'name']}.rst"
-            with open(f"{file_name}", u'w') as html_file:
+            with open(output_file(f"{file_name}"), u'w') as html_file:
                 logging.info(f"    Writing file: {file_name}")
                 html_file.write(u".. raw:: html\n\n\t")
                 html_file.write(html_table)
@@ -367,7 +388,7 @@ def table_merged_details(table, input_data):
             separator = u"" if table[u'output-file'].endswith(u"/") else u"_"
             file_name = f"{table[u'output-file']}{separator}{suite_name}.csv"
             logging.info(f"      Writing file: {file_name}")
-            with open(file_name, u"wt") as file_handler:
+            with open(output_file(file_name), u"wt") as file_handler:
                 file_handler.write(u",".join(header) + u"\n")
                 for item in table_lst:
                     file_handler.write(u",".join(item) + u"\n")
@@ -583,7 +604,7 @@ def _tpc_generate_html_table(header, data, out_file_name, legend=u"",
         fig,
         show_link=False,
         auto_open=False,
-        filename=f"{out_file_name}_in.html"
+        filename=output_file(f"{out_file_name}_in.html")
     )
 
     if not generate_rst:
@@ -595,7 +616,7 @@ def _tpc_generate_html_table(header, data, out_file_name, legend=u"",
     else:
         path = u"_tmp/src/dpdk_performance_tests/comparisons/"
     logging.info(f"    Writing the HTML file to {path}{file_name}.rst")
-    with open(f"{path}{file_name}.rst", u"wt") as rst_file:
+    with open(output_file(f"{path}{file_name}.rst"), u"wt") as rst_file:
         rst_file.write(
             u"\n"
             u".. |br| raw:: html\n\n    <br />\n\n\n"
@@ -790,7 +811,7 @@ def table_soak_vs_ndr(table, input_data):
 
     # Generate csv tables:
     csv_file_name = f"{table[u'output-file']}.csv"
-    with open(csv_file_name, u"wt") as file_handler:
+    with open(output_file(csv_file_name), u"wt") as file_handler:
         file_handler.write(header_str)
         for test in tbl_lst:
             file_handler.write(u";".join([str(item) for item in test]) + u"\n")
@@ -798,7 +819,8 @@ def table_soak_vs_ndr(table, input_data):
     convert_csv_to_pretty_txt(
         csv_file_name, f"{table[u'output-file']}.txt", delimiter=u";"
     )
-    with open(f"{table[u'output-file']}.txt", u'a') as file_handler:
+    with open(output_file(f"{table[u'output-file']}.txt"), u'a') as \
+            file_handler:
         file_handler.write(legend)
 
     # Generate html table:
@@ -933,7 +955,7 @@ def table_perf_trending_dash(table, input_data):
     file_name = f"{table[u'output-file']}{table[u'output-file-ext']}"
 
     logging.info(f"    Writing file: {file_name}")
-    with open(file_name, u"wt") as file_handler:
+    with open(output_file(file_name), u"wt") as file_handler:
         file_handler.write(header_str)
         for test in tbl_sorted:
             file_handler.write(u",".join([str(item) for item in test]) + u'\n')
@@ -1252,7 +1274,7 @@ def table_perf_trending_dash_html(table, input_data):
             else:
                 tdata.text = item
     try:
-        with open(table[u"output-file"], u'w') as html_file:
+        with open(output_file(table[u"output-file"]), u'w') as html_file:
             logging.info(f"    Writing file: {table[u'output-file']}")
             html_file.write(u".. raw:: html\n\n\t")
             html_file.write(str(ET.tostring(dashboard, encoding=u"unicode")))
@@ -1319,7 +1341,7 @@ def table_last_failed_tests(table, input_data):
 
     file_name = f"{table[u'output-file']}{table[u'output-file-ext']}"
     logging.info(f"    Writing file: {file_name}")
-    with open(file_name, u"wt") as file_handler:
+    with open(output_file(file_name), u"wt") as file_handler:
         for test in tbl_list:
             file_handler.write(test + u'\n')
 
@@ -1427,7 +1449,7 @@ def table_failed_tests(table, input_data):
 
     file_name = f"{table[u'output-file']}{table[u'output-file-ext']}"
     logging.info(f"    Writing file: {file_name}")
-    with open(file_name, u"wt") as file_handler:
+    with open(output_file(file_name), u"wt") as file_handler:
         file_handler.write(u",".join(header) + u"\n")
         for test in tbl_sorted:
             file_handler.write(u",".join([str(item) for item in test]) + u'\n')
@@ -1525,7 +1547,7 @@ def table_failed_tests_html(table, input_data):
             else:
                 tdata.text = item
     try:
-        with open(table[u"output-file"], u'w') as html_file:
+        with open(output_file(table[u"output-file"]), u'w') as html_file:
             logging.info(f"    Writing file: {table[u'output-file']}")
             html_file.write(u".. raw:: html\n\n\t")
             html_file.write(str(ET.tostring(failed_tests, encoding=u"unicode")))
@@ -1793,7 +1815,8 @@ def table_comparison(table, input_data):
                 footnote += f"{rca[u'data'].get(u'footnote', u'')}\n"
 
     csv_file_name = f"{table[u'output-file']}-csv.csv"
-    with open(csv_file_name, u"wt", encoding='utf-8') as file_handler:
+    with open(output_file(csv_file_name), u"wt", encoding='utf-8') as \
+            file_handler:
         file_handler.write(
             u",".join([f'"{itm}"' for itm in header_csv]) + u"\n"
         )
@@ -1874,7 +1897,8 @@ def table_comparison(table, input_data):
     # Generate csv tables:
     csv_file_name = f"{table[u'output-file']}.csv"
     logging.info(f"    Writing the file {csv_file_name}")
-    with open(csv_file_name, u"wt", encoding='utf-8') as file_handler:
+    with open(output_file(csv_file_name), u"wt", encoding='utf-8') as \
+            file_handler:
         file_handler.write(u";".join(header) + u"\n")
         for test in tbl_final:
             file_handler.write(u";".join([str(item) for item in test]) + u"\n")
@@ -1884,7 +1908,8 @@ def table_comparison(table, input_data):
     logging.info(f"    Writing the file {txt_file_name}")
     convert_csv_to_pretty_txt(csv_file_name, txt_file_name, delimiter=u";")
 
-    with open(txt_file_name, u'a', encoding='utf-8') as file_handler:
+    with open(output_file(txt_file_name), u'a', encoding='utf-8') as \
+            file_handler:
         file_handler.write(legend)
         file_handler.write(footnote)
 
@@ -2037,7 +2062,8 @@ def table_weekly_comparison(table, in_data):
     # Generate csv table:
     csv_file_name = f"{table[u'output-file']}.csv"
     logging.info(f"    Writing the file {csv_file_name}")
-    with open(csv_file_name, u"wt", encoding='utf-8') as file_handler:
+    with open(output_file(csv_file_name), u"wt", encoding='utf-8') as \
+            file_handler:
         for hdr in header:
             file_handler.write(u",".join(hdr) + u"\n")
         for test in tbl_lst:
@@ -2059,7 +2085,8 @@ def table_weekly_comparison(table, in_data):
             txt_table.append(line)
     try:
         txt_table.insert(5, txt_table.pop(2))
-        with open(txt_file_name, u"wt", encoding='utf-8') as file_handler:
+        with open(output_file(txt_file_name), u"wt", encoding='utf-8') as \
+                file_handler:
             file_handler.writelines(txt_table)
     except IndexError:
         pass
@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -16,11 +16,15 @@ Download all data.
 """
 
 import re
+import json
 import logging
 import gzip
+import zlib
 
-from os import rename, mkdir
-from os.path import join
+from functools import lru_cache
+from hashlib import sha256
+from os import rename, mkdir, makedirs, replace
+from os.path import join, isfile, expanduser
 from http.client import responses
 from zipfile import ZipFile, is_zipfile, BadZipfile
 
@@ -34,7 +38,7 @@ from pal_errors import PresentationError
 
 
 # Chunk size used for file download
-CHUNK_SIZE = 512
+CHUNK_SIZE = 65536
 
 # Separator used in file names
 SEPARATOR = u"__"
@@ -42,100 +46,262 @@ SEPARATOR = u"__"
 REGEX_RELEASE = re.compile(r'(\D*)(\d{4}|master)(\D*)')
 
 
-def _download_file(url, file_name, arch=False):
+@lru_cache(maxsize=1)
+def _get_session(retries=3, backoff_factor=0.3,
+                 status_forcelist=(500, 502, 504)):
+    """Return the HTTP session with retries, shared by all downloads.
+
+    The session keeps connections to the servers open (pooled),
+    so the builds downloaded from the same server re-use them.
+
+    :param retries: Total number of retries to allow.
+    :param backoff_factor: A backoff factor to apply between attempts after
+        the second try.
+    :param status_forcelist: A set of integer HTTP status codes that are
+        forced to retry.
+    :type retries: int
+    :type backoff_factor: float
+    :type status_forcelist: tuple
+    :returns: Session object.
+    :rtype: requests.Session
+    """
+    retry = Retry(
+        total=retries,
+        read=retries,
+        connect=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+    )
+    adapter = HTTPAdapter(max_retries=retry)
+    session = requests.Session()
+    session.mount(u"http://", adapter)
+    session.mount(u"https://", adapter)
+    return session
+
+
+def _get_decompressor(encoding):
+    """Return decompressor object for the given HTTP content encoding.
+
+    :param encoding: Value of Content-Encoding header, or None.
+    :type encoding: str
+    :returns: Decompressor object, or None if no decoding is needed.
+    :rtype: zlib.Decompress
+    """
+    encoding = (encoding or u"").lower()
+    if encoding in (u"gzip", u"x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == u"deflate":
+        return zlib.decompressobj()
+    return None
+
+
+def _store_paths(store, url):
+    """Return paths of the raw content and metadata of url in the store.
+
+    :param store: Directory with the local artifact store.
+    :param url: URL of the artifact.
+    :type store: str
+    :type url: str
+    :returns: Path to raw content and path to metadata.
+    :rtype: tuple(str, str)
+    """
+    key = sha256(url.encode(u"utf-8")).hexdigest()
+    return join(store, f"{key}.raw"), join(store, f"{key}.json")
+
+
+def _read_store_meta(store, url):
+    """Return metadata of url stored in the local artifact store.
+
+    :param store: Directory with the local artifact store, or None.
+    :param url: URL of the artifact.
+    :type store: str
+    :type url: str
+    :returns: Metadata (etag, last-modified, encoding), or None if the url
+        is not stored.
+    :rtype: dict
+    """
+    if not store:
+        return None
+    raw_path, meta_path = _store_paths(store, url)
+    if not (isfile(raw_path) and isfile(meta_path)):
+        return None
+    try:
+        with open(meta_path, u"rt") as meta_file:
+            meta = json.load(meta_file)
+    except (IOError, ValueError):
+        return None
+    return meta if meta.get(u"url") == url else None
+
+
+def _tee_chunks(chunks, dst_file_name, arch_file_name, store_file_name,
+                encoding):
+    """Write raw chunks to the archive and store, decoded ones to dst file.
+
+    :param chunks: Raw (not decoded) content of the artifact.
+    :param dst_file_name: Name of file to write decoded content to.
+    :param arch_file_name: Name of file to write raw content to, or None.
+    :param store_file_name: Name of file in the local artifact store to write
+        raw content to, or None.
+    :param encoding: Content encoding of the raw chunks, or None.
+    :type chunks: iterable of bytes
+    :type dst_file_name: str
+    :type arch_file_name: str
+    :type store_file_name: str
+    :type encoding: str
+    """
+    decompressor = _get_decompressor(encoding)
+    raw_files = list()
+    try:
+        for name in (arch_file_name, store_file_name):
+            if name:
+                raw_files.append(open(name, u"wb"))
+        with open(dst_file_name, u"wb") as dst_file:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                for raw_file in raw_files:
+                    raw_file.write(chunk)
+                if decompressor:
+                    chunk = decompressor.decompress(chunk)
+                dst_file.write(chunk)
+            if decompressor:
+                dst_file.write(decompressor.flush())
+    finally:
+        for raw_file in raw_files:
+            raw_file.close()
+
+
+def _read_chunks(file_name):
+    """Yield chunks of a local file.
+
+    :param file_name: Name of the file to read.
+    :type file_name: str
+    :yields: Chunks of the file.
+    :ytype: bytes
+    """
+    with open(file_name, u"rb") as file_handle:
+        for chunk in iter(lambda: file_handle.read(CHUNK_SIZE), b""):
+            yield chunk
+
+
+def _download_file(url, file_name, arch=False, store=None):
     """Download a file with input data.
 
+    The artifact is downloaded only once, the raw bytes are written
+    to the .gz archive (if requested) and decoded into the data file
+    at the same time.
+
+    If the local artifact store is used, the request is conditional
+    (If-None-Match, If-Modified-Since), and if the server reports the stored
+    copy is still valid, the files are created from the store instead.
+
     :param url: URL to the file to download.
     :param file_name: Name of file to download.
-    :param arch: If True, also .gz file is downloaded
+    :param arch: If True, also .gz file is stored.
+    :param store: Directory with the local artifact store, or None.
     :type url: str
     :type file_name: str
     :type arch: bool
+    :type store: str
     :returns: True if the download was successful, otherwise False.
     :rtype: bool
     """
 
-    def requests_retry_session(retries=3,
-                               backoff_factor=0.3,
-                               status_forcelist=(500, 502, 504)):
-        """
+    def get(url):
+        """Send (conditional) GET request for the url.
 
-        :param retries: Total number of retries to allow.
-        :param backoff_factor: A backoff factor to apply between attempts after
-            the second try.
-        :param status_forcelist: A set of integer HTTP status codes that are
-            forced to retry.
-        :type retries: int
-        :type backoff_factor: float
-        :type status_forcelist: iterable
-        :returns: Session object.
-        :rtype: requests.Session
+        :param url: URL to the file to download.
+        :type url: str
+        :returns: Response and stored metadata.
+        :rtype: tuple(requests.Response, dict)
         """
-
-        retry = Retry(
-            total=retries,
-            read=retries,
-            connect=retries,
-            backoff_factor=backoff_factor,
-            status_forcelist=status_forcelist,
-        )
-        adapter = HTTPAdapter(max_retries=retry)
-        session = requests.Session()
-        session.mount(u"http://", adapter)
-        session.mount(u"https://", adapter)
-        return session
-
-    success = False
-    session = None
-    try:
+        meta = _read_store_meta(store, url)
+        headers = dict()
+        if meta and meta.get(u"etag"):
+            headers[u"If-None-Match"] = meta[u"etag"]
+        if meta and meta.get(u"last-modified"):
+            headers[u"If-Modified-Since"] = meta[u"last-modified"]
         logging.info(f"    Connecting to {url} ...")
-        session = requests_retry_session()
-        response = session.get(url, stream=True)
+        response = _get_session().get(url, stream=True, headers=headers)
         code = response.status_code
-        logging.info(f"    {code}: {responses[code]}")
+        logging.info(f"    {code}: {responses.get(code, u'')}")
+        return response, meta
+
+    def valid(response, meta):
+        """Return True if the response has content (or it is in the store).
+
+        :param response: Response to the GET request.
+        :param meta: Metadata of the stored copy, or None.
+        :type response: requests.Response
+        :type meta: dict
+        :returns: True if the content is available.
+        :rtype: bool
+        """
+        if response.status_code == codes[u"not_modified"]:
+            return meta is not None
+        return response.status_code == codes[u"OK"]
 
-        if code != codes[u"OK"]:
-            if session:
-                session.close()
+    success = False
+    response = None
+    try:
+        response, meta = get(url)
+        if not valid(response, meta):
+            response.close()
             url = url.replace(u"_info", u"")
-            logging.info(f"    Connecting to {url} ...")
-            session = requests_retry_session()
-            response = session.get(url, stream=True)
-            code = response.status_code
-            logging.info(f"    {code}: {responses[code]}")
-            if code != codes[u"OK"]:
+            response, meta = get(url)
+            if not valid(response, meta):
                 return False, file_name
             file_name = file_name.replace(u"_info", u"")
 
         dst_file_name = file_name.replace(u".gz", u"")
-        logging.info(f"    Downloading the file {url} to {dst_file_name} ...")
-        with open(dst_file_name, u"wb") as file_handle:
-            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-                if chunk:
-                    file_handle.write(chunk)
-
-        if arch and u".gz" in file_name:
-            if session:
-                session.close()
-            logging.info(f"    Downloading the file {url} to {file_name} ...")
-            session = requests_retry_session()
-            response = session.get(url, stream=True)
-            if response.status_code == codes[u"OK"]:
-                with open(file_name, u"wb") as file_handle:
-                    file_handle.write(response.raw.read())
-            else:
-                logging.error(
-                    f"Not possible to download the file {url} to {file_name}"
-                )
+        arch_file_name = file_name if arch and u".gz" in file_name else None
+        if response.status_code == codes[u"not_modified"]:
+            raw_path, _ = _store_paths(store, url)
+            logging.info(
+                f"    Not modified, using the stored copy of {url} "
+                f"for {dst_file_name} ..."
+            )
+            _tee_chunks(
+                _read_chunks(raw_path), dst_file_name, arch_file_name, None,
+                meta.get(u"encoding")
+            )
+        else:
+            encoding = response.headers.get(u"Content-Encoding")
+            raw_path = meta_path = None
+            if store:
+                makedirs(store, exist_ok=True)
+                raw_path, meta_path = _store_paths(store, url)
+            logging.info(
+                f"    Downloading the file {url} to {dst_file_name} ..."
+            )
+            _tee_chunks(
+                response.raw.stream(CHUNK_SIZE, decode_content=False),
+                dst_file_name, arch_file_name,
+                f"{raw_path}.tmp" if raw_path else None, encoding
+            )
+            if raw_path:
+                with open(f"{meta_path}.tmp", u"wt") as meta_file:
+                    json.dump(
+                        {
+                            u"url": url,
+                            u"etag": response.headers.get(u"ETag"),
+                            u"last-modified":
+                                response.headers.get(u"Last-Modified"),
+                            u"encoding": encoding
+                        },
+                        meta_file
+                    )
+                replace(f"{raw_path}.tmp", raw_path)
+                replace(f"{meta_path}.tmp", meta_path)
 
         success = True
     except RequestException as err:
         logging.error(f"HTTP Request exception:\n{repr(err)}")
-    except (IOError, ValueError, KeyError) as err:
+    except (IOError, ValueError, KeyError, zlib.error) as err:
         logging.error(f"Download failed.\n{repr(err)}")
     finally:
-        if session:
-            session.close()
+        if response is not None:
+            response.close()
 
     logging.info(u"    Download finished.")
     return success, file_name
@@ -217,7 +383,12 @@ def download_and_unzip_data_file(spec, job, build, pid):
     logging.info(f"Trying to download {url}")
 
     arch = bool(spec.configuration.get(u"archive-inputs", True))
-    success, downloaded_name = _download_file(url, new_name, arch=arch)
+    store = spec.configuration.get(u"input-store", None)
+    if store:
+        store = expanduser(store)
+    success, downloaded_name = _download_file(
+        url, new_name, arch=arch, store=store
+    )
 
     if not success:
 
@@ -243,7 +414,9 @@ def download_and_unzip_data_file(spec, job, build, pid):
                 spec.environment[u"paths"][u"DIR[WORKING,DATA]"],
                 f"{job}{SEPARATOR}{build[u'build']}{SEPARATOR}{file_name[idx]}"
             )
-            success, downloaded_name = _download_file(url, new_name, arch=arch)
+            success, downloaded_name = _download_file(
+                url, new_name, arch=arch, store=store
+            )
             if success:
                 file_name = file_name[idx]
                 if file_name.endswith(u".gz"):
@@ -276,7 +449,7 @@ def download_and_unzip_data_file(spec, job, build, pid):
 
         logging.info(f"Downloading {url}")
 
-        success, downloaded_name = _download_file(url, new_name)
+        success, downloaded_name = _download_file(url, new_name, store=store)
 
     if success and downloaded_name.endswith(u".zip"):
         if not is_zipfile(downloaded_name):
@@ -1,4 +1,4 @@
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -20,6 +20,7 @@
 """
 
 import re
+import hashlib
 import copy
 import resource
 import logging
@@ -32,8 +33,7 @@ from datetime import timedelta
 from json import loads
 from json.decoder import JSONDecodeError
 
-import hdrh.histogram
-import hdrh.codec
+import numpy as np
 import prettytable
 import pandas as pd
 
@@ -43,6 +43,7 @@ from robot import errors
 from resources.libraries.python import jumpavg
 from input_data_files import download_and_unzip_data_file
 from pal_errors import PresentationError
+from pal_utils import decode_hdrh, hdrh_values_at_percentiles
 
 
 # Separator used in file names
@@ -105,13 +106,15 @@ class ExecutionChecker(ResultVisitor):
                             "min": float,
                             "avg": float,
                             "max": float,
-                            "hdrh": str
+                            "hdrh": str,
+                            "hist": dict or None
                         },
                         "direction2": {
                             "min": float,
                             "avg": float,
                             "max": float,
-                            "hdrh": str
+                            "hdrh": str,
+                            "hist": dict or None
                         }
                     },
                     "PDR": {
@@ -119,13 +122,15 @@ class ExecutionChecker(ResultVisitor):
                             "min": float,
                             "avg": float,
                             "max": float,
-                            "hdrh": str
+                            "hdrh": str,
+                            "hist": dict or None
                         },
                         "direction2": {
                             "min": float,
                             "avg": float,
                             "max": float,
-                            "hdrh": str
+                            "hdrh": str,
+                            "hist": dict or None
                         }
                     }
                 }
@@ -323,6 +328,10 @@ class ExecutionChecker(ResultVisitor):
         # 2 - PAPI History of DUT2
         self._conf_history_lookup_nr = 0
 
+        # Hosts whose PAPI history was read from the JSON message,
+        # their text message is skipped.
+        self._papi_history_json_hosts = set()
+
         self._sh_run_counter = 0
 
         # Test ID of currently processed test- the lowercase full path to the
@@ -479,30 +488,19 @@ class ExecutionChecker(ResultVisitor):
             if len(in_list_1) != 4 and len(in_list_2) != 4:
                 return None
 
-            in_list_1[3] += u"=" * (len(in_list_1[3]) % 4)
-            try:
-                hdr_lat_1 = hdrh.histogram.HdrHistogram.decode(in_list_1[3])
-            except hdrh.codec.HdrLengthException:
+            hist_1 = decode_hdrh(in_list_1[3])
+            hist_2 = decode_hdrh(in_list_2[3])
+            if hist_1 is None or hist_2 is None:
                 return None
 
-            in_list_2[3] += u"=" * (len(in_list_2[3]) % 4)
-            try:
-                hdr_lat_2 = hdrh.histogram.HdrHistogram.decode(in_list_2[3])
-            except hdrh.codec.HdrLengthException:
-                return None
-
-            if hdr_lat_1 and hdr_lat_2:
-                hdr_lat = (
-                    hdr_lat_1.get_value_at_percentile(50.0),
-                    hdr_lat_1.get_value_at_percentile(90.0),
-                    hdr_lat_1.get_value_at_percentile(99.0),
-                    hdr_lat_2.get_value_at_percentile(50.0),
-                    hdr_lat_2.get_value_at_percentile(90.0),
-                    hdr_lat_2.get_value_at_percentile(99.0)
-                )
-
-                if all(hdr_lat):
-                    return hdr_lat
+            hdr_lat = tuple(
+                int(value) for value in np.concatenate((
+                    hdrh_values_at_percentiles(hist_1, (50.0, 90.0, 99.0)),
+                    hdrh_values_at_percentiles(hist_2, (50.0, 90.0, 99.0))
+                ))
+            )
+            if all(hdr_lat):
+                return hdr_lat
 
             return None
 
@@ -631,14 +629,84 @@ class ExecutionChecker(ResultVisitor):
                 f" |br| **DUT{str(self._conf_history_lookup_nr)}:** {text}"
             )
 
+    @staticmethod
+    def _format_papi_history(history):
+        """Format structured PAPI command history as text lines.
+
+        The lines are the same as in the text form of the history.
+
+        :param history: PAPI command history, as logged in JSON message.
+        :type history: list of dict
+        :returns: Formatted commands, one per line.
+        :rtype: list of str
+        """
+        def format_item(command, item):
+            """Format one command item.
+
+            :param command: Name of the command.
+            :param item: Args, vectors and count of the command.
+            :type command: str
+            :type item: dict
+            :returns: Formatted command.
+            :rtype: str
+            """
+            if u"args" not in item:
+                return command
+            args = [f"{key}={val}" for key, val in item[u"args"].items()]
+            if u"vectors" not in item:
+                return f"{command}({u','.join(args)})"
+            for key, (first, last) in item[u"vectors"].items():
+                if item[u"count"] == 1:
+                    args.append(f"{key}={first}")
+                else:
+                    args.append(f"{key}=[{first}, ..., {last}]")
+            return f"{item[u'count']}x {command}({u','.join(args)})"
+
+        lines = list()
+        for run in history:
+            if u"omitted_runs" in run:
+                lines.append(
+                    f"... {run[u'omitted_commands']} commands in "
+                    f"{run[u'omitted_runs']} runs omitted ..."
+                )
+                continue
+            command = run[u"command"]
+            lines.extend(format_item(command, item) for item in run[u"first"])
+            omitted = run[u"count"] - len(run[u"first"]) - len(run[u"last"])
+            if omitted:
+                lines.append(f"... {omitted} more {command} commands ...")
+            lines.extend(format_item(command, item) for item in run[u"last"])
+        return lines
+
     def _get_papi_history(self, msg):
         """Called when extraction of PAPI command history is required.
 
+        The JSON message (if present) precedes the text message
+        for the same host, only one of them is used.
+
         :param msg: Message to process.
         :type msg: Message
         :returns: Nothing.
         """
-        if msg.message.count(u"PAPI command history:"):
+        if msg.message.count(u"PAPI command history JSON:"):
+            host, _, structured = msg.message.partition(
+                u" PAPI command history JSON: "
+            )
+            try:
+                lines = self._format_papi_history(loads(structured))
+            except (JSONDecodeError, KeyError, TypeError, ValueError):
+                return
+            self._papi_history_json_hosts.add(host)
+            self._conf_history_lookup_nr += 1
+            if self._conf_history_lookup_nr == 1:
+                self._data[u"tests"][self._test_id][u"conf-history"] = str()
+            text = u" |br| ".join([u""] + lines + [u""]).replace(u'"', u"'")
+            self._data[u"tests"][self._test_id][u"conf-history"] += (
+                f" |br| **DUT{str(self._conf_history_lookup_nr)}:** {text}"
+            )
+        elif msg.message.count(u"PAPI command history:"):
+            if msg.message.split(u" ", 1)[0] in self._papi_history_json_hosts:
+                return
             self._conf_history_lookup_nr += 1
             if self._conf_history_lookup_nr == 1:
                 self._data[u"tests"][self._test_id][u"conf-history"] = str()
@@ -827,7 +895,8 @@ class ExecutionChecker(ResultVisitor):
             u"min": -1.0,
             u"avg": -1.0,
             u"max": -1.0,
-            u"hdrh": u""
+            u"hdrh": u"",
+            u"hist": None
         }
         latency = {
             u"NDR": {
@@ -870,6 +939,8 @@ class ExecutionChecker(ResultVisitor):
             :param in_str: Input string, min/avg/max/hdrh format.
             :type in_str: str
             :returns: Dict with corresponding keys, except hdrh float values.
+                The hdrh string is also decoded (once) into "hist" item,
+                so consumers do not need to decode it again.
             :rtype dict:
             :throws IndexError: If in_str does not have enough substrings.
             :throws ValueError: If a substring does not convert to float.
@@ -880,11 +951,13 @@ class ExecutionChecker(ResultVisitor):
                 u"min": float(in_list[0]),
                 u"avg": float(in_list[1]),
                 u"max": float(in_list[2]),
-                u"hdrh": u""
+                u"hdrh": u"",
+                u"hist": None
             }
 
             if len(in_list) == 4:
                 rval[u"hdrh"] = str(in_list[3])
+                rval[u"hist"] = decode_hdrh(rval[u"hdrh"])
 
             return rval
 
@@ -1371,6 +1444,7 @@ class ExecutionChecker(ResultVisitor):
             teardown_kw.messages.visit(self)
         elif teardown_kw.name.count(u"Show Papi History On All Duts"):
             self._conf_history_lookup_nr = 0
+            self._papi_history_json_hosts = set()
             self._msg_type = u"teardown-papi-history"
             teardown_kw.messages.visit(self)
 
@@ -1504,6 +1578,13 @@ class InputData:
             u"build": build
         }
 
+        # Identity of the input, used to find outputs needing regeneration.
+        digest = hashlib.sha256()
+        with open(build[u"file-name"], u"rb") as data_file:
+            for chunk in iter(lambda: data_file.read(1 << 20), b""):
+                digest.update(chunk)
+        build[u"file-hash"] = digest.hexdigest()
+
         with open(build[u"file-name"], u'r') as data_file:
             try:
                 result = ExecutionResult(data_file)
@@ -1,4 +1,4 @@
-# Copyright (c) 2019 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -29,6 +29,7 @@ from static_content import prepare_static_content
 from generator_report import generate_report
 from generator_cpta import generate_cpta
 from generator_alerts import Alerting, AlertingError
+from build_graph import BuildGraph
 
 
 def parse_args():
@@ -96,6 +97,21 @@ def parse_args():
              u"this case, the section 'input' in the specification file is "
              u"ignored."
     )
+    parser.add_argument(
+        u"-c", u"--cache-dir",
+        type=str,
+        default=u"",
+        help=u"Directory with outputs generated by previous runs. Only tables, "
+             u"plots, files and charts with changed specification or input "
+             u"builds are generated again, pdf files are converted only if "
+             u"their source changed. If empty, all outputs are generated."
+    )
+    parser.add_argument(
+        u"-j", u"--jobs",
+        type=int,
+        default=1,
+        help=u"Number of outputs generated (or files converted) in parallel."
+    )
 
     return parser.parse_args()
 
@@ -147,14 +163,18 @@ def main():
         if args.print_all_oper_data:
             data.print_all_oper_data()
 
-        generate_tables(spec, data)
-        generate_plots(spec, data)
-        generate_files(spec, data)
+        graph = BuildGraph(spec, args.cache_dir, args.jobs)
+        generate_tables(spec, data, graph)
+        generate_plots(spec, data, graph)
+        generate_files(spec, data, graph)
+        graph.run()
 
         if spec.output[u"output"] == u"report":
-            generate_report(args.release, spec, args.week)
+            generate_report(
+                args.release, spec, args.week, args.cache_dir, args.jobs
+            )
         elif spec.output[u"output"] == u"trending":
-            sys.stdout.write(generate_cpta(spec, data))
+            sys.stdout.write(generate_cpta(spec, data, graph))
             try:
                 alert = Alerting(spec)
                 alert.generate_alerts()
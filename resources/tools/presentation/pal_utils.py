@@ -1,4 +1,4 @@
-# Copyright (c) 2019 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -19,11 +19,14 @@ import math
 import logging
 import csv
 
+from functools import lru_cache
 from os import walk, makedirs, environ
 from os.path import join, isdir
 from shutil import move, Error
 from datetime import datetime
 
+import hdrh.histogram
+import hdrh.codec
 import numpy as np
 import prettytable
 
@@ -31,6 +34,7 @@ from pandas import Series
 
 from resources.libraries.python import jumpavg
 
+from build_graph import output_file
 from pal_errors import PresentationError
 
 
@@ -252,6 +256,108 @@ def archive_input_data(spec):
     logging.info(u"    Done.")
 
 
+@lru_cache(maxsize=65536)
+def decode_hdrh(hdrh_str):
+    """Decode base64 encoded HDR histogram into compact numpy arrays.
+
+    The histogram is represented by a dict with two arrays of the same length:
+    "values" - highest equivalent values of recorded buckets (ascending),
+    "counts" - number of samples recorded in the corresponding bucket.
+    The iteration over recorded values (the slow part) is done only once
+    for each distinct string, repeated calls return the cached result,
+    so the returned arrays must not be modified by the caller.
+
+    :param hdrh_str: Base64 encoded HDR histogram.
+    :type hdrh_str: str
+    :returns: Decoded histogram or None if the string cannot be decoded
+        or the histogram is empty.
+    :rtype: dict or None
+    """
+    if not hdrh_str:
+        return None
+    hdrh_str += u"=" * (-len(hdrh_str) % 4)
+    try:
+        decoded = hdrh.histogram.HdrHistogram.decode(hdrh_str)
+    except (hdrh.codec.HdrLengthException, ValueError):
+        return None
+    values = list()
+    counts = list()
+    for item in decoded.get_recorded_iterator():
+        values.append(item.value_iterated_to)
+        counts.append(item.count_added_in_this_iter_step)
+    if not values:
+        return None
+    return dict(
+        values=np.array(values, dtype=np.int64),
+        counts=np.array(counts, dtype=np.int64)
+    )
+
+
+def hdrh_percentiles(histogram):
+    """Return percentile levels and values of the decoded histogram.
+
+    This is the same data as provided by the recorded iterator
+    of hdrh.histogram.HdrHistogram (percentile_level_iterated_to
+    and value_iterated_to).
+
+    :param histogram: Histogram decoded by decode_hdrh.
+    :type histogram: dict
+    :returns: Percentile levels (0 to 100) and corresponding values.
+    :rtype: tuple of numpy.ndarray
+    """
+    cumulative = np.cumsum(histogram[u"counts"])
+    return 100.0 * cumulative / cumulative[-1], histogram[u"values"]
+
+
+def merge_hdrh(histograms):
+    """Merge histograms decoded by decode_hdrh into one.
+
+    Counts of equal values are summed, which gives the same result
+    as adding the original histograms by hdrh.histogram.HdrHistogram.add,
+    if they have the same range and precision (as all latency histograms
+    from one traffic generator have).
+
+    :param histograms: Decoded histograms, None items are skipped.
+    :type histograms: Iterable[Optional[dict]]
+    :returns: Merged histogram, or None if there is nothing to merge.
+    :rtype: dict or None
+    """
+    histograms = [hist for hist in histograms if hist is not None]
+    if not histograms:
+        return None
+    values, inverse = np.unique(
+        np.concatenate([hist[u"values"] for hist in histograms]),
+        return_inverse=True
+    )
+    counts = np.bincount(
+        inverse,
+        weights=np.concatenate([hist[u"counts"] for hist in histograms])
+    )
+    return dict(values=values, counts=np.rint(counts).astype(np.int64))
+
+
+def hdrh_values_at_percentiles(histogram, percentiles):
+    """Return values at the given percentiles of the decoded histogram.
+
+    The semantics is the same as get_value_at_percentile
+    of hdrh.histogram.HdrHistogram.
+
+    :param histogram: Histogram decoded by decode_hdrh.
+    :param percentiles: Requested percentiles (0 to 100).
+    :type histogram: dict
+    :type percentiles: float or list of float
+    :returns: Values at the percentiles.
+    :rtype: numpy.ndarray
+    """
+    cumulative = np.cumsum(histogram[u"counts"])
+    count_at = np.asarray(percentiles, dtype=float) * cumulative[-1] / 100.0
+    count_at = np.maximum((count_at + 0.5).astype(np.int64), 1)
+    indexes = np.minimum(
+        np.searchsorted(cumulative, count_at), len(cumulative) - 1
+    )
+    return histogram[u"values"][indexes]
+
+
 def classify_anomalies(data):
     """Process the data and return anomalies and trending values.
 
@@ -332,10 +438,11 @@ def convert_csv_to_pretty_txt(csv_file_name, txt_file_name, delimiter=u","):
         txt_table.align[itm] = u"l"
 
     if txt_file_name.endswith(u".txt"):
-        with open(txt_file_name, u"wt", encoding='utf-8') as txt_file:
+        with open(output_file(txt_file_name), u"wt", encoding='utf-8') as \
+                txt_file:
             txt_file.write(str(txt_table))
     elif txt_file_name.endswith(u".rst"):
-        with open(txt_file_name, u"wt") as txt_file:
+        with open(output_file(txt_file_name), u"wt") as txt_file:
             txt_file.write(
                 u"\n"
                 u".. |br| raw:: html\n\n    <br />\n\n\n"
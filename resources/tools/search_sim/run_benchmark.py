@@ -0,0 +1,370 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Benchmark search algorithms against synthetic DUT models.
+
+For each algorithm configuration, the search is repeated
+with differently seeded DUT models. Reported are trial counts,
+simulated duration, relative error of the result against the true
+critical load of the model, relative width (or stdev) of the result,
+and CPU time spent (including child processes).
+
+Example (from root CSIT directory):
+
+    PYTHONPATH=. python3 resources/tools/search_sim/run_benchmark.py \
+        --algorithms mlr,mlr-budget,drs --repeat 5 --output bench.json
+
+Algorithm "mlr-parallel" runs several MLR searches at once
+through TrialScheduler, one simulated TG port pair per search.
+Its simulated time is the longest time of the port pairs,
+its trial count, error and width are taken over all searches.
+
+PLRsearch (algorithm "plr") needs numpy, scipy and dill,
+and its time limit is in wall-clock seconds. Trials sleep
+for a fraction of their duration, so PLRsearch has time to compute.
+"""
+
+import argparse
+import json
+import resource
+import sys
+import time
+
+from resources.libraries.python.MLRsearch.MultipleLossRatioSearch import \
+    MultipleLossRatioSearch
+from resources.libraries.python.MLRsearch.TrialScheduler import \
+    TrialScheduler
+from resources.tools.search_sim.synthetic import DutModel, \
+    SyntheticDropRateSearch, SyntheticMeasurer
+
+
+def run_mlr(args, model, measurer, time_budget=None, clock=None):
+    """Run MultipleLossRatioSearch, return precision figures.
+
+    :param args: Parsed command line arguments.
+    :param model: The simulated DUT.
+    :param measurer: Measurer bound to the model.
+    :param time_budget: Time budget for the search, None for fixed durations.
+    :param clock: Clock of the search, None means the clock of measurer.
+    :type args: argparse.Namespace
+    :type model: DutModel
+    :type measurer: AbstractMeasurer
+    :type time_budget: Optional[float]
+    :type clock: Optional[VirtualClock]
+    :returns: Relative errors and widths for NDR and PDR.
+    :rtype: dict
+    """
+    algorithm = MultipleLossRatioSearch(
+        measurer,
+        final_relative_width=args.width,
+        final_trial_duration=args.final_duration,
+        initial_trial_duration=args.initial_duration,
+        number_of_intermediate_phases=args.phases,
+        timeout=1e9,
+        doublings=args.doublings,
+        time_budget=time_budget,
+        clock=measurer.clock if clock is None else clock,
+    )
+    result = algorithm.narrow_down_ndr_and_pdr(
+        args.min_rate, args.max_rate, args.loss_ratio
+    )
+    ndr_true = model.critical_load(0.0)
+    pdr_true = model.critical_load(args.loss_ratio)
+    return dict(
+        error=result.pdr_interval.measured_low.target_tr / pdr_true - 1.0,
+        width=result.pdr_interval.rel_tr_width,
+        ndr_error=result.ndr_interval.measured_low.target_tr / ndr_true - 1.0,
+        ndr_width=result.ndr_interval.rel_tr_width,
+    )
+
+
+def run_mlr_budget(args, model, measurer):
+    """Run MultipleLossRatioSearch with time budget, return precision figures.
+
+    :param args: Parsed command line arguments.
+    :param model: The simulated DUT.
+    :param measurer: Measurer bound to the model.
+    :type args: argparse.Namespace
+    :type model: DutModel
+    :type measurer: SyntheticMeasurer
+    :returns: Relative errors and widths for NDR and PDR.
+    :rtype: dict
+    """
+    return run_mlr(args, model, measurer, time_budget=args.time_budget)
+
+
+def run_mlr_parallel(args, model, measurer):
+    """Run MLR searches concurrently on port pairs, return precision figures.
+
+    The given measurer is the first port pair, other port pairs
+    get their own DUT models, seeded from the first model.
+    Each search is only eligible for its own port pair,
+    as results are compared to the model behind that port pair.
+
+    :param args: Parsed command line arguments.
+    :param model: The simulated DUT behind the first port pair.
+    :param measurer: Measurer bound to the model.
+    :type args: argparse.Namespace
+    :type model: DutModel
+    :type measurer: SyntheticMeasurer
+    :returns: Worst relative errors and widths, trial count, simulated time.
+    :rtype: dict
+    """
+    measurers = [measurer]
+    for _ in range(1, args.ports):
+        port_model = DutModel(
+            capacity=model.capacity, spread=model.spread, noise=model.noise,
+            background_loss=model.background_loss,
+            seed=model.random.randrange(2 ** 32)
+        )
+        measurers.append(SyntheticMeasurer(port_model, overhead=args.overhead))
+
+    def search_on(port):
+        """Return search callable for the port pair.
+
+        :param port: Index of the port pair.
+        :type port: int
+        :returns: Search to give to the scheduler.
+        :rtype: Callable
+        """
+        port_measurer = measurers[port]
+        return lambda scheduled: run_mlr(
+            args, port_measurer.model, scheduled, clock=port_measurer.clock
+        )
+
+    with TrialScheduler(measurers) as scheduler:
+        results = scheduler.run(
+            (search_on(port), (port,)) for port in range(args.ports)
+        )
+    figures = dict(
+        trials=sum(port.trials for port in measurers),
+        simulated_time=max(port.clock.now for port in measurers),
+    )
+    for key in (u"error", u"ndr_error"):
+        figures[key] = max((result[key] for result in results), key=abs)
+    for key in (u"width", u"ndr_width"):
+        figures[key] = max(result[key] for result in results)
+    return figures
+
+
+def run_plr(args, model, measurer):
+    """Run PLRsearch, return precision figures.
+
+    :param args: Parsed command line arguments.
+    :param model: The simulated DUT.
+    :param measurer: Measurer bound to the model.
+    :type args: argparse.Namespace
+    :type model: DutModel
+    :type measurer: SyntheticMeasurer
+    :returns: Relative error and relative stdev of the estimate.
+    :rtype: dict
+    """
+    # Imported here, PLRsearch needs packages other algorithms do not.
+    from resources.libraries.python.PLRsearch.PLRsearch import PLRsearch
+    measurer.real_time_factor = args.plr_time_factor
+    algorithm = PLRsearch(
+        measurer,
+        trial_duration_per_trial=args.plr_duration,
+        packet_loss_ratio_target=args.plr_ratio,
+        timeout=args.plr_timeout,
+    )
+    average, stdev = algorithm.search(args.min_rate, args.max_rate)
+    return dict(
+        error=average / model.critical_load(args.plr_ratio) - 1.0,
+        width=stdev / average,
+    )
+
+
+def run_drs(args, model, measurer):
+    """Run binary DropRateSearch, return precision figures.
+
+    :param args: Parsed command line arguments.
+    :param model: The simulated DUT.
+    :param measurer: Measurer bound to the model.
+    :type args: argparse.Namespace
+    :type model: DutModel
+    :type measurer: SyntheticMeasurer
+    :returns: Relative error and relative convergence threshold.
+    :rtype: dict
+    """
+    algorithm = SyntheticDropRateSearch(measurer)
+    algorithm.set_search_rate_boundaries(args.max_rate, args.min_rate)
+    algorithm.set_search_rate_type_pps()
+    algorithm.set_loss_acceptance(args.loss_ratio * 100.0)
+    algorithm.set_loss_acceptance_type_percentage()
+    algorithm.set_duration(args.final_duration)
+    algorithm.set_binary_convergence_threshold(args.max_rate * args.width)
+    algorithm.binary_search(args.min_rate, args.max_rate, u"synthetic")
+    rate, _ = algorithm.verify_search_result()
+    return dict(
+        error=rate / model.critical_load(args.loss_ratio) - 1.0,
+        width=args.max_rate * args.width / rate,
+    )
+
+
+ALGORITHMS = dict(
+    mlr=run_mlr,
+    plr=run_plr,
+    drs=run_drs,
+)
+ALGORITHMS[u"mlr-budget"] = run_mlr_budget
+ALGORITHMS[u"mlr-parallel"] = run_mlr_parallel
+
+
+def cpu_time():
+    """Return CPU time used by this process and its finished children.
+
+    :returns: User plus system time [s].
+    :rtype: float
+    """
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def run_one(args, name, seed):
+    """Run one search on a freshly seeded model, return the figures.
+
+    :param args: Parsed command line arguments.
+    :param name: Algorithm configuration name, key in ALGORITHMS.
+    :param seed: Seed for the DUT model.
+    :type args: argparse.Namespace
+    :type name: str
+    :type seed: int
+    :returns: Trial count, simulated and CPU time, and precision figures.
+        Trial count and simulated time are taken from the measurer,
+        unless the algorithm reports them.
+    :rtype: dict
+    """
+    model = DutModel(
+        capacity=args.capacity, spread=args.spread, noise=args.noise,
+        background_loss=args.background_loss, seed=seed
+    )
+    measurer = SyntheticMeasurer(model, overhead=args.overhead)
+    cpu_start = cpu_time()
+    figures = ALGORITHMS[name](args, model, measurer)
+    figures.setdefault(u"trials", measurer.trials)
+    figures.setdefault(u"simulated_time", measurer.clock.now)
+    figures.update(
+        algorithm=name, seed=seed, cpu_time=cpu_time() - cpu_start
+    )
+    return figures
+
+
+def summarize(runs):
+    """Aggregate runs of one algorithm configuration.
+
+    :param runs: Figures from repeated runs.
+    :type runs: list of dict
+    :returns: Averages, and maximal absolute error.
+    :rtype: dict
+    """
+    count = float(len(runs))
+    summary = dict(algorithm=runs[0][u"algorithm"], runs=len(runs))
+    for key in (u"trials", u"simulated_time", u"cpu_time", u"width"):
+        summary[key] = sum(run[key] for run in runs) / count
+    errors = [abs(run[u"error"]) for run in runs]
+    summary[u"mean_abs_error"] = sum(errors) / count
+    summary[u"max_abs_error"] = max(errors)
+    return summary
+
+
+def main():
+    """Parse arguments, run the benchmarks, print and store results.
+
+    :returns: Return code, 0 on success.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(
+        description=u"Benchmark search algorithms on synthetic DUT models."
+    )
+    parser.add_argument(
+        u"--algorithms", default=u"mlr,mlr-budget,drs",
+        help=f"comma separated subset of: {u','.join(sorted(ALGORITHMS))}"
+    )
+    parser.add_argument(u"--repeat", type=int, default=3)
+    parser.add_argument(u"--seed", type=int, default=0)
+    parser.add_argument(u"--output", help=u"store all results to JSON file")
+    model_group = parser.add_argument_group(u"DUT model")
+    model_group.add_argument(u"--capacity", type=float, default=1e7)
+    model_group.add_argument(u"--spread", type=float, default=1e-3)
+    model_group.add_argument(u"--noise", type=float, default=5e-3)
+    model_group.add_argument(u"--background-loss", type=float, default=0.0)
+    model_group.add_argument(
+        u"--overhead", type=float, default=0.5,
+        help=u"simulated time added to every trial [s]"
+    )
+    search_group = parser.add_argument_group(u"search")
+    search_group.add_argument(u"--min-rate", type=float, default=1e4)
+    search_group.add_argument(u"--max-rate", type=float, default=2e7)
+    search_group.add_argument(u"--loss-ratio", type=float, default=0.005)
+    search_group.add_argument(u"--width", type=float, default=0.005)
+    search_group.add_argument(u"--final-duration", type=float, default=30.0)
+    search_group.add_argument(u"--initial-duration", type=float, default=1.0)
+    search_group.add_argument(u"--phases", type=int, default=2)
+    search_group.add_argument(u"--doublings", type=int, default=2)
+    search_group.add_argument(u"--time-budget", type=float, default=120.0)
+    search_group.add_argument(
+        u"--ports", type=int, default=2,
+        help=u"number of port pairs (and searches) for mlr-parallel"
+    )
+    search_group.add_argument(u"--plr-ratio", type=float, default=1e-7)
+    search_group.add_argument(u"--plr-duration", type=float, default=1.0)
+    search_group.add_argument(
+        u"--plr-timeout", type=float, default=30.0,
+        help=u"wall-clock limit for PLRsearch [s]"
+    )
+    search_group.add_argument(
+        u"--plr-time-factor", type=float, default=0.05,
+        help=u"fraction of trial duration to sleep, for PLRsearch computation"
+    )
+    args = parser.parse_args()
+    names = [name for name in args.algorithms.split(u",") if name]
+    for name in names:
+        if name not in ALGORITHMS:
+            print(f"Unknown algorithm: {name!r}", file=sys.stderr)
+            return 1
+
+    all_runs = list()
+    summaries = list()
+    for name in names:
+        runs = [
+            run_one(args, name, args.seed + index)
+            for index in range(args.repeat)
+        ]
+        all_runs.extend(runs)
+        summaries.append(summarize(runs))
+
+    print(
+        f"{u'algorithm':<12} {u'trials':>8} {u'sim_time':>10} "
+        f"{u'cpu_time':>9} {u'width':>9} {u'mean_err':>9} {u'max_err':>9}"
+    )
+    for summary in summaries:
+        print(
+            f"{summary[u'algorithm']:<12} {summary[u'trials']:>8.1f} "
+            f"{summary[u'simulated_time']:>10.1f} "
+            f"{summary[u'cpu_time']:>9.3f} {summary[u'width']:>9.5f} "
+            f"{summary[u'mean_abs_error']:>9.5f} "
+            f"{summary[u'max_abs_error']:>9.5f}"
+        )
+    if args.output:
+        with open(args.output, u"w") as output_file:
+            json.dump(
+                dict(arguments=vars(args), summary=summaries, runs=all_runs),
+                output_file, indent=1
+            )
+    return 0
+
+
+if __name__ == u"__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Synthetic DUT models and measurers for simulating search algorithms.
+
+Trials are not performed in real time, a virtual clock is advanced
+by trial duration plus a configurable per-trial overhead instead.
+Optionally, a fraction of trial duration is also spent sleeping,
+as PLRsearch needs wall-clock time for computations during trials.
+"""
+
+import math
+import random
+import time
+
+from resources.libraries.python.DropRateSearch import DropRateSearch
+from resources.libraries.python.MLRsearch.AbstractMeasurer import \
+    AbstractMeasurer
+from resources.libraries.python.MLRsearch.ReceiveRateMeasurement import \
+    ReceiveRateMeasurement
+
+
+class VirtualClock:
+    """Simulated time, advanced explicitly by measurers."""
+
+    def __init__(self):
+        """Start at time zero."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Return the current simulated time.
+
+        :returns: Seconds since the clock was created.
+        :rtype: float
+        """
+        return self.now
+
+    def advance(self, seconds):
+        """Move the clock forward.
+
+        :param seconds: Time to add [s].
+        :type seconds: float
+        """
+        self.now += float(seconds)
+
+
+class DutModel:
+    """Loss and latency behavior of a simulated DUT.
+
+    Expected lost rate is a softplus function of offered load,
+    approximating max(0, load - capacity) with the knee smoothed
+    by spread (relative to capacity). Zero spread means ideal DUT
+    dropping only the excess load. Background loss ratio
+    adds losses independent of load.
+
+    Capacity varies between trials by relative gaussian noise,
+    loss counts are Poisson distributed around the expected value.
+
+    Latency grows with utilization, as in a single queue model.
+    """
+
+    def __init__(
+            self, capacity, spread=0.0, noise=0.0, background_loss=0.0,
+            base_latency=10.0, seed=None):
+        """Store the parameters, initialize random generator.
+
+        :param capacity: Load the DUT forwards without loss (ideally) [tps].
+        :param spread: Width of the loss knee, relative to capacity.
+        :param noise: Relative stdev of capacity between trials.
+        :param background_loss: Loss ratio independent of the load.
+        :param base_latency: Latency at zero load [us].
+        :param seed: Seed for random generator, None for random.
+        :type capacity: float
+        :type spread: float
+        :type noise: float
+        :type background_loss: float
+        :type base_latency: float
+        :type seed: Optional[int]
+        """
+        self.capacity = float(capacity)
+        self.spread = float(spread)
+        self.noise = float(noise)
+        self.background_loss = float(background_loss)
+        self.base_latency = float(base_latency)
+        self.random = random.Random(seed)
+
+    def lost_rate(self, load, capacity=None):
+        """Return expected lost rate at the offered load.
+
+        :param load: Offered load [tps].
+        :param capacity: Capacity to use, default is the nominal one.
+        :type load: float
+        :type capacity: Optional[float]
+        :returns: Expected lost rate [tps].
+        :rtype: float
+        """
+        capacity = self.capacity if capacity is None else capacity
+        excess = load - capacity
+        if self.spread > 0.0:
+            scale = self.spread * capacity
+            # Softplus, computed without overflow.
+            excess = max(excess, 0.0) + scale * math.log1p(
+                math.exp(-abs(excess) / scale)
+            )
+        else:
+            excess = max(excess, 0.0)
+        lost = excess + self.background_loss * (load - excess)
+        return min(load, lost)
+
+    def loss_ratio(self, load):
+        """Return expected loss ratio at the offered load.
+
+        :param load: Offered load [tps].
+        :type load: float
+        :returns: Expected loss ratio.
+        :rtype: float
+        """
+        return self.lost_rate(load) / load
+
+    def critical_load(self, loss_ratio, min_load=1.0):
+        """Return load at which expected loss ratio hits the target.
+
+        Zero target is replaced by a tiny ratio, as smooth models
+        never have exactly zero expected loss.
+
+        :param loss_ratio: Target loss ratio.
+        :param min_load: Lower bound for the bisection [tps].
+        :type loss_ratio: float
+        :type min_load: float
+        :returns: The critical load [tps].
+        :rtype: float
+        """
+        loss_ratio = max(float(loss_ratio), 1e-9)
+        if self.loss_ratio(min_load) >= loss_ratio:
+            return min_load
+        low, high = min_load, 2.0 * self.capacity
+        while self.loss_ratio(high) < loss_ratio:
+            high *= 2.0
+        for _ in range(100):
+            middle = math.sqrt(low * high)
+            if self.loss_ratio(middle) < loss_ratio:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def _poisson(self, mean):
+        """Return Poisson distributed sample.
+
+        Normal approximation is used for large means.
+
+        :param mean: Mean of the distribution.
+        :type mean: float
+        :returns: The sample.
+        :rtype: int
+        """
+        if mean <= 0.0:
+            return 0
+        if mean > 100.0:
+            return max(0, int(round(self.random.gauss(mean, math.sqrt(mean)))))
+        limit = math.exp(-mean)
+        count, product = 0, self.random.random()
+        while product > limit:
+            count += 1
+            product *= self.random.random()
+        return count
+
+    def trial(self, duration, load):
+        """Simulate one trial, return transmit count, loss count and latency.
+
+        :param duration: Trial duration [s].
+        :param load: Offered load [tps].
+        :type duration: float
+        :type load: float
+        :returns: Transmit count, loss count, latency (min, avg, max) [us].
+        :rtype: tuple(int, int, tuple of int)
+        """
+        capacity = self.capacity
+        if self.noise > 0.0:
+            capacity *= max(0.0, 1.0 + self.random.gauss(0.0, self.noise))
+        transmit_count = int(round(duration * load))
+        loss_count = min(
+            transmit_count,
+            self._poisson(duration * self.lost_rate(load, capacity))
+        )
+        utilization = min(load / capacity, 0.999) if capacity else 0.999
+        average = self.base_latency / (1.0 - utilization)
+        latency = (
+            int(self.base_latency), int(average), int(2.0 * average)
+        )
+        return transmit_count, loss_count, latency
+
+
+class SyntheticMeasurer(AbstractMeasurer):
+    """Measurer performing trials on DutModel in virtual time."""
+
+    def __init__(
+            self, model, clock=None, overhead=0.5, real_time_factor=0.0):
+        """Store the model and clock, reset counters.
+
+        :param model: The simulated DUT.
+        :param clock: Virtual clock to advance, new one if None.
+        :param overhead: Virtual time added to each trial [s].
+        :param real_time_factor: Fraction of trial duration to really sleep.
+        :type model: DutModel
+        :type clock: Optional[VirtualClock]
+        :type overhead: float
+        :type real_time_factor: float
+        """
+        self.model = model
+        self.clock = VirtualClock() if clock is None else clock
+        self.overhead = float(overhead)
+        self.real_time_factor = float(real_time_factor)
+        self.trials = 0
+
+    def measure(self, duration, transmit_rate):
+        """Simulate trial measurement and return the result.
+
+        :param duration: Trial duration [s].
+        :param transmit_rate: Target transmit rate [tps].
+        :type duration: float
+        :type transmit_rate: float
+        :returns: Structure containing the result of the measurement.
+        :rtype: ReceiveRateMeasurement
+        """
+        duration = float(duration)
+        transmit_rate = float(transmit_rate)
+        self.trials += 1
+        self.clock.advance(duration + self.overhead)
+        if self.real_time_factor > 0.0:
+            time.sleep(duration * self.real_time_factor)
+        transmit_count, loss_count, latency = self.model.trial(
+            duration, transmit_rate
+        )
+        measurement = ReceiveRateMeasurement(
+            duration, transmit_rate, transmit_count, loss_count
+        )
+        measurement.latency = latency
+        return measurement
+
+
+class SyntheticDropRateSearch(DropRateSearch):
+    """DropRateSearch implementation using SyntheticMeasurer."""
+
+    def __init__(self, measurer):
+        """Initialize the search and store the measurer.
+
+        :param measurer: The measurer to perform trials with.
+        :type measurer: SyntheticMeasurer
+        """
+        super(SyntheticDropRateSearch, self).__init__()
+        self.measurer = measurer
+        self._latency = None
+
+    def measure_loss(
+            self, rate, frame_size, loss_acceptance, loss_acceptance_type,
+            traffic_profile, skip_warmup=False):
+        """Perform synthetic trial and evaluate the loss.
+
+        :param rate: Offered traffic load [tps].
+        :param frame_size: Size of frame, ignored.
+        :param loss_acceptance: Permitted drop ratio or frames count.
+        :param loss_acceptance_type: Type of permitted loss.
+        :param traffic_profile: Traffic profile, ignored.
+        :param skip_warmup: Ignored, there is no warmup.
+        :type rate: float
+        :type frame_size: str
+        :type loss_acceptance: float
+        :type loss_acceptance_type: LossAcceptanceType
+        :type traffic_profile: str
+        :type skip_warmup: bool
+        :returns: Drop threshold exceeded? (True/False)
+        :rtype: bool
+        """
+        measurement = self.measurer.measure(self.get_duration(), rate)
+        self._latency = measurement.latency
+        loss = float(measurement.loss_count)
+        if self.loss_acceptance_type_is_percentage():
+            loss = loss / measurement.transmit_count * 100.0
+        return loss <= float(loss_acceptance)
+
+    def get_latency(self):
+        """Return min/avg/max latency of the last trial.
+
+        :returns: Latency stats [us].
+        :rtype: list
+        """
+        return list(self._latency or ())
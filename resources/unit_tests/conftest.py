@@ -0,0 +1,29 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Configuration of unit tests.
+
+PAL modules use flat imports, so the presentation directory
+is added to module search path. Traffic scripts are imported
+from the GPL directory, as on TG.
+"""
+
+import sys
+
+from os.path import abspath, dirname, join
+
+sys.path.append(
+    join(dirname(abspath(__file__)), u"..", u"tools", u"presentation")
+)
+sys.path.append(join(dirname(abspath(__file__)), u"..", u"..", u"GPL"))
@@ -0,0 +1,88 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Unit tests for the PAL build graph."""
+
+from shutil import rmtree
+from types import SimpleNamespace
+
+from build_graph import BuildGraph, output_file
+
+
+def _write(path, text):
+    """Write the declared output file, return the text.
+
+    :param path: Path of the file.
+    :param text: Content of the file.
+    :type path: str
+    :type text: str
+    :returns: The text.
+    :rtype: str
+    """
+    with open(output_file(path), u"wt") as out_file:
+        out_file.write(text)
+    with open(f"{path}.tmp", u"wt") as tmp_file:
+        tmp_file.write(u"undeclared")
+    return text
+
+
+def _graph(tmp_path, jobs, cache=True):
+    """Return graph with two nodes of a common output prefix.
+
+    :param tmp_path: Directory for outputs and cache.
+    :param jobs: Number of worker processes.
+    :param cache: Whether to use the cache directory.
+    :type tmp_path: pathlib.Path
+    :type jobs: int
+    :type cache: bool
+    :returns: The graph.
+    :rtype: BuildGraph
+    """
+    spec = SimpleNamespace(builds=dict(job=[dict(build=1)]))
+    cache_dir = str(tmp_path / u"cache") if cache else u""
+    graph = BuildGraph(spec, cache_dir, jobs)
+    for name in (u"a", u"a-ndr"):
+        path = str(tmp_path / f"{name}.txt")
+        graph.add_node(
+            name, dict(name=name), lambda path=path, name=name: _write(
+                path, name
+            )
+        )
+    return graph
+
+
+def test_declared_files_are_cached_and_restored(tmp_path):
+    """Only declared files of each node are cached, then restored."""
+    for jobs in (1, 2):
+        _graph(tmp_path, jobs).run()
+        for path in tmp_path.glob(u"*.txt*"):
+            path.unlink()
+        graph = _graph(tmp_path, jobs)
+        # Stale nodes would fail, all have to be restored from cache.
+        for node in graph.nodes:
+            node.func = None
+        graph.run()
+        assert graph.result(u"a") == u"a"
+        assert (tmp_path / u"a.txt").read_text() == u"a"
+        assert (tmp_path / u"a-ndr.txt").read_text() == u"a-ndr"
+        assert not list(tmp_path.glob(u"*.tmp"))
+        rmtree(tmp_path / u"cache")
+
+
+def test_no_cache_collects_nothing(tmp_path):
+    """Without cache, nodes are just executed."""
+    graph = _graph(tmp_path, 1, cache=False)
+    graph.run()
+    assert graph.result(u"a") == u"a"
+    assert not (tmp_path / u"cache").exists()
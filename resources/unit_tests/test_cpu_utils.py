@@ -0,0 +1,75 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Unit tests for CPU topology and allocator of CpuUtils."""
+
+import pytest
+
+from resources.libraries.python.CpuUtils import CpuUtils
+
+
+def _node():
+    """Return node with cpuinfo of two sockets, four cores each, with SMT.
+
+    Rows follow "lscpu -p": CPU, Core, Socket, Node, (Book), L1d, L1i,
+    L2, L3. Sibling threads are numbered after all the first threads.
+
+    :returns: Node dictionary with cpuinfo.
+    :rtype: dict
+    """
+    cpu_info = list()
+    for thread in range(2):
+        for core in range(8):
+            socket = core // 4
+            cpu = thread * 8 + core
+            cpu_info.append(
+                [cpu, core, socket, socket, 0, core, core, core, socket]
+            )
+    return dict(host=u"192.0.2.1", cpuinfo=cpu_info)
+
+
+def test_topology_is_stored_in_node():
+    """Topology is computed once per cpuinfo and kept in the node."""
+    node = _node()
+    topology = CpuUtils.get_cpu_topology(node)
+    assert node[u"cpu_topology"] is topology
+    assert CpuUtils.get_cpu_topology(node) is topology
+    assert topology.smt_enabled
+    assert CpuUtils.cpu_node_count(node) == 2
+    assert CpuUtils.cpu_list_per_node(node, 1) == [4, 5, 6, 7]
+    assert CpuUtils.cpu_list_per_node(node, 0, smt_used=True) == \
+        [0, 1, 2, 3, 8, 9, 10, 11]
+
+
+def test_allocate_whole_cores_and_detect_overlap():
+    """Allocator skips reserved cores, overlapping pinning is refused."""
+    node = _node()
+    first = CpuUtils.allocate_cpus(node, 0, 2, u"vm1", smt_used=True)
+    assert first == [0, 1, 8, 9]
+    second = CpuUtils.allocate_cpus(node, 0, 1, u"vm2", smt_used=True)
+    assert second == [2, 10]
+    with pytest.raises(RuntimeError):
+        CpuUtils.reserve_cpus(node, [9], u"vm2")
+    with pytest.raises(RuntimeError):
+        CpuUtils.allocate_cpus(node, 0, 2, u"vm3", smt_used=True)
+    CpuUtils.release_cpus(node, u"vm1")
+    assert CpuUtils.allocate_cpus(node, 0, 2, u"vm3") == [0, 1]
+
+
+def test_affinity_keywords_ignore_reservations():
+    """Existing keywords return the same CPUs regardless of reservations."""
+    node = _node()
+    before = CpuUtils.cpu_slice_of_list_per_node(node, 0, cpu_cnt=2)
+    CpuUtils.allocate_cpus(node, 0, 4, u"vm1")
+    assert CpuUtils.cpu_slice_of_list_per_node(node, 0, cpu_cnt=2) == before
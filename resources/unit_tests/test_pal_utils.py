@@ -0,0 +1,62 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Unit tests for HDR histogram utilities of PAL."""
+
+import random
+
+import numpy as np
+
+from hdrh.histogram import HdrHistogram
+
+from pal_utils import decode_hdrh, hdrh_percentiles, merge_hdrh
+
+
+def _histogram(seed, samples=1000):
+    """Return histogram with random latencies, as TRex would record it.
+
+    :param seed: Seed for the random latencies.
+    :param samples: Number of recorded values.
+    :type seed: int
+    :type samples: int
+    :returns: The histogram.
+    :rtype: HdrHistogram
+    """
+    rng = random.Random(seed)
+    histogram = HdrHistogram(1, 1000000, 3)
+    for _ in range(samples):
+        histogram.record_value(int(rng.expovariate(1.0 / (seed * 100 + 50))))
+    return histogram
+
+
+def test_merge_matches_hdrh_add():
+    """Merged decoded histograms equal decoded sum of the histograms."""
+    histograms = [_histogram(seed) for seed in range(1, 4)]
+    decoded = [decode_hdrh(hist.encode().decode()) for hist in histograms]
+    total = _histogram(1)
+    for histogram in histograms[1:]:
+        total.add(histogram)
+    expected = decode_hdrh(total.encode().decode())
+    merged = merge_hdrh(decoded + [None])
+    assert np.array_equal(merged[u"values"], expected[u"values"])
+    assert np.array_equal(merged[u"counts"], expected[u"counts"])
+    levels, values = hdrh_percentiles(merged)
+    assert levels[-1] == 100.0
+    assert values[-1] == total.get_max_value()
+
+
+def test_merge_nothing():
+    """Merging no histograms gives None."""
+    assert merge_hdrh([]) is None
+    assert merge_hdrh([None, None]) is None
@@ -0,0 +1,77 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Unit tests for the traffic script agent (without scapy)."""
+
+import os
+import sys
+import time
+import types
+
+from traffic_scripts import agent
+
+
+def _register_script(name, main):
+    """Make a fake traffic script importable by the agent.
+
+    :param name: Module name relative to traffic_scripts package.
+    :param main: The main function of the script.
+    :type name: str
+    :type main: Callable
+    :returns: The module.
+    :rtype: module
+    """
+    module = types.ModuleType(f"traffic_scripts.{name}")
+    module.main = main
+    module.pids = list()
+    sys.modules[module.__name__] = module
+    return module
+
+
+def test_script_runs_in_agent_process():
+    """Output and exit code are captured, the process is the agent."""
+    def main():
+        """Record pid, print arguments, fail with exit code 3."""
+        module.pids.append(os.getpid())
+        print(u" ".join(sys.argv[1:]))
+        os.write(2, b"raw\n")
+        sys.exit(3)
+
+    module = _register_script(u"fake_exit", main)
+    argv = list(sys.argv)
+    for _ in range(2):
+        ret_code, stdout, stderr = agent.run_script(
+            u"fake_exit", [u"--tx_if", u"eth1"], 10.0
+        )
+        assert (ret_code, stdout, stderr) == (3, u"--tx_if eth1\n", u"raw\n")
+    assert module.pids == [os.getpid()] * 2
+    assert sys.argv == argv
+
+
+def test_script_is_interrupted_on_timeout():
+    """A hanging script is interrupted, generic handlers do not catch it."""
+    def main():
+        """Sleep forever, swallowing ordinary exceptions."""
+        while 1:
+            try:
+                time.sleep(1.0)
+            except Exception:
+                pass
+
+    _register_script(u"fake_hang", main)
+    time_start = time.monotonic()
+    ret_code, _, stderr = agent.run_script(u"fake_hang", list(), 0.2)
+    assert time.monotonic() - time_start < 5.0
+    assert ret_code != 0
+    assert u"timeout" in stderr
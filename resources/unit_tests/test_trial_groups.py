@@ -0,0 +1,138 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Unit tests for PLRsearch trial groups."""
+
+import math
+import random
+
+from resources.libraries.python.MLRsearch.ReceiveRateMeasurement import \
+    ReceiveRateMeasurement
+from resources.libraries.python.PLRsearch.PLRsearch import PLRsearch
+from resources.libraries.python.PLRsearch.trial_groups import TrialGroups
+
+
+def _soak(trial_count, mrr=1e6, spread=1e4, seed=1):
+    """Return measurements as PLRsearch would see them in a long soak.
+
+    Duration grows with trial number, load wanders around mrr,
+    loss count follows the stretch fitting function.
+
+    :param trial_count: Number of trials to simulate.
+    :param mrr: The mrr parameter of the simulated DUT [pps].
+    :param spread: The spread parameter of the simulated DUT [pps].
+    :param seed: Seed for the random loads.
+    :type trial_count: int
+    :type mrr: float
+    :type spread: float
+    :type seed: int
+    :returns: Simulated trial results.
+    :rtype: List[ReceiveRateMeasurement]
+    """
+    rng = random.Random(seed)
+    measurements = list()
+    for trial_number in range(1, trial_count + 1):
+        duration = 0.1 * trial_number
+        load = mrr * math.exp(rng.uniform(-0.05, 0.05))
+        transmit_count = int(load * duration)
+        loss_per_second = math.exp(
+            PLRsearch.lfit_stretch(lambda *_: None, load, mrr, spread)
+        )
+        loss_count = min(transmit_count, int(loss_per_second * duration))
+        measurements.append(ReceiveRateMeasurement(
+            duration, load, transmit_count, loss_count
+        ))
+    return measurements
+
+
+def _log_likelihood(snapshot, mrr, spread):
+    """Return log-likelihood of the snapshot for the stretch function.
+
+    :param snapshot: Compressed trial results, see TrialGroups.snapshot.
+    :param mrr: The mrr parameter for the fitting function.
+    :param spread: The spread parameter for the fitting function.
+    :type snapshot: tuple of 4-tuple
+    :type mrr: float
+    :type spread: float
+    :returns: Logarithm of the likelihood.
+    :rtype: float
+    """
+    return PLRsearch.log_weight(
+        lambda *_: None, PLRsearch.lfit_stretch, snapshot, mrr, spread
+    )
+
+
+def test_exact_groups_merge_identical_trials():
+    """Identical trials share a group, likelihood matches ungrouped."""
+    measurement = ReceiveRateMeasurement(1.0, 1e6, 1000000, 5)
+    groups = TrialGroups()
+    groups.extend([measurement] * 10)
+    assert len(groups) == 1
+    assert groups.trial_count == 10
+    assert next(iter(groups)).loss_count == 50
+
+
+def test_soak_group_count_stays_bounded():
+    """Long soak keeps at most max_groups groups, sums are preserved."""
+    measurements = _soak(3000)
+    groups = TrialGroups(
+        load_resolution=PLRsearch.trial_group_resolution,
+        duration_resolution=PLRsearch.trial_group_resolution,
+        max_groups=PLRsearch.max_trial_groups
+    )
+    for measurement in measurements:
+        groups.append(measurement)
+        assert len(groups) <= PLRsearch.max_trial_groups
+    assert groups.trial_count == len(measurements)
+    assert sum(group.trial_count for group in groups) == len(measurements)
+    assert sum(group.loss_count for group in groups) == sum(
+        measurement.loss_count for measurement in measurements
+    )
+    assert sum(group.transmit_count for group in groups) == sum(
+        measurement.transmit_count for measurement in measurements
+    )
+
+
+def test_soak_likelihood_error_within_bound():
+    """Log-likelihood of bounded groups is within the documented bound."""
+    mrr, spread = 1e6, 1e4
+    measurements = _soak(3000, mrr, spread)
+    exact = TrialGroups()
+    exact.extend(measurements)
+    assert len(exact) == len(measurements)
+    bounded = TrialGroups(
+        load_resolution=PLRsearch.trial_group_resolution,
+        duration_resolution=PLRsearch.trial_group_resolution,
+        max_groups=PLRsearch.max_trial_groups
+    )
+    bounded.extend(measurements)
+    bound = 0.0
+    for measurement in measurements:
+        log_fit = PLRsearch.lfit_stretch(
+            lambda *_: None, measurement.target_tr, mrr, spread
+        )
+        load_factor = math.exp(bounded.load_resolution)
+        fit_shift = max(
+            abs(PLRsearch.lfit_stretch(
+                lambda *_: None, measurement.target_tr * factor, mrr, spread
+            ) - log_fit)
+            for factor in (1.0 / load_factor, load_factor)
+        )
+        shift = bounded.duration_resolution + fit_shift
+        bound += max(measurement.loss_count, 1) * shift
+    error = abs(
+        _log_likelihood(bounded.snapshot(), mrr, spread)
+        - _log_likelihood(exact.snapshot(), mrr, spread)
+    )
+    assert error <= bound
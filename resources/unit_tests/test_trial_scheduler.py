@@ -0,0 +1,85 @@
+# Copyright (c) 2021 Cisco and/or its affiliates.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Unit tests for MLRsearch trial scheduler."""
+
+import threading
+
+from resources.libraries.python.MLRsearch.AbstractMeasurer import \
+    AbstractMeasurer
+from resources.libraries.python.MLRsearch.ReceiveRateMeasurement import \
+    ReceiveRateMeasurement
+from resources.libraries.python.MLRsearch.TrialScheduler import \
+    TrialScheduler
+
+
+class _PortMeasurer(AbstractMeasurer):
+    """Measurer recording which search measured on it."""
+
+    def __init__(self):
+        """Initialize the record."""
+        self.rates = list()
+
+    def measure(self, duration, transmit_rate):
+        """Record the rate, return lossless result.
+
+        :param duration: Trial duration [s].
+        :param transmit_rate: Target transmit rate [tps].
+        :type duration: float
+        :type transmit_rate: float
+        :returns: Lossless measurement.
+        :rtype: ReceiveRateMeasurement
+        """
+        self.rates.append(transmit_rate)
+        return ReceiveRateMeasurement(
+            duration, transmit_rate, int(duration * transmit_rate), 0
+        )
+
+
+def _search(rate):
+    """Return search performing ten trials at the given rate.
+
+    :param rate: Rate identifying the search.
+    :type rate: float
+    :returns: Search callable for the scheduler.
+    :rtype: Callable
+    """
+    def search(measurer):
+        """Perform the trials, return the rate.
+
+        :param measurer: Measurer given by the scheduler.
+        :type measurer: AbstractMeasurer
+        :returns: The rate.
+        :rtype: float
+        """
+        for _ in range(10):
+            measurer.measure(1.0, rate)
+        return rate
+    return search
+
+
+def test_searches_stay_on_one_port_pair():
+    """Each search uses one measurer, worker threads stop on close."""
+    ports = [_PortMeasurer(), _PortMeasurer()]
+    with TrialScheduler(ports) as scheduler:
+        results = scheduler.run(
+            (_search(float(rate)), (0, 1)) for rate in range(1, 5)
+        )
+    assert results == [1.0, 2.0, 3.0, 4.0]
+    used = [
+        sum(rate in port.rates for port in ports) for rate in results
+    ]
+    assert used == [1, 1, 1, 1]
+    assert all(port._trial_executor is None for port in ports)
+    assert threading.active_count() == 1
@@ -1,6 +1,6 @@
 #!/usr/bin/python3
 
-# Copyright (c) 2020 Cisco and/or its affiliates.
+# Copyright (c) 2021 Cisco and/or its affiliates.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at:
@@ -16,11 +16,13 @@
 """Storage utilities library."""
 
 import argparse
-import gzip
 import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from mimetypes import MimeTypes
 
 from boto3 import resource
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 
 
@@ -33,22 +35,82 @@ COMPRESS_MIME = (
     u"text/xml",
     u"application/octet-stream"
 )
+# Objects larger than this are uploaded in parts of this size.
+MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+# Number of files uploaded in parallel.
+JOBS = 8
 
 
-def compress(src_fpath):
-    """Compress a single file.
+class GzipReader:
+    """Read-only file-like object compressing the source file on the fly.
 
-    :param src_fpath: Input file path.
-    :type src_fpath: str
+    Only the data requested by the reader is compressed,
+    so no temporary compressed copy is created on disk.
     """
-    with open(src_fpath, u"rb") as orig_file:
-        with gzip.open(f"{src_fpath}.gz", u"wb") as zipped_file:
-            zipped_file.writelines(orig_file)
+
+    def __init__(self, src_fpath, chunk_size=MULTIPART_CHUNKSIZE):
+        """Open the source file.
+
+        :param src_fpath: Input file path.
+        :param chunk_size: Size of chunks read from the source file.
+        :type src_fpath: str
+        :type chunk_size: int
+        """
+        self._src_file = open(src_fpath, u"rb")
+        self._chunk_size = chunk_size
+        # Window bits 16 + MAX_WBITS produce gzip header and trailer.
+        self._compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        self._buffer = bytearray()
+        self._eof = False
+
+    def read(self, size=-1):
+        """Return up to size bytes of the compressed stream.
+
+        :param size: Number of bytes to read, negative means all.
+        :type size: int
+        :returns: Compressed data, empty at the end of the stream.
+        :rtype: bytes
+        """
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._src_file.read(self._chunk_size)
+            if chunk:
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._eof = True
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def close(self):
+        """Close the source file."""
+        self._src_file.close()
+
+    def __enter__(self):
+        """Return self for use as a context manager.
+
+        :returns: Self.
+        :rtype: GzipReader
+        """
+        return self
+
+    def __exit__(self, *args):
+        """Close the source file when leaving the context.
+
+        :param args: Exception information, ignored.
+        :type args: tuple
+        """
+        self.close()
 
 
 def upload(storage, bucket, src_fpath, dst_fpath):
     """Upload single file to destination bucket.
 
+    Files of compressible types are gzipped while being uploaded.
+    Large files are uploaded in multiple parts.
+
     :param storage: S3 storage resource.
     :param bucket: S3 bucket name.
     :param src_fpath: Input file path.
@@ -62,24 +124,44 @@ def upload(storage, bucket, src_fpath, dst_fpath):
     if not mime:
         mime = "application/octet-stream"
 
+    transfer_config = TransferConfig(
+        multipart_threshold=MULTIPART_CHUNKSIZE,
+        multipart_chunksize=MULTIPART_CHUNKSIZE,
+        use_threads=False
+    )
+    # Resources are not thread safe, clients are.
+    client = storage.meta.client
     if mime in COMPRESS_MIME and bucket in "logs":
-        compress(src_fpath)
-        src_fpath = f"{src_fpath}.gz"
         dst_fpath = f"{dst_fpath}.gz"
-
-    storage.Bucket(f"{bucket}.fd.io").upload_file(
-        src_fpath,
-        dst_fpath,
-        ExtraArgs={
-            u"ContentType": mime
-        }
-    )
+        with GzipReader(src_fpath) as src_file:
+            client.upload_fileobj(
+                src_file,
+                f"{bucket}.fd.io",
+                dst_fpath,
+                ExtraArgs={
+                    u"ContentType": mime
+                },
+                Config=transfer_config
+            )
+    else:
+        client.upload_file(
+            src_fpath,
+            f"{bucket}.fd.io",
+            dst_fpath,
+            ExtraArgs={
+                u"ContentType": mime
+            },
+            Config=transfer_config
+        )
     print(f"https://{bucket}.nginx.service.consul/{dst_fpath}")
 
 
-def upload_recursive(storage, bucket, src_fpath):
+def upload_recursive(storage, bucket, src_fpath, jobs=JOBS):
     """Recursively uploads input folder to destination.
 
+    Files are uploaded in parallel, at most jobs files at a time.
+    The first upload error (if any) is raised when all uploads finish.
+
     Example:
       - bucket: logs
       - src_fpath: /home/user
@@ -88,17 +170,25 @@ def upload_recursive(storage, bucket, src_fpath):
     :param storage: S3 storage resource.
     :param bucket: S3 bucket name.
     :param src_fpath: Input folder path.
+    :param jobs: Maximal number of parallel uploads.
     :type storage: Object
     :type bucket: str
     :type src_fpath: str
+    :type jobs: int
     """
-    for path, _, files in os.walk(src_fpath):
-        for file in files:
-            _path = path.replace(src_fpath, u"")
-            _dir = src_fpath[1:] if src_fpath[0] == "/" else src_fpath
-            _dst_fpath = os.path.normpath(f"{_dir}/{_path}/{file}")
-            _src_fpath = os.path.join(path, file)
-            upload(storage, bucket, _src_fpath, _dst_fpath)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = list()
+        for path, _, files in os.walk(src_fpath):
+            for file in files:
+                _path = path.replace(src_fpath, u"")
+                _dir = src_fpath[1:] if src_fpath[0] == "/" else src_fpath
+                _dst_fpath = os.path.normpath(f"{_dir}/{_path}/{file}")
+                _src_fpath = os.path.join(path, file)
+                futures.append(executor.submit(
+                    upload, storage, bucket, _src_fpath, _dst_fpath
+                ))
+    for future in futures:
+        future.result()
 
 
 def main():
@@ -113,16 +203,25 @@ def main():
         u"-b", u"--bucket", required=True, type=str,
         help=u"Target bucket on storage."
     )
+    parser.add_argument(
+        u"-e", u"--endpoint", default=ENDPOINT_URL, type=str,
+        help=u"Storage endpoint URL, e.g. a local S3 compatible server."
+    )
+    parser.add_argument(
+        u"-j", u"--jobs", default=JOBS, type=int,
+        help=u"Number of files uploaded in parallel."
+    )
     args = parser.parse_args()
 
     # Create main storage resource.
     storage = resource(
         u"s3",
-        endpoint_url=ENDPOINT_URL,
+        endpoint_url=args.endpoint,
         aws_access_key_id=AWS_ACCESS_KEY_ID,
         aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
         config=Config(
-            signature_version=u"s3v4"
+            signature_version=u"s3v4",
+            max_pool_connections=max(10, args.jobs)
         ),
         region_name=REGION_NAME
     )
@@ -130,7 +229,8 @@ def main():
     upload_recursive(
         storage=storage,
         bucket=args.bucket,
-        src_fpath=args.dir
+        src_fpath=args.dir,
+        jobs=args.jobs
     )
 
 